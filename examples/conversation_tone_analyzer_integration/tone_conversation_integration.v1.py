@@ -5,9 +5,7 @@ from dotenv import load_dotenv, find_dotenv
 
 from watson_developer_cloud import ConversationV1
 from watson_developer_cloud import ToneAnalyzerV3
-
-# import tone detection
-import tone_detection
+from watson_developer_cloud.tone_conversation_pipeline import TonePipeline
 
 # load the .env file containing your environment variables for the required
 # services (conversation and tone)
@@ -28,9 +26,14 @@ tone_analyzer = ToneAnalyzerV3(
 # replace with your own workspace_id
 workspace_id = os.environ.get('WORKSPACE_ID') or 'YOUR WORKSPACE ID'
 
-# This example stores tone for each user utterance in conversation context.
-# Change this to false, if you do not want to maintain history
-global_maintainToneHistoryInContext = True
+# This example stores tone for the last few user utterances in conversation
+# context. Change this to 0 if you do not want to maintain history
+global_toneHistorySize = 5
+
+# The pipeline analyzes tone in the background while the conversation payload is
+# prepared and caches the tone of repeated utterances.
+tone_pipeline = TonePipeline(conversation, tone_analyzer, workspace_id,
+                             history_size=global_toneHistorySize)
 
 # Payload for the Watson Conversation Service
 # user input text required - replace "I am happy" with user input text.
@@ -42,30 +45,24 @@ global_payload = {
 }
 
 
-def invokeToneConversation(payload, maintainToneHistoryInContext):
+def invokeToneConversation(payload):
     """
-     invokeToneConversation calls the Tone Analyzer service to get the
-     tone information for the user's input text (input['text'] in the payload
-     json object), adds/updates the user's tone in the payload's context,
-     and sends the payload to the
-     conversation service to get a response which is printed to screen.
+     invokeToneConversation sends the user's input text (input['text'] in the
+     payload json object) to the conversation service with the user's tone,
+     from the Tone Analyzer service, added to the payload's context. The
+     response is printed to screen.
      :param payload: a json object containing the basic information needed to
      converse with the Conversation Service's message endpoint.
-     :param maintainHistoryInContext:
 
 
-     Note: as indicated below, the console.log statements can be replaced
-     with application-specific code to process the err or data object
+     Note: as indicated below, the print statement can be replaced
+     with application-specific code to process the data object
      returned by the Conversation Service.
     """
-    tone = tone_analyzer.tone(tone_input=payload['input']['text'])
-    conversation_payload = tone_detection.\
-        updateUserTone(payload, tone, maintainToneHistoryInContext)
-    response = conversation.message(workspace_id=workspace_id,
-                                    input=conversation_payload['input'],
-                                    context=conversation_payload['context'])
+    response = tone_pipeline.message(input=payload['input'],
+                                     context=payload.get('context'))
     print(json.dumps(response, indent=2))
 
 
 # synchronous call to conversation with tone included in the context
-invokeToneConversation(global_payload, global_maintainToneHistoryInContext)
+invokeToneConversation(global_payload)
@@ -0,0 +1,17 @@
+# coding: utf-8
+import pytest
+
+from watson_developer_cloud.discovery_v1 import DiscoveryV1
+from watson_developer_cloud.natural_language_understanding_v1 import \
+    NaturalLanguageUnderstandingV1
+
+
+@pytest.fixture
+def discovery():
+    return DiscoveryV1('2017-11-07', username='username', password='password')
+
+
+@pytest.fixture
+def nlu():
+    return NaturalLanguageUnderstandingV1('2017-02-27', username='username',
+                                          password='password')
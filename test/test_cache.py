@@ -0,0 +1,106 @@
+# coding: utf-8
+import time
+
+from watson_developer_cloud.cache import LRUCache, SqliteCache, TieredCache
+
+
+def test_lru_eviction():
+    cache = LRUCache(max_size=2)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    assert cache.get('a') == 1
+    cache.set('c', 3)
+    assert 'b' not in cache
+    assert cache.get('a') == 1 and cache.get('c') == 3
+    assert cache.get('b', 'missing') == 'missing'
+    assert (cache.hits, cache.misses) == (3, 1)
+
+
+def test_ttl_and_invalidation():
+    cache = LRUCache(ttl=0.01)
+    cache.set(('coll', 'q1'), 1)
+    cache.set(('coll', 'q2'), 2)
+    cache.set(('other', 'q1'), 3)
+    assert cache.invalidate_where(lambda key: key[0] == 'coll') == 2
+    assert len(cache) == 1
+    time.sleep(0.02)
+    assert cache.get(('other', 'q1')) is None
+
+
+def test_sqlite_cache_persists_and_evicts_by_size(tmpdir):
+    path = str(tmpdir.join('cache.db'))
+    with SqliteCache(path, max_bytes=100) as cache:
+        cache.set('a', {'value': 'x' * 20})
+        cache.set('b', {'value': 'y' * 20})
+        assert cache.get('a') == {'value': 'x' * 20}
+        cache.set('c', {'value': 'z' * 40})
+        assert 'b' not in cache
+        assert 'a' in cache and 'c' in cache
+        assert cache.size <= 100
+        assert cache.get('b', 'missing') == 'missing'
+        assert (cache.hits, cache.misses) == (1, 1)
+    with SqliteCache(path, max_bytes=100) as cache:
+        assert len(cache) == 2
+        assert cache.get('c') == {'value': 'z' * 40}
+        cache.invalidate('c')
+        assert len(cache) == 1 and cache.size == len('{"value":"%s"}' % ('x' * 20))
+        cache.clear()
+        assert len(cache) == 0 and cache.size == 0
+
+
+def test_sqlite_cache_ttl(tmpdir):
+    with SqliteCache(str(tmpdir.join('cache.db')), ttl=0.01) as cache:
+        cache.set('a', [1])
+        time.sleep(0.02)
+        assert cache.get('a') is None
+
+
+def test_sqlite_cache_size_limits(tmpdir):
+    path = str(tmpdir.join('cache.db'))
+    with SqliteCache(path, max_bytes=40) as cache:
+        # Sizes are in UTF-8 bytes
+        cache.set('a', u'\u00e9' * 10)
+        assert cache.size == 22
+        cache.set('b', 'x' * 100)
+        assert 'b' not in cache and cache.get('a') == u'\u00e9' * 10
+        cache.set('a', 'x' * 100)
+        assert 'a' not in cache and cache.size == 0
+
+
+def test_sqlite_cache_eviction_with_shared_file(tmpdir):
+    path = str(tmpdir.join('cache.db'))
+    first = SqliteCache(path, max_bytes=50)
+    second = SqliteCache(path, max_bytes=50)
+    first.set('a', 'x' * 20)
+    first.set('b', 'y' * 20)
+    second.clear()
+    # The first cache still counts 44 bytes that another process removed
+    first.set('c', 'z' * 20)
+    assert len(first) == 1 and first.size == 22
+    first.close()
+    second.close()
+
+
+def test_sqlite_cache_purges_expired_entries(tmpdir):
+    with SqliteCache(str(tmpdir.join('cache.db')), max_bytes=50, ttl=0.01) as cache:
+        cache.set('a', 'x' * 20)
+        cache.ttl = None
+        cache.set('b', 'y' * 20)
+        time.sleep(0.02)
+        cache.set('c', 'z' * 20)
+        assert sorted(key for key in 'abc' if key in cache) == ['b', 'c']
+        assert len(cache) == 2
+
+
+def test_tiered_cache_promotes_disk_entries(tmpdir):
+    path = str(tmpdir.join('cache.db'))
+    with SqliteCache(path) as disk:
+        disk.set('a', [1, 2])
+    cache = TieredCache(LRUCache(max_size=10), SqliteCache(path))
+    assert cache.get('a') == [1, 2]
+    assert cache.memory.get('a') == [1, 2]
+    cache.set('b', 'value')
+    assert cache.disk.get('b') == 'value'
+    assert cache.get('c') is None
+    assert (cache.hits, cache.misses) == (1, 1)
+    cache.close()
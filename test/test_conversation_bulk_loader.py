@@ -0,0 +1,132 @@
+# coding: utf-8
+import json
+import re
+import threading
+
+import responses
+
+import watson_developer_cloud
+from watson_developer_cloud.concurrency import run_concurrently
+from watson_developer_cloud.conversation_bulk_loader import BulkLoader, \
+    read_training_csv
+
+base_url = 'https://gateway.watsonplatform.net/conversation/api/v1/workspaces/ws'
+
+
+def conversation():
+    return watson_developer_cloud.ConversationV1(
+        '2017-05-26', username='username', password='password')
+
+
+class FakeWorkspace(object):
+    """Records create calls and answers 409 for existing intents, entities and values."""
+
+    def __init__(self, existing=(), rejected=()):
+        self.existing = set(existing)
+        self.rejected = set(rejected)
+        self.bodies = []
+        self.lock = threading.Lock()
+
+    def __call__(self, request):
+        body = json.loads(request.body)
+        with self.lock:
+            self.bodies.append((request.path_url.split('?')[0], body))
+        name = body.get('intent') or body.get('entity') or body.get('value') or \
+            body.get('text') or body.get('synonym')
+        if name in self.existing:
+            return 409, {}, json.dumps({'error': 'already exists'})
+        texts = [e['text'] for e in body.get('examples') or []]
+        if name in self.rejected or self.rejected.intersection(texts):
+            return 400, {}, json.dumps({'error': 'invalid'})
+        return 201, {}, json.dumps(body)
+
+
+def register(workspace):
+    for path in ['/intents', r'/intents/\w+/examples', '/entities',
+                 r'/entities/\w+/values', r'/entities/\w+/values/\w+/synonyms']:
+        url = re.compile(re.escape(base_url) + path + r'\?')
+        responses.add_callback(responses.POST, url, callback=workspace,
+                               content_type='application/json')
+
+
+@responses.activate
+def test_new_items_are_batched(tmpdir):
+    intents = tmpdir.join('intents.csv')
+    intents.write_text(u'\ufeffhello,greet\nhi there,greet\nbye,goodbye\n'
+                       u'hi there,greet\n', encoding='utf-8')
+    entities = tmpdir.join('entities.csv')
+    entities.write('size,large,big,huge\nsize,small\n')
+    workspace = FakeWorkspace()
+    register(workspace)
+
+    report = BulkLoader(conversation(), 'ws', max_batch_size=1).load_csv(
+        str(intents), str(entities))
+
+    # greet carries one example, the second is added separately
+    assert report.calls == 5
+    assert report.counts() == {
+        'intent': {'created': 2}, 'example': {'created': 3},
+        'entity': {'created': 1}, 'value': {'created': 2},
+        'synonym': {'created': 2}}
+    intent_bodies = [b for p, b in workspace.bodies if p.endswith('/intents')]
+    assert {'intent': 'greet', 'examples': [{'text': 'hello'}]} in intent_bodies
+
+
+@responses.activate
+def test_existing_and_rejected_items_fall_back():
+    workspace = FakeWorkspace(existing=['greet', 'size', 'large', 'big'],
+                              rejected=['bad example'])
+    register(workspace)
+    training = {
+        'intents': [{'intent': 'greet', 'examples': [{'text': 'hello'}]},
+                    {'intent': 'order', 'examples': [{'text': 'pizza'},
+                                                     {'text': 'bad example'}]}],
+        'entities': [{'entity': 'size', 'values': [
+            {'value': 'large', 'synonyms': ['big', 'huge']}]}]
+    }
+
+    report = BulkLoader(conversation(), 'ws', max_workers=2, retries=0).load(
+        training)
+
+    statuses = dict(((i['type'], i['name']), i['status']) for i in report.items)
+    assert statuses == {
+        ('intent', 'greet'): 'exists', ('example', 'hello'): 'created',
+        ('intent', 'order'): 'created', ('example', 'pizza'): 'created',
+        ('example', 'bad example'): 'failed', ('entity', 'size'): 'exists',
+        ('value', 'large'): 'exists', ('synonym', 'big'): 'exists',
+        ('synonym', 'huge'): 'created'}
+    assert report.failures()[0]['parent'] == 'order'
+
+
+@responses.activate
+def test_transient_errors_are_retried():
+    responses.add(responses.POST, base_url + '/intents', status=503,
+                  json={'error': 'busy'})
+    responses.add(responses.POST, base_url + '/intents', status=201,
+                  json={'intent': 'greet'})
+    report = BulkLoader(conversation(), 'ws', backoff=0.001).load(
+        {'intents': [{'intent': 'greet'}]})
+    assert report.calls == 2
+    assert report.failures() == []
+
+
+def test_run_concurrently_orders_results_and_captures_errors():
+    def work(item):
+        if item == 3:
+            raise ValueError('three')
+        return item * 2
+
+    results = list(run_concurrently(work, iter(range(20)), max_workers=4,
+                                    max_pending=3))
+    assert [r.index for r in results] == list(range(20))
+    assert [r.value for r in results if r.ok] == [i * 2 for i in range(20) if i != 3]
+    assert str(results[3].error) == 'three'
+    unordered = run_concurrently(work, range(20), max_workers=4, ordered=False)
+    assert sorted(r.index for r in unordered) == list(range(20))
+
+
+def test_read_training_csv(tmpdir):
+    intents = tmpdir.join('intents.csv')
+    intents.write('"hello, you",greet\n\n')
+    assert read_training_csv(str(intents))['intents'] == [
+        {'intent': 'greet', 'examples': [{'text': 'hello, you'}]}]
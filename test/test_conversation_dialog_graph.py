@@ -0,0 +1,75 @@
+# coding: utf-8
+import datetime
+
+from watson_developer_cloud.conversation_v1 import DialogNode, DialogNodeNextStep
+from watson_developer_cloud.conversation_dialog_graph import DialogGraph
+
+
+def node(node_id, conditions, parent=None, previous_sibling=None, jump=None):
+    _dict = {'dialog_node': node_id, 'conditions': conditions,
+             'parent': parent, 'previous_sibling': previous_sibling}
+    if jump:
+        _dict['next_step'] = {'behavior': 'jump_to', 'dialog_node': jump,
+                              'selector': 'condition'}
+    return _dict
+
+
+workspace = {
+    'intents': [{'intent': 'order'}, {'intent': 'greet'}, {'intent': 'hours'}],
+    'dialog_nodes': [
+        node('welcome', 'welcome'),
+        node('order', '#order && @size', previous_sibling='welcome'),
+        node('size', '@size:large', parent='order'),
+        node('confirm', 'true', parent='order', previous_sibling='size', jump='done'),
+        node('never', '#order', parent='order', previous_sibling='confirm'),
+        node('fallback', 'anything_else', previous_sibling='order'),
+        node('shadowed', '#greet', previous_sibling='fallback'),
+        node('done', 'false', previous_sibling='shadowed'),
+        node('orphan', '#cancel', parent='missing', jump='nowhere'),
+    ]
+}
+
+
+def test_indexes():
+    graph = DialogGraph.from_workspace(workspace)
+    assert len(graph) == 9
+    assert graph.children() == ['welcome', 'order', 'fallback', 'shadowed', 'done']
+    assert graph.children('order') == ['size', 'confirm', 'never']
+    assert graph.ancestors('size') == ['order']
+    assert graph.nodes_with_condition(' anything_else ') == ['fallback']
+    assert graph.nodes_for_intent('#order') == ['order', 'never']
+    assert graph.nodes_for_entity('size') == ['order', 'size']
+    assert graph.jump_target('confirm') == 'done'
+    assert graph.jumps_to('done') == ['confirm']
+
+
+def test_validate():
+    result = DialogGraph.from_workspace(workspace).validate()
+    # 'done' sits after anything_else but is reached by the jump from 'confirm'
+    assert result['unreachable_nodes'] == ['never', 'shadowed', 'orphan']
+    assert result['broken_jumps'] == [('orphan', 'nowhere')]
+    assert result['broken_links'] == [('orphan', 'parent', 'missing')]
+    assert result['uncovered_intents'] == ['hours']
+    assert result['undefined_intents'] == ['cancel']
+
+
+def test_accepts_dialog_node_models():
+    now = datetime.datetime(2017, 1, 1)
+    nodes = [
+        DialogNode('a', '', 'true', None, None, {}, {}, {},
+                   DialogNodeNextStep('jump_to', dialog_node='b'), now, 'a'),
+        DialogNode('b', '', '#x', 'a', None, {}, {}, {},
+                   None, now, 'b'),
+    ]
+    graph = DialogGraph(nodes)
+    assert graph.jump_target('a') == 'b'
+    assert graph.unreachable_nodes() == []
+
+
+def test_large_sibling_chain_is_linear():
+    nodes = [node('n0', '#i0')]
+    for i in range(1, 5000):
+        nodes.append(node('n%d' % i, '#i%d' % i, previous_sibling='n%d' % (i - 1)))
+    graph = DialogGraph(nodes)
+    assert graph.children()[-1] == 'n4999'
+    assert graph.unreachable_nodes() == []
@@ -0,0 +1,87 @@
+# coding: utf-8
+import json
+
+import pytest
+
+import watson_developer_cloud
+from watson_developer_cloud.concurrency import RateLimiter, _clock
+from watson_developer_cloud.conversation_load_generator import LoadGenerator, \
+    LoadTestReport, StandInConversationServer, load_transcripts
+
+transcripts = [['hello', 'I want a pizza', {'text': 'large'}], ['bye']]
+
+
+def conversation(url):
+    return watson_developer_cloud.ConversationV1(
+        '2017-05-26', url=url, username='username', password='password')
+
+
+def test_replay_threads_context():
+    with StandInConversationServer() as server:
+        service = conversation(server.url)
+        generator = LoadGenerator(service, 'ws', transcripts, virtual_users=4,
+                                  iterations=2)
+        report = generator.run()
+
+        assert report.requests == 4 * 4  # each user replays both transcripts
+        assert report.errors == 0
+        assert report.throughput > 0
+        assert report.percentile(50) <= report.percentile(99)
+
+        # The stand-in increments the turn counter of the context it is given
+        response = service.message('ws', input={'text': 'a'})
+        response = service.message('ws', input={'text': 'b'},
+                                   context=response['context'])
+        assert response['context']['system']['dialog_turn_counter'] == 2
+
+
+def test_error_and_rate_limit_accounting():
+    with StandInConversationServer(error_rate=0.25, rate_limit_rate=0.25,
+                                   seed=7) as server:
+        generator = LoadGenerator(conversation(server.url), 'ws', [['a']] * 10,
+                                  virtual_users=2, iterations=20)
+        report = generator.run()
+    data = json.loads(str(report))
+    assert report.requests == 40
+    assert 0 < report.rate_limited < report.errors < report.requests
+    assert data['status_codes']['429'] == report.rate_limited
+    assert data['status_codes']['500'] == report.errors - report.rate_limited
+    assert report.error_rate == pytest.approx(report.errors / 40.0)
+
+
+def test_empty_transcripts_are_rejected():
+    with pytest.raises(ValueError):
+        LoadGenerator(conversation('http://localhost'), 'ws', [[]], duration=0.2)
+    with pytest.raises(ValueError):
+        LoadGenerator(conversation('http://localhost'), 'ws', [['a'], []])
+
+    # Virtual users stop at the deadline even when a replay sends nothing
+    generator = LoadGenerator(conversation('http://localhost'), 'ws', [['a']],
+                              virtual_users=1, duration=0.05)
+    generator.transcripts = [[]]
+    assert generator.run().requests == 0
+
+
+def test_report_percentiles():
+    report = LoadTestReport()
+    for latency in [0.5, 0.1, 0.4, 0.2, 0.3]:
+        report.record(latency)
+    report.record(0.0, 429, error=True)
+    assert report.percentile(50) == 0.3
+    assert report.percentile(100) == 0.5
+    assert report.rate_limited_rate == pytest.approx(1 / 6.0)
+
+
+def test_rate_limiter_spaces_calls():
+    limiter = RateLimiter(200)
+    start = _clock()
+    for _ in range(11):
+        limiter.acquire()
+    assert _clock() - start >= 0.045
+
+
+def test_load_transcripts(tmpdir):
+    path = tmpdir.join('t.jsonl')
+    path.write('{"turns": ["hi", {"text": "yo"}]}\n["bye"]\n')
+    assert load_transcripts(str(path)) == [[{'text': 'hi'}, {'text': 'yo'}],
+                                           [{'text': 'bye'}]]
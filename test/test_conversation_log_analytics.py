@@ -0,0 +1,74 @@
+# coding: utf-8
+import gzip
+import json
+
+import pytest
+
+from watson_developer_cloud import conversation_log_analytics
+from watson_developer_cloud.conversation_log_analytics import LogAnalytics, \
+    build_columns, read_jsonl
+
+
+def make_response(intent=None, confidence=None, entities=(), nodes=()):
+    return {
+        'intents': [{'intent': intent, 'confidence': confidence}] if intent else [],
+        'entities': [{'entity': e, 'value': e, 'location': [0, 1]} for e in entities],
+        'output': {'text': [], 'log_messages': [], 'nodes_visited': list(nodes)},
+        'context': {'conversation_id': 'c', 'system': {}}
+    }
+
+
+records = [
+    {'response': make_response('order', 0.95, ['size', 'topping'])},
+    {'response': make_response('order', 0.55, ['size', 'topping', 'size'])},
+    {'response': make_response('greet', 0.05)},
+    make_response(entities=['size']),
+    {'response': make_response('hours', 0.8, ['day'], nodes=['anything_else'])},
+]
+
+vectorized_modes = [False]
+if conversation_log_analytics.numpy is not None:
+    vectorized_modes.append(True)
+
+
+@pytest.mark.parametrize('vectorized', vectorized_modes)
+def test_reports(vectorized):
+    columns = build_columns(records, fallback_nodes=['anything_else'])
+    analytics = LogAnalytics(columns, vectorized=vectorized)
+
+    assert analytics.intent_frequency() == [('order', 2), ('greet', 1), ('hours', 1)]
+    histogram = analytics.confidence_histogram(bins=4)
+    assert histogram['counts'] == [1, 0, 1, 2]
+    assert histogram['edges'] == [0.0, 0.25, 0.5, 0.75, 1.0]
+    # greet (low confidence), no intent, anything_else node
+    assert analytics.fallback_rate() == pytest.approx(3.0 / 5)
+    assert analytics.entity_cooccurrence() == {('size', 'topping'): 2}
+
+
+def test_columns_are_compact():
+    columns = build_columns(records)
+    assert len(columns) == 5
+    assert columns.intent_names == ['order', 'greet', 'hours']
+    assert list(columns.intent_codes) == [0, 0, 1, -1, 2]
+    assert list(columns.entity_offsets) == [0, 2, 4, 4, 5, 6]
+
+
+def test_from_jsonl(tmpdir):
+    path = str(tmpdir.join('logs-00001.jsonl.gz'))
+    with gzip.open(path, 'wb') as f:
+        for record in records:
+            f.write((json.dumps(record) + '\n').encode('utf-8'))
+    summary = LogAnalytics.from_jsonl([path]).summary(bins=2)
+    assert summary['events'] == 5
+    assert summary['confidence_histogram']['counts'] == [1, 3]
+    assert summary['entity_cooccurrence'] == [
+        {'entities': ['size', 'topping'], 'count': 2}]
+    # A single path, including a unicode one on Python 2, is one file
+    assert list(read_jsonl(u'%s' % path)) == list(read_jsonl([path]))
+
+
+def test_empty():
+    analytics = LogAnalytics(build_columns([]))
+    assert analytics.intent_frequency() == []
+    assert analytics.fallback_rate() == 0.0
+    assert analytics.entity_cooccurrence() == {}
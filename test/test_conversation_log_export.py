@@ -0,0 +1,121 @@
+# coding: utf-8
+import gzip
+import json
+import os
+
+import pytest
+import responses
+
+import watson_developer_cloud
+from watson_developer_cloud.watson_service import WatsonApiException
+from watson_developer_cloud.conversation_log_export import LogExporter, \
+    next_cursor, flatten_field
+
+platform_url = 'https://gateway.watsonplatform.net'
+service_path = '/conversation/api'
+base_url = '{0}{1}'.format(platform_url, service_path)
+logs_url = '{0}/v1/logs'.format(base_url)
+
+
+def make_log(log_id, text, intent):
+    return {
+        'request': {'input': {'text': text}},
+        'response': {
+            'input': {'text': text},
+            'intents': [{'intent': intent, 'confidence': 0.9}],
+            'entities': [],
+            'output': {'text': ['ok'], 'log_messages': []},
+            'context': {'conversation_id': 'c1', 'system': {}}
+        },
+        'log_id': log_id,
+        'request_timestamp': '2017-09-13T19:52:32.611Z',
+        'response_timestamp': '2017-09-13T19:52:32.628Z',
+        'workspace_id': 'ws',
+        'language': 'en'
+    }
+
+
+def add_page(logs, cursor=None, status=200):
+    pagination = {}
+    if cursor:
+        pagination['next_url'] = '/v1/logs?cursor={0}&version=2017-05-26'.format(cursor)
+    responses.add(responses.GET, logs_url,
+                  body=json.dumps({'logs': logs, 'pagination': pagination}),
+                  status=status, content_type='application/json')
+
+
+def conversation():
+    return watson_developer_cloud.ConversationV1(
+        username='username', password='password', version='2017-05-26')
+
+
+def test_next_cursor():
+    assert next_cursor({}) is None
+    assert next_cursor(None) is None
+    assert next_cursor({'next_url': '/v1/logs?version=1&cursor=ab+c%3D&x=1'}) == 'ab+c='
+
+
+def test_flatten_field():
+    log = make_log('1', 'hi', 'greet')
+    assert flatten_field(log, 'response.intents.0.intent') == 'greet'
+    assert flatten_field(log, 'response.intents.3.intent') == ''
+    assert flatten_field(log, 'response.output.text') == '["ok"]'
+    assert flatten_field(log, 'missing.path') == ''
+
+
+@responses.activate
+def test_export_jsonl_with_rotation(tmpdir):
+    add_page([make_log('1', 'a', 'x'), make_log('2', 'b', 'y')], cursor='p2')
+    add_page([make_log('3', 'c', 'z')])
+    exporter = LogExporter(conversation(), str(tmpdir), filter='language::en',
+                           max_file_bytes=1)
+    summary = exporter.export()
+    assert summary['logs'] == 3
+    assert summary['pages'] == 2
+    assert len(summary['files']) == 3
+    assert 'cursor=p2' in responses.calls[1].request.url
+    lines = []
+    for path in summary['files']:
+        with open(path) as f:
+            lines.extend(json.loads(line)['log_id'] for line in f)
+    assert lines == ['1', '2', '3']
+
+    # A finished export is not repeated
+    assert exporter.export()['done']
+    assert len(responses.calls) == 2
+
+
+@responses.activate
+def test_export_csv_gzip(tmpdir):
+    add_page([make_log('1', 'hello, there', 'greet')])
+    exporter = LogExporter(conversation(), str(tmpdir), filter='language::en',
+                           export_format='csv', compress=True,
+                           csv_fields=['log_id', 'request.input.text',
+                                       'response.intents.0.intent'])
+    summary = exporter.export()
+    assert summary['files'][0].endswith('.csv.gz')
+    with gzip.open(summary['files'][0], 'rb') as f:
+        content = f.read().decode('utf-8')
+    assert content == 'log_id,request.input.text,response.intents.0.intent\n' \
+                      '1,"hello, there",greet\n'
+
+
+@responses.activate
+def test_export_resumes_from_checkpoint(tmpdir):
+    add_page([make_log('1', 'a', 'x')], cursor='p2')
+    add_page([], status=500)
+    exporter = LogExporter(conversation(), str(tmpdir), filter='language::en')
+    with pytest.raises(WatsonApiException):
+        exporter.export()
+
+    responses.reset()
+    add_page([make_log('2', 'b', 'y')])
+    summary = exporter.export()
+    assert 'cursor=p2' in responses.calls[0].request.url
+    assert summary['logs'] == 2
+    assert os.path.basename(summary['files'][0]) == 'logs-00002.jsonl'
+
+
+def test_export_requires_filter():
+    with pytest.raises(ValueError):
+        LogExporter(conversation(), '/tmp')
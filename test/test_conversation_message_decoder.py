@@ -0,0 +1,36 @@
+# coding: utf-8
+import json
+
+from watson_developer_cloud.conversation_message_decoder import decode_message
+from watson_developer_cloud.conversation_v1 import MessageResponse
+
+response = {
+    'input': {'text': 'a large pizza'},
+    'intents': [{'intent': 'order', 'confidence': 0.9},
+                {'intent': 'greet', 'confidence': 0.1}],
+    'entities': [{'entity': 'size', 'value': 'large', 'location': [2, 7]}],
+    'context': {'conversation_id': 'c1', 'system': {'dialog_turn_counter': 1}},
+    'output': {'log_messages': [], 'text': ['Which toppings?']}
+}
+
+
+def test_decode_matches_model():
+    model = MessageResponse._from_dict(response)
+    for source in [response, json.dumps(response), json.dumps(response).encode('utf-8')]:
+        summary = decode_message(source)
+        assert summary.text == model.output.text
+        assert summary.intent == model.intents[0].intent
+        assert summary.confidence == model.intents[0].confidence
+        assert summary.context == model.context._to_dict()
+        assert summary.conversation_id == 'c1'
+
+
+def test_decode_does_not_copy():
+    summary = decode_message(response)
+    assert summary.context is response['context']
+    assert summary.text is response['output']['text']
+
+
+def test_decode_without_intents():
+    summary = decode_message({'intents': [], 'context': {}, 'output': {}})
+    assert (summary.intent, summary.confidence, summary.text) == (None, None, [])
@@ -0,0 +1,85 @@
+# coding: utf-8
+import json
+
+import responses
+
+from watson_developer_cloud.deduplication import Deduplicator, input_key, \
+    normalize_text
+from watson_developer_cloud.natural_language_classifier_v1 import \
+    NaturalLanguageClassifierV1
+from watson_developer_cloud.natural_language_understanding_v1 import \
+    Features, KeywordsOptions, NaturalLanguageUnderstandingV1
+from watson_developer_cloud.tone_analyzer_v3 import ToneAnalyzerV3
+
+analyze_url = 'https://gateway.watsonplatform.net/natural-language-understanding/api' \
+              '/v1/analyze'
+tone_url = 'https://gateway.watsonplatform.net/tone-analyzer/api/v3/tone'
+classify_url = 'https://gateway.watsonplatform.net/natural-language-classifier/api' \
+               '/v1/classifiers/clf/classify'
+
+
+def test_normalized_keys():
+    assert normalize_text(u'  café \n au  lait ') == u'café au lait'
+    assert input_key('a  b') == input_key(' a b')
+    assert input_key('a b') != input_key('A b')
+    assert input_key({'html': '<p>x  </p>', 'clean': True}) == \
+        input_key({'clean': True, 'html': '<p>x </p>'})
+    assert input_key('a  b', normalize=None) != input_key('a b', normalize=None)
+
+
+@responses.activate
+def test_analyze_duplicates_across_batches():
+
+    def callback(request):
+        text = json.loads(request.body)['text']
+        if text == 'bad':
+            return 400, {}, json.dumps({'error': 'bad input', 'code': 400})
+        return 200, {}, json.dumps({'keywords': [{'text': text}]})
+
+    responses.add_callback(responses.POST, analyze_url, callback=callback,
+                           content_type='application/json')
+    nlu = NaturalLanguageUnderstandingV1('2017-02-27', username='username',
+                                         password='password')
+    dedup = Deduplicator.for_analyze(nlu, Features(keywords=KeywordsOptions()),
+                                     batch_size=4, retries=0, max_workers=2)
+    texts = ['RT great news', 'other', 'RT  great news ', 'bad',
+             'other', 'RT great news', 'bad', 'new']
+    results = list(dedup.run(texts))
+    assert [r.index for r in results] == list(range(8))
+    assert [r.item for r in results] == texts
+    assert results[2].value == {'keywords': [{'text': 'RT great news'}]}
+    assert results[2].value is not results[0].value
+    assert results[5].value == results[0].value
+    assert [r.ok for r in results] == [True, True, True, False,
+                                       True, True, False, True]
+    assert results[3].error.code == 400
+    # 'bad' failed in the first batch, so it is sent again in the second
+    assert len(responses.calls) == 5
+    stats = dedup.stats
+    assert (stats.inputs, stats.unique, stats.duplicates, stats.cached) == (8, 5, 1, 2)
+    assert (stats.calls, stats.failed) == (5, 2)
+    assert stats.savings == 3.0 / 8
+    assert json.loads(str(stats))['saved'] == 3
+
+
+@responses.activate
+def test_tone_and_classify_unordered():
+    responses.add(responses.POST, tone_url,
+                  body=json.dumps({'document_tone': {'tones': []}}),
+                  content_type='application/json')
+    responses.add(responses.POST, classify_url,
+                  body=json.dumps({'top_class': 'greeting'}),
+                  content_type='application/json')
+    tone = ToneAnalyzerV3('2017-09-21', username='username', password='password')
+    dedup = Deduplicator.for_tone(tone, tone_args={'sentences': False})
+    results = list(dedup.run(['hi', 'hi', 'hello'], ordered=False))
+    assert sorted(r.index for r in results) == [0, 1, 2]
+    assert len(responses.calls) == 2
+    assert 'sentences=false' in responses.calls[0].request.url
+
+    nlc = NaturalLanguageClassifierV1(username='username', password='password')
+    dedup = Deduplicator.for_classify(nlc, 'clf', cache_size=None)
+    results = list(dedup.run(['hello there'] * 5))
+    assert all(r.value == {'top_class': 'greeting'} for r in results)
+    assert len(responses.calls) == 3
+    assert dedup.stats.savings == 0.8
@@ -0,0 +1,99 @@
+# coding: utf-8
+import json
+
+import numpy
+import pytest
+import responses
+
+from watson_developer_cloud.discovery_aggregations import Aggregation, combine, \
+    decode_aggregation, histogram, nested, term, timeslice
+from watson_developer_cloud.discovery_v1 import DiscoveryV1
+
+query_url = ('https://gateway.watsonplatform.net/discovery/api/v1/environments/'
+             'env/collections/coll/query')
+
+DAY = 86400000
+
+
+def sentiment_by_day():
+    return {
+        'type': 'timeslice', 'field': 'publication_date', 'interval': '1d',
+        'results': [{
+            'key': day * DAY, 'key_as_string': 'day %d' % day, 'matching_results': 5,
+            'aggregations': [{
+                'type': 'term', 'field': 'sentiment',
+                'results': [{'key': 'positive', 'matching_results': 3 + day},
+                            {'key': 'negative', 'matching_results': 2}]
+            }]
+        } for day in range(3)] + [{'key': 3 * DAY, 'matching_results': 0}]
+    }
+
+
+def test_expressions():
+    assert str(term('author', count=5)) == 'term(author,count:5)'
+    assert str(histogram('price', 10).term('category')) == \
+        'histogram(price,interval:10).term(category)'
+    assert str(timeslice('date', '1day', 'America/New_York')) == \
+        'timeslice(date,1day,America/New_York)'
+    assert str(nested('enriched_text.entities').filter(
+        'enriched_text.entities.type:Company').term('enriched_text.entities.text')) == \
+        ('nested(enriched_text.entities).filter(enriched_text.entities.type:Company)'
+         '.term(enriched_text.entities.text)')
+    assert combine(term('a'), Aggregation().filter('x:1')) == 'term(a),filter(x:1)'
+    assert term('a') == term('a') and term('a') != term('a', count=1)
+    with pytest.raises(ValueError):
+        histogram('price', None)
+
+
+@pytest.mark.parametrize('vectorized', [False, True])
+def test_decode_chained_buckets(vectorized):
+    aggregation = timeslice('publication_date', '1day').term('sentiment')
+    table = aggregation.decode(sentiment_by_day(), vectorized=vectorized)
+    assert table.names == ['publication_date', 'sentiment']
+    assert len(table) == 6
+    assert list(table.column('sentiment')) == ['positive', 'negative'] * 3
+    assert list(table.counts) == [3, 2, 4, 2, 5, 2]
+    if vectorized:
+        assert table.column('publication_date').dtype == numpy.dtype('datetime64[ms]')
+        assert table.counts[table.column('sentiment') == 'positive'].sum() == 12
+    else:
+        assert list(table.column('publication_date'))[2] == DAY
+    assert json.loads(str(table))['publication_date'][-1] == 2 * DAY
+    with pytest.raises(KeyError):
+        table.column('missing')
+
+
+def test_decode_nested_and_siblings():
+    result = {
+        'type': 'nested', 'path': 'enriched_text.entities', 'matching_results': 40,
+        'aggregations': [
+            {'type': 'filter', 'match': 'x:1', 'matching_results': 7},
+            {'type': 'term', 'field': 'enriched_text.entities.text',
+             'results': [{'key': 'IBM', 'matching_results': 30},
+                         {'key': 'Watson', 'matching_results': 10}]}
+        ]
+    }
+    aggregation = nested('enriched_text.entities').term('enriched_text.entities.text')
+    table = decode_aggregation(result, aggregation, vectorized=False)
+    assert list(table.rows()) == [('IBM', 30), ('Watson', 10)]
+    assert table.matching_results == 40
+
+    table = nested('enriched_text.entities').filter('x:1').decode(result)
+    assert table.names == [] and list(table.counts) == [7]
+
+
+@responses.activate
+def test_decode_query_response():
+    responses.add(responses.GET, query_url, status=200, content_type='application/json',
+                  body=json.dumps({'matching_results': 10, 'results': [],
+                                   'aggregations': [
+                                       {'type': 'term', 'field': 'other', 'results': []},
+                                       sentiment_by_day()]}))
+    discovery = DiscoveryV1('2017-11-07', username='username', password='password')
+    aggregation = timeslice('publication_date', '1day').term('sentiment')
+    response = discovery.query('env', 'coll', count=0,
+                               aggregation=combine(term('other'), aggregation))
+    assert 'aggregation=term%28other%29%2Ctimeslice' in responses.calls[0].request.url
+    assert list(aggregation.decode(response).counts) == [3, 2, 4, 2, 5, 2]
+    with pytest.raises(ValueError):
+        histogram('price', 1).decode(response)
@@ -0,0 +1,107 @@
+# coding: utf-8
+import json
+import threading
+
+import pytest
+import responses
+
+from watson_developer_cloud.discovery_config_tester import ConfigurationTester, \
+    configuration_hash
+
+preview_url = ('https://gateway.watsonplatform.net/discovery/api/v1/environments/'
+               'env/preview')
+
+
+class FakePreview(object):
+
+    def __init__(self):
+        self.bodies = []
+        self.lock = threading.Lock()
+
+    def __call__(self, request):
+        body = request.body
+        with self.lock:
+            self.bodies.append(body)
+        if b'broken' in body:
+            return 400, {}, json.dumps({'error': 'unsupported file'})
+        notices = []
+        if b'empty' in body:
+            notices.append({'notice_id': 'empty_document', 'severity': 'warning',
+                            'step': 'convert', 'description': 'No text'})
+        return 200, {}, json.dumps({
+            'status': 'completed' if not notices else 'completed with notices',
+            'enriched_field_units': 2,
+            'snapshots': [{'step': 'enrich', 'snapshot': {'text': 'x',
+                                                          'enriched_text': {}}},
+                          {'step': 'convert', 'snapshot': {'html': '<p/>'}}],
+            'notices': notices
+        })
+
+
+def test_configuration_hash():
+    assert configuration_hash({'a': 1, 'b': [2]}) == configuration_hash('{"b":[2],"a":1}')
+    assert configuration_hash(configuration_id='c1') == 'id:c1'
+    assert configuration_hash() == 'id:default'
+
+
+@responses.activate
+def test_batch_preview_with_cache(tmpdir, discovery):
+    fake = FakePreview()
+    responses.add_callback(responses.POST, preview_url, callback=fake,
+                           content_type='application/json')
+    docs = tmpdir.mkdir('docs')
+    docs.join('a.html').write('<p>hello</p>')
+    docs.join('b.html').write('<p>empty</p>')
+    docs.join('c.html').write('<p>broken</p>')
+
+    tester = ConfigurationTester(discovery, 'env', max_workers=3, retries=0)
+    configuration = {'name': 'tuned', 'enrichments': []}
+    report = tester.test_directory(str(docs), configuration=configuration)
+    assert report.calls == 3 and report.cached == 0
+    assert sorted(report.errors) == [str(docs.join('c.html'))]
+    assert report.statuses() == {'completed': 1, 'completed with notices': 1}
+    assert report.enriched_field_units() == 4
+    assert report.steps() == {'enrich': {'text': 2, 'enriched_text': 2},
+                              'convert': {'html': 2}}
+    notices = report.notices()
+    assert [(n['notice_id'], n['count']) for n in notices] == [('empty_document', 1)]
+    assert notices[0]['samples'] == [str(docs.join('b.html'))]
+    assert any(b'filename="a.html"' in body for body in fake.bodies)
+    assert all(b'"name": "tuned"' in body for body in fake.bodies)
+
+    # Same configuration in another key order: only the failed and changed samples
+    docs.join('a.html').write('<p>hello again</p>')
+    report = tester.test_directory(str(docs), configuration=json.dumps(
+        {'enrichments': [], 'name': 'tuned'}))
+    assert report.calls == 2 and report.cached == 1
+    assert json.loads(str(report))['samples'] == 3
+
+    # A different step or configuration is previewed again
+    report = tester.test([{'key': 'x', 'file': b'<p>hello again</p>',
+                           'filename': 'x.html'}], configuration_id='c1',
+                         step='convert')
+    assert report.calls == 1
+    assert 'step=convert' in responses.calls[-1].request.url
+    with pytest.raises(ValueError):
+        tester.test([], configuration=configuration, configuration_id='c1')
+
+
+@responses.activate
+def test_metadata_samples_and_configuration_updates(discovery):
+    fake = FakePreview()
+    responses.add_callback(responses.POST, preview_url, callback=fake,
+                           content_type='application/json')
+    responses.add(responses.PUT, 'https://gateway.watsonplatform.net/discovery/api/v1/'
+                  'environments/env/configurations/c1',
+                  body=json.dumps({'configuration_id': 'c1'}), status=200,
+                  content_type='application/json')
+    tester = ConfigurationTester(discovery, 'env', retries=0)
+    samples = [{'key': 'm', 'metadata': {'Creator': 'Johnny Appleseed'}}]
+    report = tester.test(samples, configuration_id='c1')
+    assert report.calls == 1 and not report.errors
+    assert tester.test(samples, configuration_id='c1').cached == 1
+
+    # Updating the stored configuration through the client drops its previews
+    discovery.update_configuration('env', 'c1', 'tuned')
+    assert tester.test(samples, configuration_id='c1').calls == 1
+    tester.close()
@@ -0,0 +1,145 @@
+# coding: utf-8
+import json
+
+import responses
+
+try:
+    from urllib.parse import parse_qs, urlparse  # Python 3
+except ImportError:
+    from urlparse import parse_qs, urlparse  # Python 2
+
+from watson_developer_cloud.discovery_export import CollectionExporter, Partition, \
+    id_prefix_partitions, range_partitions, term_partitions
+
+query_url = ('https://gateway.watsonplatform.net/discovery/api/v1/environments/'
+             'env/collections/coll/query')
+
+
+class FakeCollection(object):
+    """Serves pages of the documents whose `source` the filter selects."""
+
+    def __init__(self, documents, fail_offsets=()):
+        self.documents = documents
+        self.fail_offsets = set(fail_offsets)
+        self.calls = []
+
+    def __call__(self, request):
+        args = dict((k, v[0]) for k, v in parse_qs(urlparse(request.url).query).items())
+        self.calls.append(args)
+        if 'aggregation' in args:
+            counts = {}
+            for document in self.documents:
+                counts[document['source']] = counts.get(document['source'], 0) + 1
+            return 200, {}, json.dumps({
+                'matching_results': len(self.documents),
+                'aggregations': [{'type': 'term', 'field': 'source', 'results': [
+                    {'key': 'a', 'matching_results': counts['a']},
+                    {'key': 'b', 'matching_results': counts['b']}]}]})
+        source = args['filter'].split('"')[1]
+        if args['filter'].startswith('source!::'):
+            selected = [d for d in self.documents if d['source'] not in ('a', 'b')]
+        else:
+            selected = [d for d in self.documents if d['source'] == source]
+        offset, count = int(args['offset']), int(args['count'])
+        if (source, offset) in self.fail_offsets:
+            self.fail_offsets.remove((source, offset))
+            return 400, {}, json.dumps({'error': 'bad request'})
+        return 200, {}, json.dumps({'matching_results': len(selected),
+                                    'results': selected[offset:offset + count]})
+
+
+def make_documents():
+    sources = ['a'] * 5 + ['b'] * 3 + ['c'] * 2
+    return [{'id': 'doc-%d' % i, 'source': s} for i, s in enumerate(sources)]
+
+
+def read_ids(path):
+    with open(path) as output:
+        return [json.loads(line)['id'] for line in output]
+
+
+@responses.activate
+def test_term_partitions(discovery):
+    responses.add_callback(responses.GET, query_url,
+                           callback=FakeCollection(make_documents()),
+                           content_type='application/json')
+    partitions = term_partitions(discovery, 'env', 'coll', 'source')
+    assert [(p.name, p.filter, p.expected) for p in partitions] == [
+        ('source-0000', 'source::"a"', 5), ('source-0001', 'source::"b"', 3),
+        ('source-rest', 'source!::"a",source!::"b"', 2)]
+
+
+@responses.activate
+def test_range_partitions(discovery):
+    responses.add(responses.GET, query_url, status=200, content_type='application/json',
+                  body=json.dumps({'aggregations': [{
+                      'type': 'histogram', 'field': 'price', 'results': [
+                          {'key': 0, 'matching_results': 4},
+                          {'key': 50, 'matching_results': 0},
+                          {'key': 100, 'matching_results': 1}]}]}))
+    partitions = range_partitions(discovery, 'env', 'coll', 'price', 50)
+    assert [p.filter for p in partitions] == ['price>=0,price<50',
+                                              'price>=100,price<150']
+    assert 'histogram%28price%2Cinterval%3A50%29' in responses.calls[0].request.url
+
+
+def test_id_prefix_partitions():
+    partitions = id_prefix_partitions('ab', length=2)
+    assert [p.filter for p in partitions] == ['id:aa*', 'id:ab*', 'id:ba*', 'id:bb*']
+
+
+@responses.activate
+def test_export_resumes_each_partition(tmpdir, discovery):
+    collection = FakeCollection(make_documents(), fail_offsets=[('a', 2)])
+    responses.add_callback(responses.GET, query_url, callback=collection,
+                           content_type='application/json')
+    partitions = [Partition('a', 'source::"a"'), Partition('b', 'source::"b"'),
+                  Partition('rest', 'source!::"a",source!::"b"')]
+    exporter = CollectionExporter(discovery, 'env', 'coll', str(tmpdir), partitions,
+                                  page_size=2, retries=0,
+                                  return_fields='id,source')
+    result = exporter.export()
+    assert not result['done']
+    assert result['partitions']['a'] == {'documents': 2, 'expected': 5, 'done': False,
+                                         'error': 'bad request'}
+    assert result['partitions']['b'] == {'documents': 3, 'expected': 3, 'done': True}
+    assert all(call.get('return') == 'id,source' for call in collection.calls)
+
+    # Simulate a crash after writing a page that was not checkpointed
+    with open(exporter.path(partitions[0]), 'a') as output:
+        output.write('{"id": "partial"}\n')
+    calls = len(collection.calls)
+    result = exporter.export()
+    assert result['done'] and result['documents'] == 10
+    # Only the unfinished partition is scanned again, from its checkpointed offset
+    assert [int(c['offset']) for c in collection.calls[calls:]] == [2, 4]
+    assert read_ids(exporter.path(partitions[0])) == ['doc-%d' % i for i in range(5)]
+    assert sorted(read_ids(path) for path in result['files']) == [
+        ['doc-0', 'doc-1', 'doc-2', 'doc-3', 'doc-4'], ['doc-5', 'doc-6', 'doc-7'],
+        ['doc-8', 'doc-9']]
+    assert exporter.export()['documents'] == 10
+    assert len(collection.calls) == calls + 2
+
+
+@responses.activate
+def test_export_sorts_pages_and_rejects_partitions_too_deep(tmpdir, discovery):
+    collection = FakeCollection(make_documents())
+    responses.add_callback(responses.GET, query_url, callback=collection,
+                           content_type='application/json')
+    responses.add(responses.GET, query_url, status=200, content_type='application/json',
+                  body=json.dumps({'matching_results': 20000, 'results': []}))
+    exporter = CollectionExporter(discovery, 'env', 'coll', str(tmpdir),
+                                  [Partition('b', 'source::"b"')], retries=0)
+    assert exporter.export()['done']
+    assert collection.calls[0]['sort'] == 'id'
+
+    # Partitions deeper than offset paging can reach fail instead of stopping short
+    responses.reset()
+    responses.add(responses.GET, query_url, status=200, content_type='application/json',
+                  body=json.dumps({'matching_results': 20000, 'results': []}))
+    exporter = CollectionExporter(discovery, 'env', 'coll', str(tmpdir),
+                                  [Partition('big', 'source::"a"')], sort='-date')
+    result = exporter.export()
+    assert not result['done']
+    assert 'split it' in result['partitions']['big']['error']
+    assert 'sort=-date' in responses.calls[0].request.url
@@ -0,0 +1,70 @@
+# coding: utf-8
+import json
+
+import responses
+
+from watson_developer_cloud.discovery_federated_fanout import QueryTarget, \
+    fanout_query
+
+base_url = 'https://gateway.watsonplatform.net/discovery/api/v1/environments/'
+
+try:
+    from urllib.parse import parse_qs, urlparse
+except ImportError:
+    from urlparse import parse_qs, urlparse
+
+
+def ranked(scores, prefix):
+    """A query endpoint returning results with these scores, in order."""
+
+    def callback(request):
+        params = parse_qs(urlparse(request.url).query)
+        offset, count = int(params['offset'][0]), int(params['count'][0])
+        results = [{'id': '%s-%d' % (prefix, i), 'title': 'title-%s' % score,
+                    'result_metadata': {'score': score}}
+                   for i, score in enumerate(scores)][offset:offset + count]
+        return 200, {}, json.dumps({'matching_results': len(scores), 'results': results})
+
+    return callback
+
+
+@responses.activate
+def test_merges_by_score_with_dedup(discovery):
+    responses.add_callback(responses.GET, base_url + 'env1/collections/c1/query',
+                           callback=ranked([0.9, 0.5, 0.4, 0.1], 'a'),
+                           content_type='application/json')
+    responses.add_callback(responses.GET, base_url + 'env2/query',
+                           callback=ranked([0.8, 0.5, 0.3], 'b'),
+                           content_type='application/json')
+    targets = [QueryTarget(discovery, 'env1', 'c1'),
+               QueryTarget(discovery, 'env2', ['c2', 'c3'])]
+
+    response = fanout_query(targets, top_k=4, deduplicate_field='title',
+                            query='pizza', page_size=2)
+
+    # b-1 has the same title as a-1
+    assert [r['id'] for r in response['results']] == ['a-0', 'b-0', 'a-1', 'a-2']
+    assert [r['environment_id'] for r in response['results']] == [
+        'env1', 'env2', 'env1', 'env1']
+    assert response['matching_results'] == 7
+    assert response['errors'] == []
+    # Two pages from each target; a-3 and b-2 are fetched but not needed
+    assert len(responses.calls) == 4
+    federated = [c for c in responses.calls if 'env2' in c.request.url][0]
+    assert parse_qs(urlparse(federated.request.url).query)['collection_ids'] == \
+        ['c2,c3']
+
+
+@responses.activate
+def test_failed_target_is_reported(discovery):
+    responses.add_callback(responses.GET, base_url + 'env1/collections/c1/query',
+                           callback=ranked([0.9, 0.2], 'a'),
+                           content_type='application/json')
+    responses.add(responses.GET, base_url + 'env2/collections/c2/query', status=500,
+                  json={'error': 'down'})
+    targets = [QueryTarget(discovery, 'env1', 'c1'),
+               QueryTarget(discovery, 'env2', 'c2')]
+    response = fanout_query(targets, top_k=5)
+    assert [r['id'] for r in response['results']] == ['a-0', 'a-1']
+    assert response['errors'][0]['target'] is targets[1]
+    assert response['matching_results'] == 2
@@ -0,0 +1,114 @@
+# coding: utf-8
+import json
+import threading
+
+import responses
+
+from watson_developer_cloud.checkpoint import SqliteCheckpoint
+from watson_developer_cloud.discovery_ingestion import DocumentIngester, \
+    walk_documents
+
+documents_url = ('https://gateway.watsonplatform.net/discovery/api/v1/environments/'
+                 'env/collections/coll/documents')
+
+
+def make_tree(tmpdir):
+    tmpdir.mkdir('b').join('two.json').write('{"b": 2}')
+    tmpdir.join('one.json').write('{"a": 1}')
+    tmpdir.join('skip.txt').write('x')
+    return str(tmpdir)
+
+
+class FakeCollection(object):
+
+    def __init__(self, fail=()):
+        self.fail = set(fail)
+        self.uploads = []
+        self.lock = threading.Lock()
+
+    def __call__(self, request):
+        body = request.body
+        body = body if isinstance(body, bytes) else body.encode('utf-8')
+        with self.lock:
+            self.uploads.append(body)
+            number = len(self.uploads)
+        for name in self.fail:
+            if name.encode('utf-8') in body:
+                return 400, {}, json.dumps({'error': 'bad document'})
+        return 202, {}, json.dumps({'document_id': 'doc-%d' % number,
+                                    'status': 'processing'})
+
+
+def test_walk_documents(tmpdir):
+    root = make_tree(tmpdir)
+    assert [p[len(root) + 1:] for p in walk_documents(root, ['.JSON'])] == \
+        ['one.json', 'b/two.json']
+
+
+@responses.activate
+def test_ingest_resumes_from_checkpoint(tmpdir, discovery):
+    root = make_tree(tmpdir.mkdir('docs'))
+    checkpoint = str(tmpdir.join('ingest.db'))
+    collection = FakeCollection(fail=['two.json'])
+    responses.add_callback(responses.POST, documents_url, callback=collection,
+                           content_type='application/json')
+
+    seen = []
+    ingester = DocumentIngester(discovery, 'env', 'coll', checkpoint_path=checkpoint,
+                                max_workers=2, retries=0)
+    report = ingester.ingest_directory(root, ['.json'],
+                                       on_result=lambda *args: seen.append(args[0]))
+    assert (report.uploaded, report.failed, report.skipped) == (1, 1, 0)
+    assert report.bytes == len('{"a": 1}')
+    assert report.documents_per_second > 0
+    assert sorted(seen) == sorted(walk_documents(root, ['.json']))
+    assert json.loads(str(report))['failures'][0]['key'].endswith('two.json')
+
+    # The failed document is retried, the uploaded one is skipped
+    collection.fail.clear()
+    report = DocumentIngester(discovery, 'env', 'coll',
+                              checkpoint_path=checkpoint).ingest_directory(root)
+    assert (report.uploaded, report.failed, report.skipped) == (2, 0, 1)
+    assert len(collection.uploads) == 4
+    with SqliteCheckpoint(checkpoint) as records:
+        assert records.counts() == {'uploaded': 3}
+        assert records.get(root + '/one.json')['document_id'].startswith('doc-')
+
+
+@responses.activate
+def test_ingest_iterable_with_retries(discovery):
+    responses.add(responses.POST, documents_url, status=503, json={'error': 'busy'})
+    responses.add(responses.POST, documents_url, status=202,
+                  json={'document_id': 'd1', 'status': 'processing'})
+    ingester = DocumentIngester(discovery, 'env', 'coll', backoff=0.001)
+    report = ingester.ingest([{'key': 'k1', 'file': b'hello', 'filename': 'a.txt',
+                               'metadata': {'source': 'test'}}])
+    assert (report.uploaded, report.attempts) == (1, 2)
+    body = responses.calls[1].request.body
+    assert b'hello' in body and b'"source": "test"' in body
+
+
+@responses.activate
+def test_ingest_does_not_resend_after_server_errors(discovery):
+    responses.add(responses.POST, documents_url, status=500, json={'error': 'oops'})
+    responses.add(responses.POST, documents_url, status=202,
+                  json={'document_id': 'd1', 'status': 'processing'})
+    ingester = DocumentIngester(discovery, 'env', 'coll', backoff=0.001)
+    report = ingester.ingest([{'key': 'k1', 'file': b'hello', 'filename': 'a.txt'}])
+    # The document may have been added before the error: don't add it twice
+    assert (report.failed, report.attempts) == (1, 1)
+    assert len(responses.calls) == 1
+
+
+@responses.activate
+def test_ingest_streaming(tmpdir, discovery):
+    root = make_tree(tmpdir)
+    collection = FakeCollection()
+    responses.add_callback(responses.POST, documents_url, callback=collection,
+                           content_type='application/json')
+    report = DocumentIngester(discovery, 'env', 'coll', max_workers=2,
+                              streaming=True).ingest_directory(root, ['.json'])
+    assert (report.uploaded, report.failed) == (2, 0)
+    assert report.bytes == len('{"a": 1}') + len('{"b": 2}')
+    assert sorted(b'filename="one.json"' in body for body in collection.uploads) == \
+        [False, True]
@@ -0,0 +1,81 @@
+# coding: utf-8
+import json
+
+import responses
+
+try:
+    from urllib.parse import parse_qs, urlparse  # Python 3
+except ImportError:
+    from urlparse import parse_qs, urlparse  # Python 2
+
+from watson_developer_cloud.discovery_notices import NoticeAggregator, notices, \
+    summarize_notices
+
+environment_url = 'https://gateway.watsonplatform.net/discovery/api/v1/environments/env'
+
+
+def make_results():
+    results = []
+    for i in range(7):
+        notice = {'notice_id': 'index_failed' if i % 3 == 0 else 'smart_quote',
+                  'severity': 'error' if i % 3 == 0 else 'warning',
+                  'step': 'indexing' if i % 3 == 0 else 'conversion',
+                  'description': 'description %d' % i,
+                  'created': '2017-11-0%dT00:00:00Z' % (7 - i)}
+        results.append({'id': 'doc-%d' % i, 'notices': [notice]})
+    return results
+
+
+def serve(results):
+
+    def callback(request):
+        args = parse_qs(urlparse(request.url).query)
+        offset, count = int(args['offset'][0]), int(args['count'][0])
+        return 200, {}, json.dumps({'matching_results': len(results),
+                                    'results': results[offset:offset + count]})
+
+    return callback
+
+
+@responses.activate
+def test_notices_pages_through_results(discovery):
+    responses.add_callback(responses.GET, environment_url + '/collections/coll/notices',
+                           callback=serve(make_results()),
+                           content_type='application/json')
+    found = list(notices(discovery, 'env', 'coll', page_size=3,
+                         filter='notices.severity::"error"'))
+    assert [n['document_id'] for n in found] == ['doc-%d' % i for i in range(7)]
+    assert len(responses.calls) == 3
+    assert 'filter=notices.severity' in responses.calls[0].request.url
+
+
+@responses.activate
+def test_summarize_federated_notices(discovery):
+    responses.add_callback(responses.GET, environment_url + '/notices',
+                           callback=serve(make_results()),
+                           content_type='application/json')
+    summary = summarize_notices(discovery, 'env', ['a', 'b'], max_samples=2,
+                                page_size=5)
+    assert 'collection_ids=a%2Cb' in responses.calls[0].request.url
+    assert summary.total == 7
+    assert summary.severities() == {'error': 3, 'warning': 4}
+    groups = summary.groups()
+    assert [(g['notice_id'], g['count']) for g in groups] == [('smart_quote', 4),
+                                                              ('index_failed', 3)]
+    assert groups[1]['sample_document_ids'] == ['doc-0', 'doc-3']
+    assert groups[1]['first_created'] == '2017-11-01T00:00:00Z'
+    assert groups[1]['last_created'] == '2017-11-07T00:00:00Z'
+    assert [g['notice_id'] for g in summary.groups(severity='error')] == ['index_failed']
+    assert json.loads(str(summary))['total'] == 7
+
+
+def test_aggregator_memory_is_bounded():
+    aggregator = NoticeAggregator(max_samples=3, max_groups=2)
+    for i in range(10000):
+        aggregator.add({'notice_id': 'n%d' % (i % 3), 'severity': 'warning',
+                        'step': 'enrichment', 'document_id': 'doc-%d' % i})
+    assert aggregator.total == 10000
+    assert len(aggregator.groups()) == 2
+    assert aggregator.overflow == 3333
+    assert aggregator.severities() == {'warning': 10000}
+    assert all(len(g['sample_document_ids']) == 3 for g in aggregator.groups())
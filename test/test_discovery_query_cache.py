@@ -0,0 +1,110 @@
+# coding: utf-8
+import pytest
+import responses
+
+from watson_developer_cloud.cache import LRUCache, SqliteCache
+from watson_developer_cloud.discovery_v1 import DiscoveryV1
+
+base_url = 'https://gateway.watsonplatform.net/discovery/api/v1/environments/env/'
+
+
+def cached_discovery():
+    discovery = DiscoveryV1('2017-11-07', username='username', password='password')
+    discovery.set_query_cache(LRUCache(max_size=10, ttl=60))
+    return discovery
+
+
+@responses.activate
+def test_normalized_queries_hit_the_cache():
+    responses.add(responses.GET, base_url + 'collections/coll/query',
+                  json={'matching_results': 1, 'results': [{'id': 'a'}]})
+    discovery = cached_discovery()
+
+    first = discovery.query('env', 'coll', query='pizza', sort=['-date', 'id'],
+                            return_fields=['title', 'id'])
+    first['results'].append({'id': 'mutated'})
+    second = discovery.query('env', 'coll', sort='-date, id', query='pizza',
+                             return_fields='id,title')
+    assert second == {'matching_results': 1, 'results': [{'id': 'a'}]}
+    assert len(responses.calls) == 1
+
+    # Sort order is significant, and so is every other parameter
+    discovery.query('env', 'coll', query='pizza', sort=['id', '-date'],
+                    return_fields=['title', 'id'])
+    discovery.query('env', 'coll', query='pizza', sort=['-date', 'id'],
+                    return_fields=['title', 'id'], count=5)
+    assert len(responses.calls) == 3
+
+
+@responses.activate
+def test_document_changes_invalidate_the_collection():
+    for collection in ['coll', 'other']:
+        responses.add(responses.GET, base_url + 'collections/%s/query' % collection,
+                      json={'matching_results': 0, 'results': []})
+    responses.add(responses.POST, base_url + 'collections/coll/documents',
+                  json={'document_id': 'd1', 'status': 'processing'})
+    responses.add(responses.POST, base_url + 'collections/coll/documents/d1',
+                  json={'document_id': 'd1', 'status': 'processing'})
+    responses.add(responses.DELETE, base_url + 'collections/coll/documents/d1',
+                  json={'document_id': 'd1', 'status': 'deleted'})
+    discovery = cached_discovery()
+    changes = []
+    discovery.add_change_listener(lambda env, coll: changes.append((env, coll)))
+
+    def query_both():
+        discovery.query('env', 'coll', query='q')
+        discovery.query('env', 'other', query='q')
+
+    query_both()
+    discovery.add_document('env', 'coll', file=b'{}', filename='a.json')
+    query_both()
+    discovery.update_document('env', 'coll', 'd1', metadata='{"a": 1}')
+    discovery.delete_document('env', 'coll', 'd1')
+    query_both()
+
+    queries = [c for c in responses.calls if c.request.method == 'GET']
+    assert [q.request.url.split('?')[0].rsplit('/', 2)[1] for q in queries] == \
+        ['coll', 'other', 'coll', 'coll']
+    assert changes == [('env', 'coll')] * 3
+
+
+@responses.activate
+def test_configuration_changes_invalidate_the_environment():
+    for collection in ['coll', 'other']:
+        responses.add(responses.GET, base_url + 'collections/%s/query' % collection,
+                      json={'matching_results': 0, 'results': []})
+    responses.add(responses.PUT, base_url + 'configurations/conf',
+                  json={'configuration_id': 'conf'})
+    discovery = cached_discovery()
+    discovery.query('env', 'coll', query='q')
+    discovery.query('env', 'other', query='q')
+    discovery.update_configuration('env', 'conf', 'tuned')
+    discovery.query('env', 'coll', query='q')
+    discovery.query('env', 'other', query='q')
+    assert len([c for c in responses.calls if c.request.method == 'GET']) == 4
+
+
+@responses.activate
+def test_response_of_a_query_overtaken_by_a_change_is_not_cached():
+    discovery = cached_discovery()
+
+    def callback(request):
+        # The collection changes while the query is in flight
+        discovery._collection_changed('env', 'coll')
+        return 200, {}, '{"matching_results": 0, "results": []}'
+
+    responses.add_callback(responses.GET, base_url + 'collections/coll/query',
+                           callback=callback, content_type='application/json')
+    discovery.query('env', 'coll', query='q')
+    assert len(discovery.query_cache) == 0
+    discovery.query('env', 'coll', query='q')
+    assert len(responses.calls) == 2
+
+
+def test_query_cache_must_support_invalidation(tmpdir):
+    discovery = cached_discovery()
+    with SqliteCache(str(tmpdir.join('cache.db'))) as cache:
+        with pytest.raises(ValueError):
+            discovery.set_query_cache(cache)
+    discovery.set_query_cache(None)
+    assert discovery.query_cache is None
@@ -0,0 +1,79 @@
+# coding: utf-8
+import json
+
+import pytest
+import responses
+
+from watson_developer_cloud.discovery_query_iterator import PagedResults, \
+    query_results
+
+query_url = ('https://gateway.watsonplatform.net/discovery/api/v1/environments/'
+             'env/collections/coll/query')
+
+try:
+    from urllib.parse import parse_qs, urlparse
+except ImportError:
+    from urlparse import parse_qs, urlparse
+
+
+def paged_collection(total):
+    def callback(request):
+        params = parse_qs(urlparse(request.url).query)
+        offset, count = int(params['offset'][0]), int(params['count'][0])
+        results = [{'id': 'doc-%d' % i} for i in range(offset, min(total, offset + count))]
+        return 200, {}, json.dumps({'matching_results': total, 'results': results,
+                                    'aggregations': [{'type': 'term'}]})
+    return callback
+
+
+@responses.activate
+@pytest.mark.parametrize('prefetch', [True, False])
+def test_iterates_all_pages(prefetch, discovery):
+    responses.add_callback(responses.GET, query_url, callback=paged_collection(25),
+                           content_type='application/json')
+    results = query_results(discovery, 'env', 'coll', page_size=10,
+                            prefetch=prefetch, return_fields=['id', 'title'],
+                            sort=['id'])
+    assert [r['id'] for r in results] == ['doc-%d' % i for i in range(25)]
+    assert (results.pages, results.matching_results) == (3, 25)
+    assert results.first_page['aggregations'] == [{'type': 'term'}]
+    assert len(responses.calls) == 3  # no request past matching_results
+    params = parse_qs(urlparse(responses.calls[2].request.url).query)
+    assert params['offset'] == ['20'] and params['return'] == ['id,title']
+
+
+@responses.activate
+def test_max_results_limits_requests(discovery):
+    responses.add_callback(responses.GET, query_url, callback=paged_collection(1000),
+                           content_type='application/json')
+    results = list(query_results(discovery, 'env', 'coll', page_size=10,
+                                 max_results=15))
+    assert len(results) == 15
+    assert parse_qs(urlparse(responses.calls[1].request.url).query)['count'] == ['5']
+    assert len(responses.calls) == 2
+
+
+@responses.activate
+def test_empty_result_set(discovery):
+    responses.add_callback(responses.GET, query_url, callback=paged_collection(0),
+                           content_type='application/json')
+    assert list(query_results(discovery, 'env', 'coll')) == []
+    assert len(responses.calls) == 1
+
+
+def test_offset_ceiling_raises_after_reachable_results():
+    requests = []
+
+    def fetch_page(offset, count):
+        requests.append((offset, count))
+        return {'matching_results': 40,
+                'results': [{'id': i} for i in range(offset, offset + count)]}
+
+    results = PagedResults(fetch_page, page_size=10, prefetch=False, max_depth=25)
+    seen = []
+    with pytest.raises(ValueError) as error:
+        for result in results:
+            seen.append(result['id'])
+    assert seen == list(range(25))
+    assert requests == [(0, 10), (10, 10), (20, 5)]
+    assert 'matches 40' in str(error.value)
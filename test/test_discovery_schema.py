@@ -0,0 +1,120 @@
+# coding: utf-8
+import json
+
+import pytest
+import responses
+
+from watson_developer_cloud.discovery_schema import FieldSchema, SchemaIndex
+
+base_url = 'https://gateway.watsonplatform.net/discovery/api/v1/environments/env'
+
+FIELDS = [
+    {'field': 'title', 'type': 'string'},
+    {'field': 'publication_date', 'type': 'date'},
+    {'field': 'enriched_text', 'type': 'object'},
+    {'field': 'enriched_text.concepts', 'type': 'nested'},
+    {'field': 'enriched_text.concepts.text', 'type': 'string'},
+    {'field': 'enriched_text.concepts.relevance', 'type': 'double'},
+    {'field': 'enriched_title.entities.text', 'type': 'string'},
+]
+
+
+def add_fields(collection_id, fields):
+    responses.add(responses.GET, '%s/collections/%s/fields' % (base_url, collection_id),
+                  body=json.dumps({'fields': fields}), status=200,
+                  content_type='application/json')
+
+
+def test_field_schema_lookups():
+    schema = FieldSchema(FIELDS)
+    assert len(schema) == 7 and 'title' in schema
+    assert schema.type('enriched_text.concepts') == 'nested'
+    assert schema.type('missing') is None
+    assert schema.with_prefix('enriched_t') == [
+        'enriched_text', 'enriched_text.concepts', 'enriched_text.concepts.relevance',
+        'enriched_text.concepts.text', 'enriched_title.entities.text']
+    assert schema.children('enriched_text.concepts') == [
+        'enriched_text.concepts.relevance', 'enriched_text.concepts.text']
+    assert schema.has_path('enriched_title.entities')
+    assert schema.unknown_fields('title, enriched_title ,body',
+                                 sort='-publication_date,+author') == ['body', 'author']
+    schema.validate(['title', 'enriched_text.concepts.text'], sort='-title')
+    with pytest.raises(ValueError) as error:
+        schema.validate('titel')
+    assert 'titel' in str(error.value)
+
+    merged = FieldSchema.merge([FieldSchema(FIELDS[:1]),
+                                FieldSchema([{'field': 'title', 'type': 'date'},
+                                             {'field': 'body', 'type': 'string'}])])
+    assert merged.types == {'title': 'string', 'body': 'string'}
+
+
+@responses.activate
+def test_schema_index_caches_and_invalidates(discovery):
+    add_fields('coll', FIELDS)
+    add_fields('other', [{'field': 'body', 'type': 'string'}])
+    responses.add(responses.PUT, base_url + '/collections/coll',
+                  body=json.dumps({'collection_id': 'coll'}), status=200,
+                  content_type='application/json')
+    responses.add(responses.PUT, base_url + '/configurations/conf',
+                  body=json.dumps({'configuration_id': 'conf'}), status=200,
+                  content_type='application/json')
+    index = SchemaIndex(discovery, ttl=None)
+
+    assert index.schema('env', 'coll').type('title') == 'string'
+    index.validate('env', 'coll', return_fields='title')
+    assert index.fetches == 1 and len(responses.calls) == 1
+
+    assert index.schema('env', ['coll', 'other']).has_path('body')
+    assert index.fetches == 2
+    with pytest.raises(ValueError):
+        index.validate('env', ['coll'], sort='body')
+
+    discovery.update_collection('env', 'coll', 'renamed')
+    index.schema('env', 'other')
+    assert index.fetches == 2
+    index.schema('env', 'coll')
+    assert index.fetches == 3
+
+    discovery.update_configuration('env', 'conf', 'tuned')
+    index.schema('env', ['coll', 'other'])
+    assert index.fetches == 5
+
+    index.close()
+    discovery.update_collection('env', 'coll', 'renamed again')
+    index.schema('env', 'coll')
+    assert index.fetches == 5
+
+
+@responses.activate
+def test_schema_index_ignores_document_changes_and_failed_fetches(discovery):
+    responses.add(responses.GET, base_url + '/collections/coll/fields', status=500,
+                  body=json.dumps({'error': 'down'}), content_type='application/json')
+    add_fields('coll', FIELDS)
+    responses.add(responses.DELETE, base_url + '/collections/coll/documents/d1',
+                  body=json.dumps({'document_id': 'd1', 'status': 'deleted'}),
+                  status=200, content_type='application/json')
+    index = SchemaIndex(discovery, ttl=None)
+    with pytest.raises(Exception):
+        index.schema('env', 'coll')
+    assert not index._fetch_locks
+
+    index.schema('env', 'coll')
+    discovery.delete_document('env', 'coll', 'd1')
+    index.schema('env', 'coll')
+    assert index.fetches == 1
+
+
+@responses.activate
+def test_schema_index_ttl(monkeypatch, discovery):
+    add_fields('coll', FIELDS)
+    index = SchemaIndex(discovery, ttl=60)
+    now = [1000.0]
+    monkeypatch.setattr('watson_developer_cloud.cache._clock', lambda: now[0])
+    index.schema('env', 'coll')
+    now[0] += 30
+    index.schema('env', 'coll')
+    assert index.fetches == 1
+    now[0] += 31
+    index.schema('env', 'coll')
+    assert index.fetches == 2
@@ -0,0 +1,102 @@
+# coding: utf-8
+import json
+import re
+
+import responses
+
+from watson_developer_cloud.discovery_status_tracker import DocumentStatusTracker
+from watson_developer_cloud.discovery_v1 import DiscoveryV1
+
+collection_url = ('https://gateway.watsonplatform.net/discovery/api/v1/environments/'
+                  'env/collections/coll')
+
+
+def tracker(**kwargs):
+    discovery = DiscoveryV1('2017-11-07', username='username', password='password')
+    return DocumentStatusTracker(discovery, 'env', 'coll', initial_interval=0.01,
+                                 max_interval=0.04, **kwargs)
+
+
+def collection_counts(processing):
+    return {'collection_id': 'coll',
+            'document_counts': {'available': 5, 'processing': processing, 'failed': 1}}
+
+
+def calls_to(path):
+    return [c for c in responses.calls if c.request.url.split('?')[0].endswith(path)]
+
+
+@responses.activate
+def test_polls_until_done_with_backoff():
+    polls = {'a': [], 'b': []}
+
+    def document_status(request):
+        document_id = request.url.split('?')[0].rsplit('/', 1)[1]
+        polls[document_id].append(request)
+        if document_id == 'a' or len(polls['b']) >= 3:
+            status = 'failed' if document_id == 'b' else 'available'
+            notices = [{'notice_id': 'index_failed', 'severity': 'error'}] \
+                if document_id == 'b' else []
+            return 200, {}, json.dumps({'document_id': document_id, 'status': status,
+                                        'status_description': status,
+                                        'notices': notices})
+        return 200, {}, json.dumps({'document_id': document_id,
+                                    'status': 'processing', 'notices': []})
+
+    responses.add(responses.GET, collection_url, json=collection_counts(2))
+    responses.add_callback(responses.GET,
+                           re.compile(re.escape(collection_url) + '/documents/.*'),
+                           callback=document_status, content_type='application/json')
+    report = tracker().track(['a', 'b'])
+
+    assert report.statuses == {'a': 'available', 'b': 'failed'}
+    assert len(polls['a']) == 1  # finished documents are not polled again
+    assert len(polls['b']) == 3
+    assert report.failed() == [{'document_id': 'b', 'status_description': 'failed',
+                                'notices': [{'notice_id': 'index_failed',
+                                             'severity': 'error'}]}]
+    assert report.calls['get_document_status'] == 4
+
+
+@responses.activate
+def test_resolves_with_notices_when_collection_is_idle():
+    responses.add(responses.GET, collection_url, json=collection_counts(0))
+    responses.add(responses.GET, collection_url + '/notices', json={
+        'matching_results': 2,
+        'results': [
+            {'id': 'b', 'notices': [{'notice_id': 'x', 'severity': 'error'}]},
+            {'id': 'c', 'notices': [{'notice_id': 'y', 'severity': 'warning'}]}]
+    })
+    responses.add(responses.GET, collection_url + '/query',
+                  json={'matching_results': 1, 'results': [{'id': 'a'}]})
+    report = tracker(notices_batch_size=2).track(['a', 'b', 'c', 'd'])
+
+    # d has no notices and no indexed document: it was never seen
+    assert report.statuses == {'a': 'available', 'b': 'failed',
+                               'c': 'available with notices', 'd': 'unknown'}
+    assert report.calls == {'get_document_status': 0, 'get_collection': 1,
+                            'query_notices': 2, 'query': 2}
+    assert 'filter=id%3A%3A%22a%22%7Cid%3A%3A%22b%22' in \
+        calls_to('/notices')[0].request.url
+    assert json.loads(str(report))['counts']['failed'] == 1
+
+
+@responses.activate
+def test_timeout_reports_pending():
+    responses.add(responses.GET, collection_url, json=collection_counts(1))
+    responses.add(responses.GET, collection_url + '/documents/a',
+                  json={'document_id': 'a', 'status': 'processing'})
+    report = tracker().track(['a'], timeout=0.05)
+    assert report.pending() == ['a']
+
+
+@responses.activate
+def test_polls_documents_when_collection_cannot_be_read():
+    responses.add(responses.GET, collection_url, status=500, json={'error': 'down'})
+    responses.add(responses.GET, collection_url + '/documents/a',
+                  json={'document_id': 'a', 'status': 'available', 'notices': []})
+    report = tracker(retries=0).track(['a'])
+    assert report.statuses == {'a': 'available'}
+    # Once before and once after the first poll interval
+    assert report.calls['get_collection'] == 2
+    assert report.calls['get_document_status'] == 1
@@ -0,0 +1,90 @@
+# coding: utf-8
+import io
+import json
+
+import requests
+import responses
+
+from watson_developer_cloud.discovery_streaming_upload import MultipartStream, \
+    add_document_streaming, update_document_streaming
+
+documents_url = ('https://gateway.watsonplatform.net/discovery/api/v1/environments/'
+                 'env/collections/coll/documents')
+
+
+def requests_body(boundary, files):
+    request = requests.Request('POST', 'http://localhost', files=files).prepare()
+    default = request.headers['Content-Type'].split('boundary=')[1]
+    return request.body.replace(default.encode('ascii'), boundary.encode('ascii'))
+
+
+def test_body_matches_requests_encoding(tmpdir):
+    path = tmpdir.join('doc.json')
+    path.write_binary(b'{"text": "hello"}' * 1000)
+    with MultipartStream(boundary='b0undary', chunk_size=1000) as body:
+        body.add_file('file', str(path), content_type='application/json')
+        body.add_field('metadata', u'{"title": "caf\xe9"}')
+        assert body.content_type == 'multipart/form-data; boundary=b0undary'
+        blocks = list(body)
+        assert max(len(block) for block in blocks) <= 1000
+        streamed = b''.join(blocks)
+        assert len(body) == len(streamed)
+
+    expected = requests_body('b0undary', [
+        ('file', ('doc.json', path.read_binary(), 'application/json')),
+        ('metadata', (None, u'{"title": "caf\xe9"}', 'text/plain'))])
+    assert streamed == expected
+
+
+def test_file_handle_and_rewind(tmpdir):
+    handle = io.BytesIO(b'header|payload')
+    handle.seek(7)
+    body = MultipartStream(boundary='x')
+    body.add_file('file', handle, filename='payload.txt', content_type='text/plain')
+    streamed = b''.join(body)
+    assert streamed.endswith(b'\r\n\r\npayload\r\n--x--\r\n')
+    assert body.read() == b''
+    body.rewind()
+    assert b''.join(body) == streamed
+    assert streamed.startswith(b'--x\r\nContent-Disposition: form-data; '
+                                     b'name="file"; filename="payload.txt"')
+
+    empty = tmpdir.join('empty.txt')
+    empty.write_binary(b'')
+    with MultipartStream(boundary='x') as body:
+        body.add_file('file', str(empty))
+        assert b''.join(body).count(b'\r\n\r\n\r\n--x--') == 1
+
+
+@responses.activate
+def test_add_and_update_document_streaming(tmpdir, discovery):
+    path = tmpdir.join('doc.json')
+    path.write_binary(b'{"a": 1}')
+    bodies = []
+
+    def callback(request):
+        bodies.append((request.headers['Content-Type'], request.body))
+        return 202, {}, json.dumps({'document_id': 'doc-1', 'status': 'processing'})
+
+    responses.add_callback(responses.POST, documents_url, callback=callback,
+                           content_type='application/json')
+    responses.add_callback(responses.POST, documents_url + '/doc-1', callback=callback,
+                           content_type='application/json')
+
+    changed = []
+    discovery.add_change_listener(lambda *args: changed.append(args))
+    response = add_document_streaming(discovery, 'env', 'coll', file=str(path),
+                                      metadata='{"k": "v"}')
+    assert response['document_id'] == 'doc-1'
+    with open(str(path), 'rb') as handle:
+        update_document_streaming(discovery, 'env', 'coll', 'doc-1', file=handle,
+                                  file_content_type='application/json')
+
+    assert changed == [('env', 'coll'), ('env', 'coll')]
+    content_type, body = bodies[0]
+    boundary = content_type.split('boundary=')[1]
+    assert body == requests_body(boundary, [
+        ('file', ('doc.json', b'{"a": 1}', 'application/octet-stream')),
+        ('metadata', (None, '{"k": "v"}', 'text/plain'))])
+    assert b'Content-Type: application/json\r\n\r\n{"a": 1}' in bodies[1][1]
+    assert '?version=2017-11-07' in responses.calls[0].request.url
@@ -0,0 +1,111 @@
+# coding: utf-8
+import json
+import threading
+
+import pytest
+import responses
+
+from watson_developer_cloud.discovery_sync import ContentIndex, DocumentSync, \
+    content_hash, metadata_hash
+
+documents_url = ('https://gateway.watsonplatform.net/discovery/api/v1/environments/'
+                 'env/collections/coll/documents')
+
+
+class FakeCollection(object):
+    """Records the calls and assigns sequential document IDs."""
+
+    def __init__(self):
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def __call__(self, request):
+        path = request.url.split('?')[0][len(documents_url):]
+        with self.lock:
+            self.calls.append((request.method, path))
+            number = len(self.calls)
+        if path == '/gone' and request.method == 'POST':
+            return 404, {}, json.dumps({'error': 'not found'})
+        if request.method == 'DELETE':
+            return 200, {}, json.dumps({'document_id': path[1:], 'status': 'deleted'})
+        document_id = path[1:] or 'doc-%d' % number
+        return 202, {}, json.dumps({'document_id': document_id, 'status': 'processing'})
+
+    def register(self):
+        for method in (responses.POST, responses.DELETE):
+            responses.add_callback(method, documents_url, callback=self,
+                                   content_type='application/json')
+            for document_id in ('doc-1', 'doc-2', 'doc-3', 'gone'):
+                responses.add_callback(method, documents_url + '/' + document_id,
+                                       callback=self, content_type='application/json')
+
+
+def test_hashes(tmpdir):
+    path = tmpdir.join('a.json')
+    path.write_binary(b'{"a": 1}')
+    assert content_hash(str(path)) == content_hash(b'{"a": 1}')
+    assert metadata_hash({'x': 1, 'y': 2}) == metadata_hash('{"y": 2, "x": 1}')
+    assert metadata_hash(None) is None
+
+
+def test_content_index(tmpdir):
+    with ContentIndex(str(tmpdir.join('index.db'))) as index:
+        index.record('a', 'doc-1', 'h1')
+        index.record('b', 'doc-2', 'h2', 'm2')
+        index.record('a', 'doc-1', 'h3')
+        assert index.get('a')['content_hash'] == 'h3'
+        index.delete('b')
+        assert index.items() == [('a', 'doc-1')] and len(index) == 1
+        assert index.get('b') is None
+    with pytest.raises(ValueError):
+        ContentIndex(None)
+
+
+@responses.activate
+def test_sync_moves_only_the_delta(tmpdir, discovery):
+    collection = FakeCollection()
+    collection.register()
+    docs = tmpdir.mkdir('docs')
+    for name in ('one', 'two', 'three'):
+        docs.join(name + '.json').write('{"name": "%s"}' % name)
+    index_path = str(tmpdir.join('index.db'))
+
+    sync = DocumentSync(discovery, 'env', 'coll', index_path, max_workers=2,
+                        retries=0)
+    report = sync.sync_directory(str(docs))
+    assert report.counts['added'] == 3 and report.calls == 3
+    assert report.counts['unchanged'] == 0
+
+    report = sync.sync_directory(str(docs))
+    assert report.counts['unchanged'] == 3 and report.calls == 0
+
+    docs.join('one.json').write('{"name": "uno"}')
+    docs.join('three.json').remove()
+    del collection.calls[:]
+    actions = []
+    report = sync.sync_directory(str(docs), delete_missing=True,
+                                 on_result=lambda *args: actions.append(args[1]))
+    assert sorted(actions) == ['deleted', 'unchanged', 'updated']
+    assert sorted(method for method, _ in collection.calls) == ['DELETE', 'POST']
+    assert all(path.startswith('/doc-') for _, path in collection.calls)
+    assert len(sync.index) == 2
+
+    # Metadata changes are updates too
+    key = str(docs.join('two.json'))
+    report = sync.sync([{'key': key, 'file': key, 'metadata': {'tag': 'x'}}])
+    assert report.counts['updated'] == 1
+    sync.close()
+
+
+@responses.activate
+def test_sync_re_adds_documents_removed_remotely(tmpdir, discovery):
+    collection = FakeCollection()
+    collection.register()
+    sync = DocumentSync(discovery, 'env', 'coll', str(tmpdir.join('index.db')),
+                        retries=0, streaming=True)
+    sync.index.record('doc', 'gone', 'stale')
+    report = sync.sync([{'key': 'doc', 'file': b'{"a": 1}', 'filename': 'a.json'}])
+    assert report.counts['added'] == 1 and report.calls == 2
+    assert collection.calls == [('POST', '/gone'), ('POST', '')]
+    assert sync.index.get('doc')['document_id'] == 'doc-2'
+    assert str(report).startswith('{')
@@ -0,0 +1,128 @@
+# coding: utf-8
+import json
+import threading
+
+import responses
+
+from watson_developer_cloud.discovery_training_sync import TrainingDataSync, \
+    read_training_csv
+
+training_url = ('https://gateway.watsonplatform.net/discovery/api/v1/environments/'
+                'env/collections/coll/training_data')
+
+
+class FakeTraining(object):
+    """An in-memory training data set served over the training endpoints."""
+
+    def __init__(self, queries):
+        self.queries = queries
+        self.writes = []
+        self.lock = threading.Lock()
+
+    def __call__(self, request):
+        path = request.url.split('?')[0][len(training_url):].strip('/')
+        parts = path.split('/') if path else []
+        body = json.loads(request.body) if request.body else {}
+        with self.lock:
+            if request.method != 'GET':
+                self.writes.append((request.method, path, body))
+            if request.method == 'GET' and not parts:
+                return 200, {}, json.dumps({'queries': [
+                    {'query_id': q['query_id'],
+                     'natural_language_query': q['natural_language_query']}
+                    for q in self.queries.values()]})
+            query = self.queries.get(parts[0]) if parts else None
+            if request.method == 'GET':
+                return 200, {}, json.dumps({'examples': query['examples']})
+            if request.method == 'POST' and not parts:
+                if body['natural_language_query'] == 'broken':
+                    return 400, {}, json.dumps({'error': 'invalid query'})
+                return 201, {}, json.dumps(dict(body, query_id='new'))
+            return 200, {}, json.dumps({})
+
+
+def register(fake):
+    for method in (responses.GET, responses.POST, responses.PUT, responses.DELETE):
+        responses.add_callback(method, training_url, callback=fake,
+                               content_type='application/json')
+        for query_id in ('q1', 'q2'):
+            url = '%s/%s' % (training_url, query_id)
+            responses.add_callback(method, url, callback=fake,
+                                   content_type='application/json')
+            responses.add_callback(method, url + '/examples', callback=fake,
+                                   content_type='application/json')
+            for document_id in ('d1', 'd2', 'd3'):
+                responses.add_callback(method, '%s/examples/%s' % (url, document_id),
+                                       callback=fake, content_type='application/json')
+
+
+def remote_set():
+    return {
+        'q1': {'query_id': 'q1', 'natural_language_query': 'pizza',
+               'examples': [{'document_id': 'd1', 'relevance': 10},
+                            {'document_id': 'd2', 'relevance': 0}]},
+        'q2': {'query_id': 'q2', 'natural_language_query': 'stale', 'examples': []},
+    }
+
+
+def test_read_training_csv(tmpdir):
+    path = tmpdir.join('training.csv')
+    path.write_binary(u'\ufeffpizza,d1,10,d2,0\n\nburgers,d3,5\n'.encode('utf-8'))
+    assert read_training_csv(str(path)) == [
+        {'natural_language_query': 'pizza',
+         'examples': [{'document_id': 'd1', 'relevance': 10},
+                      {'document_id': 'd2', 'relevance': 0}]},
+        {'natural_language_query': 'burgers',
+         'examples': [{'document_id': 'd3', 'relevance': 5}]}]
+
+
+@responses.activate
+def test_sync_applies_only_the_diff(discovery):
+    fake = FakeTraining(remote_set())
+    register(fake)
+    local = [
+        {'natural_language_query': 'pizza',
+         'examples': [{'document_id': 'd1', 'relevance': 10},
+                      {'document_id': 'd3', 'relevance': 5}]},
+        {'natural_language_query': 'pizza',
+         'examples': [{'document_id': 'd1', 'relevance': 8}]},
+        {'natural_language_query': 'burgers', 'filter': 'type:food',
+         'examples': [{'document_id': 'd2', 'relevance': 3}]},
+    ]
+    sync = TrainingDataSync(discovery, 'env', 'coll', max_workers=4, retries=0)
+
+    dry = sync.sync(local, prune=True, dry_run=True)
+    assert fake.writes == []
+    assert dry.counts == {'add_query': 1, 'delete_query': 1, 'create_example': 1,
+                          'update_example': 1, 'delete_example': 1}
+    # One listing of the queries, one listing of examples for the shared query
+    assert dry.calls == 2
+
+    report = sync.sync(local, prune=True)
+    assert report.counts == dry.counts and report.failures == []
+    assert sorted((method, path) for method, path, _ in fake.writes) == [
+        ('DELETE', 'q1/examples/d2'), ('DELETE', 'q2'), ('POST', ''),
+        ('POST', 'q1/examples'), ('PUT', 'q1/examples/d1')]
+    added = [body for method, path, body in fake.writes if path == ''][0]
+    assert added == {'natural_language_query': 'burgers', 'filter': 'type:food',
+                     'examples': [{'document_id': 'd2', 'relevance': 3}]}
+    updated = [body for _, path, body in fake.writes if path == 'q1/examples/d1'][0]
+    assert updated == {'relevance': 8}
+
+
+@responses.activate
+def test_sync_without_prune_keeps_remote_data_and_reports_failures(discovery):
+    fake = FakeTraining(remote_set())
+    register(fake)
+    results = []
+    report = TrainingDataSync(discovery, 'env', 'coll', retries=0).sync(
+        [{'natural_language_query': 'pizza',
+          'examples': [{'document_id': 'd1', 'relevance': 10}]},
+         {'natural_language_query': 'broken', 'examples': []}],
+        on_result=lambda *args: results.append(args))
+    assert report.unchanged == 1
+    assert report.counts['add_query'] == 0
+    assert [error for _, error in report.failures] == ['invalid query']
+    assert [method for method, _, _ in fake.writes] == ['POST']
+    assert json.loads(str(report))['failures'][0]['operation']['action'] == 'add_query'
+    assert len(results) == 1
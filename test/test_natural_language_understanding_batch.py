@@ -0,0 +1,74 @@
+# coding: utf-8
+import json
+import threading
+import time
+
+import responses
+
+from watson_developer_cloud.natural_language_understanding_batch import \
+    BatchAnalyzer, analyze_batch
+from watson_developer_cloud.natural_language_understanding_v1 import \
+    Features, KeywordsOptions
+
+analyze_url = 'https://gateway.watsonplatform.net/natural-language-understanding/api' \
+              '/v1/analyze'
+
+
+def echo(fail=(), flaky=None):
+    """An analyze endpoint answering with the text it received."""
+    attempts = {}
+    lock = threading.Lock()
+
+    def callback(request):
+        body = json.loads(request.body)
+        text = body.get('text') or body.get('html')
+        with lock:
+            attempts[text] = attempts.get(text, 0) + 1
+            count = attempts[text]
+        if text in fail:
+            return 400, {}, json.dumps({'error': 'unsupported text', 'code': 400})
+        if flaky is not None and text == flaky and count == 1:
+            headers = {'X-RateLimit-Limit': '10', 'X-RateLimit-Reset': '1510000000'}
+            return 429, headers, json.dumps({'error': 'rate limited', 'code': 429})
+        # Later inputs complete first
+        time.sleep(0.01 * (5 - len(text) % 5))
+        return 200, {}, json.dumps({'analyzed_text': text, 'body': body})
+
+    return callback
+
+
+@responses.activate
+def test_results_in_input_order_with_partial_failures(nlu):
+    responses.add_callback(responses.POST, analyze_url, callback=echo(fail=['bad']),
+                           content_type='application/json')
+    texts = ['t' * i for i in range(1, 8)] + ['bad']
+    analyzer = BatchAnalyzer(nlu, Features(keywords=KeywordsOptions(limit=2)),
+                             max_workers=4, language='en', retries=0)
+    results = list(analyzer.analyze(iter(texts)))
+    assert [r.index for r in results] == list(range(8))
+    assert [r.value['analyzed_text'] for r in results[:7]] == texts[:7]
+    assert results[0].value['body']['features'] == {'keywords': {'limit': 2}}
+    assert results[0].value['body']['language'] == 'en'
+    assert not results[7].ok
+    assert results[7].error.code == 400
+    assert analyzer.stats._to_dict() == {'succeeded': 7, 'failed': 1, 'calls': 8}
+
+
+@responses.activate
+def test_unordered_results_with_retries_and_dict_inputs(nlu):
+    responses.add_callback(responses.POST, analyze_url, callback=echo(flaky='<p>b</p>'),
+                           content_type='application/json')
+    items = [{'html': '<p>b</p>', 'clean': True}, 'aaaa', 'c']
+    results = list(analyze_batch(nlu, items, Features(keywords=KeywordsOptions()),
+                                 ordered=False, backoff=0.01, max_workers=3))
+    assert sorted(r.index for r in results) == [0, 1, 2]
+    assert all(r.ok for r in results)
+    html = [r for r in results if r.index == 0][0]
+    assert html.value['body']['clean'] is True
+    assert len(responses.calls) == 4
+
+
+def test_input_without_content_fails_alone(nlu):
+    analyzer = BatchAnalyzer(nlu, {'keywords': {}})
+    results = list(analyzer.analyze([{'language': 'en'}]))
+    assert isinstance(results[0].error, ValueError)
@@ -0,0 +1,61 @@
+# coding: utf-8
+import json
+
+import responses
+
+from watson_developer_cloud.cache import LRUCache, SqliteCache, TieredCache
+from watson_developer_cloud.natural_language_understanding_v1 import \
+    EntitiesOptions, Features, KeywordsOptions, NaturalLanguageUnderstandingV1
+
+analyze_url = 'https://gateway.watsonplatform.net/natural-language-understanding/api' \
+              '/v1/analyze'
+
+
+def nlu(cache, version='2017-02-27'):
+    service = NaturalLanguageUnderstandingV1(version, username='username',
+                                             password='password')
+    service.set_analysis_cache(cache)
+    return service
+
+
+def echo(request):
+    body = json.loads(request.body)
+    return 200, {}, json.dumps({'keywords': [{'text': body['text']}]})
+
+
+@responses.activate
+def test_identical_analyses_hit_the_cache():
+    responses.add_callback(responses.POST, analyze_url, callback=echo,
+                           content_type='application/json')
+    service = nlu(LRUCache(max_size=10))
+    features = Features(keywords=KeywordsOptions(limit=3))
+
+    first = service.analyze(features, text='some text')
+    first['keywords'].append({'text': 'mutated'})
+    second = service.analyze({'keywords': {'limit': 3}}, text='some text')
+    assert second == {'keywords': [{'text': 'some text'}]}
+    assert len(responses.calls) == 1
+
+    # Any other text, feature option, argument or version is a different analysis
+    service.analyze(features, text='other text')
+    service.analyze(Features(keywords=KeywordsOptions(limit=4)), text='some text')
+    service.analyze(Features(entities=EntitiesOptions(model='custom')),
+                    text='some text')
+    service.analyze(features, text='some text', language='en')
+    nlu(service.analysis_cache, '2017-06-01').analyze(features, text='some text')
+    assert len(responses.calls) == 6
+
+
+@responses.activate
+def test_persistent_cache_survives_clients(tmpdir):
+    responses.add_callback(responses.POST, analyze_url, callback=echo,
+                           content_type='application/json')
+    path = str(tmpdir.join('analyses.db'))
+    features = Features(keywords=KeywordsOptions())
+    with SqliteCache(path) as cache:
+        nlu(cache).analyze(features, text='corpus document')
+    cache = TieredCache(LRUCache(max_size=10), SqliteCache(path))
+    result = nlu(cache).analyze(features, text='corpus document')
+    assert result == {'keywords': [{'text': 'corpus document'}]}
+    assert len(responses.calls) == 1
+    cache.close()
@@ -0,0 +1,114 @@
+# coding: utf-8
+import json
+
+import pytest
+import responses
+
+from watson_developer_cloud.natural_language_understanding_chunking import \
+    analyze_long_text, merge_results, split_text
+from watson_developer_cloud.natural_language_understanding_v1 import \
+    EntitiesOptions, Features, SentimentOptions
+
+analyze_url = 'https://gateway.watsonplatform.net/natural-language-understanding/api' \
+              '/v1/analyze'
+
+
+def test_split_text_on_paragraphs_then_sentences():
+    text = 'First para. Short.\n\nSecond paragraph is longer. It has two sentences.' \
+           '\n\n' + 'x' * 25
+    chunks = split_text(text, 30)
+    assert ''.join(chunks) == text
+    assert all(len(chunk) <= 30 for chunk in chunks)
+    assert chunks[0] == 'First para. Short.\n\n'
+    assert chunks[1] == 'Second paragraph is longer. '
+    assert split_text('short', 30) == ['short']
+    assert split_text('', 30) == []
+    assert split_text('abcdefgh', 3) == ['abc', 'def', 'gh']
+
+
+def test_split_text_on_utf8_size():
+    text = u'Déjà vu. ' * 4 + u'日本語テキスト'
+    chunks = split_text(text, 12)
+    assert u''.join(chunks) == text
+    assert all(len(chunk.encode('utf-8')) <= 12 for chunk in chunks)
+    assert chunks[0] == u'Déjà vu. '
+    # Long words are cut between characters
+    assert chunks[-2:] == [u'日本語テ', u'キスト']
+    assert split_text(u'日本語', 4) == [u'日', u'本', u'語']
+
+
+def test_merge_weights_relevance_counts_and_sentiment():
+    first = {
+        'language': 'en',
+        'entities': [{'type': 'Person', 'text': 'Ada', 'relevance': 0.9, 'count': 3,
+                      'sentiment': {'score': 0.5}}],
+        'keywords': [{'text': 'engine', 'relevance': 0.8}],
+        'sentiment': {'document': {'score': 0.6, 'label': 'positive'}},
+        'emotion': {'document': {'emotion': {'joy': 0.8, 'anger': 0.0}}},
+        'usage': {'text_characters': 300, 'text_units': 1, 'features': 4}
+    }
+    second = {
+        'language': 'en',
+        'entities': [{'type': 'Person', 'text': 'Ada', 'relevance': 0.3, 'count': 1,
+                      'sentiment': {'score': -0.5}},
+                     {'type': 'Location', 'text': 'London', 'relevance': 1.0,
+                      'count': 1}],
+        'keywords': [{'text': 'Engine', 'relevance': 0.2},
+                     {'text': 'loom', 'relevance': 0.9}],
+        'sentiment': {'document': {'score': -0.6, 'label': 'negative'}},
+        'emotion': {'document': {'emotion': {'joy': 0.2, 'anger': 0.4}}},
+        'usage': {'text_characters': 100, 'text_units': 1, 'features': 4}
+    }
+    merged = merge_results([first, second], [300, 100],
+                           {'keywords': {'limit': 1}})
+    ada, london = merged['entities']
+    assert ada['text'] == 'Ada' and ada['count'] == 4
+    assert ada['relevance'] == pytest.approx((0.9 * 300 + 0.3 * 100) / 400)
+    assert ada['sentiment']['score'] == pytest.approx((0.5 * 3 - 0.5) / 4)
+    assert ada['sentiment']['label'] == 'positive'
+    assert london['relevance'] == pytest.approx(0.25)
+    assert merged['keywords'] == [{'text': 'engine', 'relevance': pytest.approx(0.65)}]
+    assert merged['sentiment']['document']['score'] == pytest.approx(0.3)
+    assert merged['emotion']['document']['emotion']['anger'] == pytest.approx(0.1)
+    assert merged['usage'] == {'text_characters': 400, 'text_units': 2, 'features': 8}
+    assert merged['language'] == 'en'
+
+    # No chunk has a document emotion: there is no document to report
+    merged = merge_results([{'emotion': {'targets': []}}])
+    assert merged['emotion'] == {'targets': []}
+
+
+@responses.activate
+def test_analyze_long_text_in_chunks(nlu):
+
+    def callback(request):
+        text = json.loads(request.body)['text']
+        score = 1.0 if text.startswith('Good') else -1.0
+        return 200, {}, json.dumps({
+            'sentiment': {'document': {'score': score}},
+            'entities': [{'type': 'Person', 'text': 'Ada', 'relevance': 1.0,
+                          'count': text.count('Ada')}],
+            'usage': {'text_characters': len(text)}})
+
+    responses.add_callback(responses.POST, analyze_url, callback=callback,
+                           content_type='application/json')
+    text = 'Good day, Ada. ' * 20 + '\n\n' + 'Bad day for Ada. ' * 5
+    features = Features(entities=EntitiesOptions(), sentiment=SentimentOptions())
+    merged = analyze_long_text(nlu, features, text, max_bytes=120,
+                               return_analyzed_text=True)
+    assert len(responses.calls) == 4
+    assert merged['analyzed_text'] == text
+    assert merged['usage']['text_characters'] == len(text)
+    assert merged['entities'][0]['count'] == 25
+    # The paragraph break ends the last positive chunk
+    expected = (302.0 - 85) / len(text)
+    assert merged['sentiment']['document']['score'] == pytest.approx(expected)
+
+
+@responses.activate
+def test_short_text_is_one_call(nlu):
+    responses.add(responses.POST, analyze_url, body='{"language": "en"}',
+                  content_type='application/json')
+    assert analyze_long_text(nlu, Features(sentiment=SentimentOptions()),
+                             'Short.') == {'language': 'en'}
+    assert len(responses.calls) == 1
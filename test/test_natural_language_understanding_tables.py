@@ -0,0 +1,105 @@
+# coding: utf-8
+import csv
+import io
+import json
+import math
+
+import pytest
+
+from watson_developer_cloud import natural_language_understanding_tables
+from watson_developer_cloud.natural_language_understanding_tables import \
+    ResultTables, write_tables
+
+results = [
+    {
+        'entities': [{'type': 'Person', 'text': 'Ada', 'relevance': 0.9, 'count': 2,
+                      'sentiment': {'score': 0.5},
+                      'disambiguation': {'name': 'Ada_Lovelace'}},
+                     {'type': 'Location', 'text': u'Zürich', 'relevance': 0.4,
+                      'count': 1}],
+        'keywords': [{'text': 'engine', 'relevance': 0.7,
+                      'emotion': {'joy': 0.6, 'anger': 0.1}}],
+        'semantic_roles': [{'sentence': 'Ada wrote notes.',
+                            'subject': {'text': 'Ada'},
+                            'action': {'text': 'wrote', 'normalized': 'write',
+                                       'verb': {'text': 'write', 'tense': 'past'}},
+                            'object': {'text': 'notes'}}]
+    },
+    {'language': 'en'},
+    {
+        'keywords': [{'text': 'loom', 'relevance': 0.2}],
+        'categories': [{'label': '/science', 'score': 0.8}]
+    }
+]
+
+vectorized_modes = [False]
+if natural_language_understanding_tables.numpy is not None:
+    vectorized_modes.append(True)
+
+
+@pytest.mark.parametrize('vectorized', vectorized_modes)
+def test_columns(vectorized):
+    tables = ResultTables.from_results(results, keys=['a', 'b', 'c'])
+    assert tables.documents == ['a', 'b', 'c']
+    entities = tables['entities']
+    assert len(entities) == 2
+    assert list(entities.column('document', vectorized)) == ['a', 'a']
+    assert list(entities.column('relevance', vectorized)) == [0.9, 0.4]
+    scores = list(entities.column('sentiment_score', vectorized))
+    assert scores[0] == 0.5 and math.isnan(scores[1])
+    assert list(entities.column('disambiguation', vectorized)) == ['Ada_Lovelace', None]
+    keywords = tables['keywords']
+    assert list(keywords.column('document', vectorized)) == ['a', 'c']
+    assert list(keywords.column('joy', vectorized))[0] == 0.6
+    assert list(tables['categories'].column('label', vectorized)) == ['/science']
+    assert list(tables['semantic_roles'].column('action_tense', vectorized)) == ['past']
+    if vectorized:
+        assert entities.column('relevance', vectorized).dtype.kind == 'f'
+    with pytest.raises(KeyError):
+        entities.column('missing', vectorized)
+
+
+def test_write_csv_and_jsonl(tmpdir):
+    tables = ResultTables.from_results(results, features=['entities', 'keywords'])
+    paths = tables.write(str(tmpdir.join('csv')))
+    assert sorted(paths) == ['entities', 'keywords']
+    with io.open(paths['entities'], encoding='utf-8', newline='') as csv_file:
+        rows = list(csv.reader(csv_file))
+    assert rows[0][:4] == ['document', 'type', 'text', 'relevance']
+    assert rows[2][:5] == ['0', 'Location', u'Zürich', '0.4', '1']
+    assert rows[2][5] == ''
+
+    paths = tables.write(str(tmpdir.join('jsonl')), 'jsonl')
+    with io.open(paths['keywords'], encoding='utf-8') as jsonl_file:
+        lines = [json.loads(line) for line in jsonl_file]
+    assert [(line['document'], line['text']) for line in lines] == [(0, 'engine'),
+                                                                    (2, 'loom')]
+    assert lines[1]['joy'] is None
+
+    paths = tables.write(str(tmpdir.join('jsonl')), 'jsonl')
+    with io.open(paths['entities'], encoding='utf-8') as jsonl_file:
+        assert '"count":2,' in jsonl_file.readline()
+
+
+def test_write_in_chunks(tmpdir, monkeypatch):
+    monkeypatch.setattr(natural_language_understanding_tables, '_CHUNK_ROWS', 2)
+    tables = ResultTables.from_results([results[0]] * 3, features=['entities'])
+    path = tables.write(str(tmpdir), 'jsonl')['entities']
+    with io.open(path, encoding='utf-8') as jsonl_file:
+        lines = [json.loads(line) for line in jsonl_file]
+    assert [(line['document'], line['text']) for line in lines] == [
+        (0, 'Ada'), (0, u'Zürich'), (1, 'Ada'), (1, u'Zürich'), (2, 'Ada'),
+        (2, u'Zürich')]
+
+
+def test_write_tables_in_batches(tmpdir):
+    output_dir = str(tmpdir.join('out'))
+    stream = (('doc-%d' % i, results[i % 3]) for i in range(7))
+    counts = write_tables(stream, output_dir, keys=True, batch_size=2)
+    assert counts['entities'] == 6 and counts['keywords'] == 5
+    with io.open(str(tmpdir.join('out', 'keywords.csv')), encoding='utf-8') as csv_file:
+        rows = list(csv.reader(csv_file))
+    assert rows[0][0] == 'document'
+    assert [row[0] for row in rows[1:]] == ['doc-0', 'doc-2', 'doc-3', 'doc-5', 'doc-6']
+    with pytest.raises(ValueError):
+        ResultTables(['relations'])
@@ -0,0 +1,138 @@
+# coding: utf-8
+import json
+import threading
+import time
+
+import responses
+
+import watson_developer_cloud
+from watson_developer_cloud.tone_analyzer_v3 import ToneAnalyzerV3
+from watson_developer_cloud.tone_conversation_pipeline import TonePipeline, \
+    summarize_tone, update_user_tone
+
+message_url = ('https://gateway.watsonplatform.net/conversation/api/v1/'
+               'workspaces/ws/message')
+tone_url = 'https://gateway.watsonplatform.net/tone-analyzer/api/v3/tone'
+
+tone_response = {
+    'document_tone': {
+        'tone_categories': [
+            {'category_id': 'emotion_tone', 'tones': [
+                {'tone_name': 'Joy', 'score': 0.8},
+                {'tone_name': 'Anger', 'score': 0.1}]},
+            {'category_id': 'writing_tone', 'tones': [
+                {'tone_name': 'Analytical', 'score': 0.9},
+                {'tone_name': 'Tentative', 'score': 0.3}]},
+            {'category_id': 'social_tone', 'tones': [
+                {'tone_name': 'Openness', 'score': 0.1},
+                {'tone_name': 'Agreeableness', 'score': 0.5}]},
+        ]
+    }
+}
+
+
+def pipeline(**kwargs):
+    conversation = watson_developer_cloud.ConversationV1(
+        '2017-05-26', username='username', password='password')
+    tone_analyzer = ToneAnalyzerV3('2016-05-19', username='username',
+                                   password='password')
+    return TonePipeline(conversation, tone_analyzer, 'ws', **kwargs)
+
+
+def echo_context(request):
+    body = json.loads(request.body)
+    return 200, {}, json.dumps({'input': body['input'], 'context': body['context'],
+                                'output': {'text': []}})
+
+
+def test_summarize_and_bounded_history():
+    summary = summarize_tone(tone_response)
+    assert summary['writing']['current'] == ['analytical_high']
+    assert summary['social']['current'] == ['openness_low']
+    context = {}
+    for _ in range(4):
+        update_user_tone(context, summary, history_size=3)
+    tone = context['user']['tone']
+    assert tone['emotion'] == {'current': 'joy',
+                               'history': [{'tone_name': 'joy', 'score': 0.8}] * 3}
+    assert tone['social']['history'][-1] == [
+        {'tone_name': 'openness', 'score': 0.1, 'interpretation': 'likely low'},
+        {'tone_name': 'agreeableness', 'score': 0.5, 'interpretation': 'likely medium'}]
+    assert len(tone['social']['history']) == 3
+    assert summarize_tone({'document_tone': {'tone_categories': []}})['emotion'] == \
+        {'current': 'neutral', 'history': {'tone_name': 'neutral', 'score': None}}
+
+
+@responses.activate
+def test_repeated_utterances_use_cached_tone():
+    responses.add(responses.POST, tone_url, json=tone_response)
+    responses.add_callback(responses.POST, message_url, callback=echo_context,
+                           content_type='application/json')
+    tones = pipeline(history_size=2)
+    context = None
+    for text in ['I am  happy', 'i am happy', 'I am happy']:
+        context = tones.message({'text': text}, context)['context']
+
+    assert len([c for c in responses.calls if c.request.url.startswith(tone_url)]) == 1
+    assert 'sentences=false' in responses.calls[0].request.url
+    writing = context['user']['tone']['writing']
+    assert writing['current'] == ['analytical_high']
+    assert [[t['interpretation'] for t in turn] for turn in writing['history']] == \
+        [['likely high', 'likely medium']] * 2
+    assert tones.tone_cache.hits == 2
+
+
+@responses.activate
+def test_expired_tone_is_analyzed_again():
+    responses.add(responses.POST, tone_url, json=tone_response)
+    tones = pipeline(cache_ttl=0.05)
+    assert tones.analyze_tone('I am happy').result(5) is not None
+    time.sleep(0.1)
+    assert tones.analyze_tone('I am happy').result(5) is not None
+    assert len(responses.calls) == 2
+
+
+@responses.activate
+def test_tone_runs_while_payload_is_prepared():
+    started = threading.Event()
+
+    def slow_tone(request):
+        started.set()
+        time.sleep(0.05)
+        return 200, {}, json.dumps(tone_response)
+
+    responses.add_callback(responses.POST, tone_url, callback=slow_tone,
+                           content_type='application/json')
+    responses.add_callback(responses.POST, message_url, callback=echo_context,
+                           content_type='application/json')
+    tones = pipeline()
+    pending = tones.analyze_tone('hello')
+    assert started.wait(1)
+    assert tones.analyze_tone('Hello') is pending
+    response = tones.message({'text': 'hello'})
+    assert response['context']['user']['tone']['emotion']['current'] == 'joy'
+
+
+@responses.activate
+def test_tone_failure_leaves_tone_unchanged():
+    responses.add(responses.POST, tone_url, status=500, json={'error': 'down'})
+    responses.add_callback(responses.POST, message_url, callback=echo_context,
+                           content_type='application/json')
+    tones = pipeline()
+    context = {'user': {'tone': {'emotion': {'current': 'sadness'}}}}
+    response = tones.message({'text': 'hi'}, context)
+    assert response['context']['user']['tone']['emotion'] == {'current': 'sadness'}
+    assert tones.tone_errors == 1
+    assert 'writing' not in context['user']['tone']
+
+
+@responses.activate
+def test_input_without_text_skips_tone():
+    responses.add_callback(responses.POST, message_url, callback=echo_context,
+                           content_type='application/json')
+    tones = pipeline()
+    context = {'user': {'tone': {'emotion': {'current': 'joy'}}}}
+    response = tones.message({'intents': []}, context)
+    assert response['context']['user']['tone']['emotion'] == {'current': 'joy'}
+    assert tones.tone_errors == 0
+    assert len(responses.calls) == 1
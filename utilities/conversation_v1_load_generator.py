@@ -0,0 +1,76 @@
+"""
+Command line runnable script that replays recorded conversation transcripts against the
+Conversation service /message API and reports latency percentiles, error and 429 rates and
+throughput. See usage details by running
+ python conversation_v1_load_generator.py --help
+"""
+from __future__ import print_function
+
+import argparse
+import os
+
+from watson_developer_cloud import ConversationV1
+from watson_developer_cloud.conversation_load_generator import LoadGenerator, \
+    StandInConversationServer, load_transcripts
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description='Replay conversation transcripts against ConversationV1.message')
+    parser.add_argument('transcripts',
+                        help='JSON or JSONL file of transcripts (lists of user turns)')
+    parser.add_argument('-w', '--workspace-id', default=os.environ.get('WORKSPACE_ID'),
+                        help='workspace to send the messages to')
+    parser.add_argument('-u', '--users', type=int, default=10,
+                        help='number of concurrent virtual users (default: 10)')
+    parser.add_argument('-r', '--rate', type=float,
+                        help='target requests per second over all users (default: unlimited)')
+    parser.add_argument('-d', '--duration', type=float,
+                        help='run for this many seconds, replaying transcripts in a loop')
+    parser.add_argument('-n', '--iterations', type=int, default=1,
+                        help='transcripts replayed by each user when no duration is set')
+    parser.add_argument('--url', default=ConversationV1.default_url,
+                        help='base url of the Conversation service')
+    parser.add_argument('--version', default=ConversationV1.VERSION_DATE_2017_05_26,
+                        help='API version date')
+    parser.add_argument('--stand-in', action='store_true',
+                        help='run against a local stand-in server instead of the service')
+    parser.add_argument('--stand-in-delay', type=float, default=0.0,
+                        help='seconds the stand-in server waits before each reply')
+    parser.add_argument('--stand-in-error-rate', type=float, default=0.0,
+                        help='fraction of stand-in replies that are HTTP 500')
+    parser.add_argument('--stand-in-429-rate', type=float, default=0.0,
+                        help='fraction of stand-in replies that are HTTP 429')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    transcripts = load_transcripts(args.transcripts)
+    server = None
+    url = args.url
+    username = os.environ.get('CONVERSATION_USERNAME')
+    password = os.environ.get('CONVERSATION_PASSWORD')
+    if args.stand_in:
+        server = StandInConversationServer(
+            response_delay=args.stand_in_delay,
+            error_rate=args.stand_in_error_rate,
+            rate_limit_rate=args.stand_in_429_rate).start()
+        url = server.url
+        username = username or 'stand-in'
+        password = password or 'stand-in'
+    try:
+        conversation = ConversationV1(args.version, url=url,
+                                      username=username, password=password)
+        generator = LoadGenerator(conversation, args.workspace_id or 'stand-in',
+                                  transcripts, virtual_users=args.users,
+                                  rate=args.rate, duration=args.duration,
+                                  iterations=args.iterations)
+        print(generator.run())
+    finally:
+        if server is not None:
+            server.stop()
+
+
+if __name__ == '__main__':
+    main()
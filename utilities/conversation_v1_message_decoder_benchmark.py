@@ -0,0 +1,88 @@
+"""
+Command line runnable script that compares decoding a Conversation /message response
+with decode_message against MessageResponse._from_dict, from a dict and from the raw
+JSON body. See usage details by running
+ python conversation_v1_message_decoder_benchmark.py --help
+"""
+from __future__ import print_function
+
+import argparse
+import json
+import timeit
+
+from watson_developer_cloud.conversation_message_decoder import decode_message
+from watson_developer_cloud.conversation_v1 import MessageResponse
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description='Benchmark decoding of ConversationV1.message responses')
+    parser.add_argument('-n', '--number', type=int, default=20000,
+                        help='decodes per measurement (default: 20000)')
+    parser.add_argument('-r', '--repeat', type=int, default=5,
+                        help='measurements per case; the best is reported (default: 5)')
+    parser.add_argument('--intents', type=int, default=10,
+                        help='intents in the response, as with alternate_intents (default: 10)')
+    parser.add_argument('--entities', type=int, default=5,
+                        help='entities in the response (default: 5)')
+    parser.add_argument('--response',
+                        help='JSON file with a recorded response to decode instead')
+    return parser.parse_args()
+
+
+def sample_response(intents, entities):
+    return {
+        'input': {'text': 'I would like to order a large pizza with extra cheese'},
+        'intents': [{'intent': 'intent_%d' % i, 'confidence': 1.0 / (i + 1)}
+                    for i in range(intents)],
+        'entities': [{'entity': 'entity_%d' % i, 'value': 'value_%d' % i,
+                      'location': [i, i + 5], 'confidence': 1}
+                     for i in range(entities)],
+        'alternate_intents': True,
+        'context': {
+            'conversation_id': '1b7b67c0-90ed-45dc-8508-9488bc483d5b',
+            'system': {
+                'dialog_stack': [{'dialog_node': 'node_2'}],
+                'dialog_turn_counter': 3,
+                'dialog_request_counter': 3,
+                '_node_output_map': {'node_1': [0], 'node_2': [0, 1]}
+            },
+            'size': 'large',
+            'toppings': ['cheese']
+        },
+        'output': {
+            'log_messages': [],
+            'text': ['What toppings would you like?'],
+            'nodes_visited': ['node_1', 'node_2']
+        }
+    }
+
+
+def best_of(func, number, repeat):
+    return min(timeit.repeat(func, number=number, repeat=repeat)) / number
+
+
+def main():
+    args = parse_args()
+    if args.response:
+        with open(args.response) as f:
+            response = json.load(f)
+    else:
+        response = sample_response(args.intents, args.entities)
+    body = json.dumps(response).encode('utf-8')
+
+    cases = [
+        ('dict: MessageResponse._from_dict',
+         lambda: MessageResponse._from_dict(response)),
+        ('dict: decode_message', lambda: decode_message(response)),
+        ('bytes: json.loads + _from_dict',
+         lambda: MessageResponse._from_dict(json.loads(body.decode('utf-8')))),
+        ('bytes: decode_message', lambda: decode_message(body)),
+    ]
+    print('%-36s %12s' % ('case', 'usec/decode'))
+    for name, func in cases:
+        print('%-36s %12.2f' % (name, best_of(func, args.number, args.repeat) * 1e6))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+"""
+Command line runnable script that compares the peak memory of uploading a document with
+DiscoveryV1.add_document and with add_document_streaming. The uploads go to a local
+HTTP server that discards the body, so only the client side is measured. Peak memory
+is the largest amount traced by tracemalloc during one upload; pages of a memory-mapped
+file belong to the OS page cache and are not counted. Requires Python 3. See usage
+details by running
+ python discovery_v1_upload_memory_benchmark.py --help
+"""
+from __future__ import print_function
+
+import argparse
+import json
+import os
+import tempfile
+import threading
+import time
+import tracemalloc
+
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+from watson_developer_cloud.discovery_streaming_upload import add_document_streaming
+from watson_developer_cloud.discovery_v1 import DiscoveryV1
+
+
+class DiscardingHandler(BaseHTTPRequestHandler):
+
+    def do_POST(self):  # pylint: disable=C0103
+        remaining = int(self.headers.get('Content-Length') or 0)
+        while remaining > 0:
+            remaining -= len(self.rfile.read(min(remaining, 1 << 16)))
+        body = json.dumps({'document_id': 'doc', 'status': 'processing'})
+        self.send_response(202)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body.encode('utf-8'))
+
+    def log_message(self, *args):
+        pass
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description='Benchmark peak memory of DiscoveryV1 document uploads')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1, 10, 50],
+                        help='document sizes in MB (default: 1 10 50)')
+    parser.add_argument('--file', help='upload this file instead of generated ones')
+    return parser.parse_args()
+
+
+def measure(upload):
+    tracemalloc.start()
+    started = time.time()
+    try:
+        upload()
+        return tracemalloc.get_traced_memory()[1], time.time() - started
+    finally:
+        tracemalloc.stop()
+
+
+def main():
+    args = parse_args()
+    server = HTTPServer(('127.0.0.1', 0), DiscardingHandler)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    discovery = DiscoveryV1('2017-11-07', username='username', password='password',
+                            url='http://127.0.0.1:%d' % server.server_port)
+
+    if args.file:
+        paths = [(args.file, False)]
+    else:
+        paths = []
+        for size in args.sizes:
+            handle, path = tempfile.mkstemp(suffix='.json')
+            with os.fdopen(handle, 'wb') as output:
+                block = b'x' * (1 << 20)
+                for _ in range(size):
+                    output.write(block)
+            paths.append((path, True))
+
+    def add_document(path):
+        with open(path, 'rb') as handle:
+            discovery.add_document('env', 'coll', file=handle,
+                                   filename=os.path.basename(path))
+
+    def streaming(path):
+        add_document_streaming(discovery, 'env', 'coll', file=path)
+
+    print('%12s %22s %22s' % ('size', 'add_document', 'add_document_streaming'))
+    try:
+        for path, _ in paths:
+            size = os.path.getsize(path)
+            rows = []
+            for upload in (add_document, streaming):
+                peak, elapsed = measure(lambda: upload(path))
+                rows.append('%9.2f MB %8.2f s' % (peak / 1e6, elapsed))
+            print('%9.2f MB %22s %22s' % (size / 1e6, rows[0], rows[1]))
+    finally:
+        server.shutdown()
+        for path, generated in paths:
+            if generated:
+                os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,348 @@
+# coding: utf-8
+
+# Copyright 2017 IBM All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Caches for service responses, in memory or persisted in a SQLite database.
+"""
+
+from __future__ import absolute_import
+
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+_clock = getattr(time, 'monotonic', time.time)
+
+_MISSING = object()
+
+
+class LRUCache(object):
+    """
+    A thread-safe least-recently-used cache with an optional time to live.
+
+    :attr int max_size: The maximum number of entries.
+    :attr float ttl: The number of seconds an entry stays valid, or `None` to keep
+          entries until they are evicted.
+    :attr int hits: The number of successful lookups.
+    :attr int misses: The number of lookups that found nothing or an expired entry.
+    """
+
+    def __init__(self, max_size=1024, ttl=None):
+        """
+        Initialize a LRUCache object.
+
+        :param int max_size: The maximum number of entries.
+        :param float ttl: (optional) The number of seconds an entry stays valid.
+        """
+        if max_size < 1:
+            raise ValueError('max_size must be at least 1')
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """
+        The cached value for `key`, marking it as recently used.
+
+        :return: The value, or `default` when it is missing or expired.
+        """
+        with self._lock:
+            entry = self._entries.pop(key, _MISSING)
+            if entry is _MISSING or (entry[1] is not None and entry[1] <= _clock()):
+                self.misses += 1
+                return default
+            self._entries[key] = entry
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key, value):
+        """Store a value, evicting the least recently used entry when full."""
+        expires = _clock() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (value, expires)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key):
+        """Remove one entry, if present."""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def invalidate_where(self, predicate):
+        """
+        Remove the entries whose key matches `predicate`.
+
+        :param predicate: A callable taking a key.
+        :return: The number of entries removed.
+        :rtype: int
+        """
+        with self._lock:
+            keys = [key for key in self._entries if predicate(key)]
+            for key in keys:
+                del self._entries[key]
+            return len(keys)
+
+    def clear(self):
+        """Remove all entries."""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        with self._lock:
+            entry = self._entries.get(key, _MISSING)
+            return entry is not _MISSING and (entry[1] is None or
+                                              entry[1] > _clock())
+
+
+class SqliteCache(object):
+    """
+    A persistent cache of JSON-serializable values in a SQLite database, bounded by
+    the total size of the stored values.
+
+    When the values exceed `max_bytes`, the least recently read or written entries are
+    evicted. Entries survive restarts, and the object can be shared between threads.
+
+    :attr str path: The location of the database file.
+    :attr int max_bytes: The maximum total size of the serialized values.
+    :attr float ttl: The number of seconds an entry stays valid, or `None` to keep
+          entries until they are evicted.
+    :attr int hits: The number of successful lookups.
+    :attr int misses: The number of lookups that found nothing or an expired entry.
+    """
+
+    def __init__(self, path, max_bytes=256 * 1024 * 1024, ttl=None, table='entries'):
+        """
+        Initialize a SqliteCache object.
+
+        :param str path: The location of the database file. It is created if needed.
+        :param int max_bytes: The maximum total size of the serialized values.
+        :param float ttl: (optional) The number of seconds an entry stays valid.
+        :param str table: The name of the table holding the entries.
+        """
+        if path is None:
+            raise ValueError('path must be provided')
+        if max_bytes < 1:
+            raise ValueError('max_bytes must be at least 1')
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.table = table
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.execute('PRAGMA synchronous=NORMAL')
+        self._connection.execute(
+            'CREATE TABLE IF NOT EXISTS {0} (key TEXT PRIMARY KEY, value TEXT, '
+            'size INTEGER, accessed REAL, expires REAL)'.format(table))
+        self._connection.execute(
+            'CREATE INDEX IF NOT EXISTS {0}_accessed ON {0} (accessed)'.format(table))
+        self._connection.commit()
+        self._size = self._connection.execute(
+            'SELECT COALESCE(SUM(size), 0) FROM {0}'.format(table)).fetchone()[0]
+
+    @property
+    def size(self):
+        """The total size of the stored values, in bytes."""
+        return self._size
+
+    def get(self, key, default=None):
+        """
+        The cached value for `key`, marking it as recently used.
+
+        :param str key: The key.
+        :return: A new copy of the value, or `default` when it is missing or expired.
+        """
+        now = time.time()
+        with self._lock:
+            row = self._connection.execute(
+                'SELECT value, expires FROM {0} WHERE key = ?'.format(self.table),
+                (key,)).fetchone()
+            if row is None or (row[1] is not None and row[1] <= now):
+                if row is not None:
+                    self._remove(key)
+                    self._connection.commit()
+                self.misses += 1
+                return default
+            self._connection.execute(
+                'UPDATE {0} SET accessed = ? WHERE key = ?'.format(self.table),
+                (now, key))
+            self._connection.commit()
+            self.hits += 1
+        return json.loads(row[0])
+
+    def set(self, key, value):
+        """
+        Store a value, evicting expired entries and then the least recently used ones
+        while the cache is over `max_bytes`. A value larger than `max_bytes` is not
+        stored, and the previous value of `key` is removed.
+
+        :param str key: The key.
+        :param value: A JSON-serializable value.
+        """
+        encoded = json.dumps(value, separators=(',', ':'), ensure_ascii=False)
+        if isinstance(encoded, bytes):
+            encoded = encoded.decode('utf-8')  # Python 2
+        size = len(encoded.encode('utf-8'))
+        now = time.time()
+        expires = now + self.ttl if self.ttl is not None else None
+        with self._lock:
+            self._remove(key)
+            if size <= self.max_bytes:
+                self._connection.execute(
+                    'INSERT INTO {0} (key, value, size, accessed, expires) '
+                    'VALUES (?, ?, ?, ?, ?)'.format(self.table),
+                    (key, encoded, size, now, expires))
+                self._size += size
+                if self._size > self.max_bytes:
+                    self._evict(key, now)
+            self._connection.commit()
+
+    def _evict(self, key, now):
+        self._connection.execute(
+            'DELETE FROM {0} WHERE expires <= ?'.format(self.table), (now,))
+        # Other processes sharing the file may have added or removed entries
+        self._size = self._connection.execute(
+            'SELECT COALESCE(SUM(size), 0) FROM {0}'.format(self.table)).fetchone()[0]
+        while self._size > self.max_bytes:
+            rows = self._connection.execute(
+                'SELECT key, size FROM {0} WHERE key != ? ORDER BY accessed '
+                'LIMIT 64'.format(self.table), (key,)).fetchall()
+            if not rows:
+                break
+            for old_key, old_size in rows:
+                if self._size <= self.max_bytes:
+                    break
+                self._connection.execute(
+                    'DELETE FROM {0} WHERE key = ?'.format(self.table), (old_key,))
+                self._size -= old_size
+
+    def invalidate(self, key):
+        """Remove one entry, if present."""
+        with self._lock:
+            self._remove(key)
+            self._connection.commit()
+
+    def clear(self):
+        """Remove all entries."""
+        with self._lock:
+            self._connection.execute('DELETE FROM {0}'.format(self.table))
+            self._connection.commit()
+            self._size = 0
+
+    def _remove(self, key):
+        row = self._connection.execute(
+            'SELECT size FROM {0} WHERE key = ?'.format(self.table), (key,)).fetchone()
+        if row is not None:
+            self._connection.execute(
+                'DELETE FROM {0} WHERE key = ?'.format(self.table), (key,))
+            self._size -= row[0]
+
+    def __len__(self):
+        with self._lock:
+            return self._connection.execute(
+                'SELECT COUNT(*) FROM {0}'.format(self.table)).fetchone()[0]
+
+    def __contains__(self, key):
+        with self._lock:
+            row = self._connection.execute(
+                'SELECT expires FROM {0} WHERE key = ?'.format(self.table),
+                (key,)).fetchone()
+        return row is not None and (row[0] is None or row[0] > time.time())
+
+    def close(self):
+        """Close the database."""
+        with self._lock:
+            self._connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class TieredCache(object):
+    """
+    A fast cache in front of a larger, slower one, typically an `LRUCache` in front of
+    a `SqliteCache`.
+
+    Lookups try the first cache, then the second, copying values found only in the
+    second into the first. Values are written to both.
+
+    :attr int hits: The number of successful lookups, in either cache.
+    :attr int misses: The number of lookups that found nothing in either cache.
+    """
+
+    def __init__(self, memory, disk):
+        """
+        Initialize a TieredCache object.
+
+        :param LRUCache memory: The first cache.
+        :param SqliteCache disk: The second cache.
+        """
+        self.memory = memory
+        self.disk = disk
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        """
+        The cached value for `key`.
+
+        :return: The value, or `default` when neither cache has it.
+        """
+        value = self.memory.get(key, _MISSING)
+        if value is _MISSING:
+            value = self.disk.get(key, _MISSING)
+            if value is _MISSING:
+                self.misses += 1
+                return default
+            self.memory.set(key, value)
+        self.hits += 1
+        return value
+
+    def set(self, key, value):
+        """Store a value in both caches."""
+        self.disk.set(key, value)
+        self.memory.set(key, value)
+
+    def invalidate(self, key):
+        """Remove one entry from both caches."""
+        self.memory.invalidate(key)
+        self.disk.invalidate(key)
+
+    def clear(self):
+        """Remove all entries from both caches."""
+        self.memory.clear()
+        self.disk.clear()
+
+    def __contains__(self, key):
+        return key in self.memory or key in self.disk
+
+    def close(self):
+        """Close the second cache, if it needs closing."""
+        if hasattr(self.disk, 'close'):
+            self.disk.close()
@@ -0,0 +1,241 @@
+# coding: utf-8
+
+# Copyright 2017 IBM All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Durable progress records used by the long-running export and ingestion helpers, so that
+an interrupted run can pick up where it stopped.
+"""
+
+from __future__ import absolute_import
+
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+def _replace_file(src, dst):
+    """Atomically move `src` over `dst`."""
+    if hasattr(os, 'replace'):
+        os.replace(src, dst)  # Python 3.3+
+    else:
+        if os.name == 'nt' and os.path.exists(dst):
+            os.remove(dst)
+        os.rename(src, dst)
+
+
+class JsonCheckpoint(object):
+    """
+    A small JSON state document stored in a single file.
+
+    The file is rewritten atomically on every save (write to a temporary file, fsync,
+    then rename), so a crash leaves either the previous or the new state on disk, never
+    a partial one.
+
+    :attr str path: The location of the checkpoint file.
+    """
+
+    def __init__(self, path):
+        """
+        Initialize a JsonCheckpoint object.
+
+        :param str path: The location of the checkpoint file.
+        """
+        if path is None:
+            raise ValueError('path must be provided')
+        self.path = path
+
+    def load(self):
+        """
+        Read the saved state.
+
+        :return: The saved state, or `None` when no checkpoint exists.
+        :rtype: dict
+        """
+        if not os.path.exists(self.path):
+            return None
+        with open(self.path, 'r') as checkpoint_file:
+            return json.load(checkpoint_file)
+
+    def save(self, state):
+        """
+        Persist `state`, replacing any previous checkpoint.
+
+        :param dict state: A JSON-serializable dictionary.
+        """
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as checkpoint_file:
+            json.dump(state, checkpoint_file)
+            checkpoint_file.flush()
+            os.fsync(checkpoint_file.fileno())
+        _replace_file(tmp_path, self.path)
+
+    def clear(self):
+        """Remove the checkpoint file if it exists."""
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class SqliteRecords(object):
+    """
+    Records keyed by a string, with a fixed set of value columns, kept in a SQLite
+    table.
+
+    Every write is committed before it returns, and the object can be shared between
+    threads. Subclasses name their value columns in `columns`; each record also holds
+    the time it was last written, in `updated`.
+
+    :attr str path: The location of the database file.
+    :attr str table: The name of the table holding the records.
+    """
+
+    columns = ()
+
+    def __init__(self, path, table):
+        """
+        Initialize a SqliteRecords object.
+
+        :param str path: The location of the database file. It is created if needed.
+        :param str table: The name of the table holding the records.
+        """
+        if path is None:
+            raise ValueError('path must be provided')
+        self.path = path
+        self.table = table
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.execute('PRAGMA synchronous=NORMAL')
+        self._connection.execute(
+            'CREATE TABLE IF NOT EXISTS {0} (key TEXT PRIMARY KEY, {1}, '
+            'updated REAL)'.format(table, ', '.join(
+                '%s TEXT' % column for column in self.columns)))
+        self._connection.commit()
+
+    def get(self, key):
+        """
+        The record of a key.
+
+        :return: A `dict` with the value of each column and `updated`, or `None` when
+                 the key has no record.
+        :rtype: dict
+        """
+        names = self.columns + ('updated',)
+        with self._lock:
+            row = self._connection.execute(
+                'SELECT {0} FROM {1} WHERE key = ?'.format(', '.join(names),
+                                                          self.table),
+                (key,)).fetchone()
+        if row is None:
+            return None
+        return dict(zip(names, row))
+
+    def _write(self, key, values):
+        """Create or replace the record of a key, with a value per column."""
+        with self._lock:
+            self._connection.execute(
+                'INSERT OR REPLACE INTO {0} (key, {1}, updated) VALUES ({2})'.format(
+                    self.table, ', '.join(self.columns),
+                    ', '.join('?' * (len(self.columns) + 2))),
+                (key,) + tuple(values) + (time.time(),))
+            self._connection.commit()
+
+    def _select(self, columns, where='', args=()):
+        """The rows of `key` and the given columns, ordered by key."""
+        with self._lock:
+            return self._connection.execute(
+                'SELECT key, {0} FROM {1}{2} ORDER BY key'.format(
+                    ', '.join(columns), self.table, where), args).fetchall()
+
+    def delete(self, key):
+        """Remove the record of a key."""
+        with self._lock:
+            self._connection.execute(
+                'DELETE FROM {0} WHERE key = ?'.format(self.table), (key,))
+            self._connection.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._connection.execute(
+                'SELECT COUNT(*) FROM {0}'.format(self.table)).fetchone()[0]
+
+    def close(self):
+        """Close the database."""
+        with self._lock:
+            self._connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class SqliteCheckpoint(SqliteRecords):
+    """
+    Per-item progress records kept in a SQLite database.
+
+    Suited to runs over millions of items, where rewriting a JSON document on every
+    update would be too slow. Every `record` is committed before it returns. The object
+    can be shared between threads. `get` returns a `dict` with `document_id`, `status`,
+    `detail` and `updated`.
+
+    :attr str path: The location of the database file.
+    """
+
+    columns = ('document_id', 'status', 'detail')
+
+    def __init__(self, path, table='items'):
+        """
+        Initialize a SqliteCheckpoint object.
+
+        :param str path: The location of the database file. It is created if needed.
+        :param str table: The name of the table holding the records.
+        """
+        super(SqliteCheckpoint, self).__init__(path, table)
+
+    def record(self, key, document_id=None, status=None, detail=None):
+        """
+        Create or replace the record of an item.
+
+        :param str key: The item key, for example a file path.
+        :param str document_id: (optional) The ID the service assigned to the item.
+        :param str status: (optional) The item status.
+        :param str detail: (optional) Additional information, such as an error message.
+        """
+        self._write(key, (document_id, status, detail))
+
+    def items(self, status=None):
+        """
+        All records, optionally only those with the given status.
+
+        :return: `(key, document_id, status, detail)` tuples, ordered by key.
+        :rtype: list[tuple]
+        """
+        if status is None:
+            return self._select(self.columns)
+        return self._select(self.columns, ' WHERE status = ?', (status,))
+
+    def counts(self):
+        """
+        The number of records per status.
+
+        :rtype: dict
+        """
+        with self._lock:
+            return dict(self._connection.execute(
+                'SELECT status, COUNT(*) FROM {0} GROUP BY status'.format(
+                    self.table)).fetchall())
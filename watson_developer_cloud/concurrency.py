@@ -0,0 +1,347 @@
+# coding: utf-8
+
+# Copyright 2017 IBM All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Thread-based building blocks shared by the bulk and load-testing helpers.
+"""
+
+from __future__ import absolute_import
+
+import random
+import sys
+import threading
+import time
+
+try:
+    import queue  # Python 3
+except ImportError:
+    import Queue as queue  # Python 2
+
+import requests
+
+from .watson_service import WatsonApiException
+
+_clock = getattr(time, 'monotonic', time.time)
+
+# HTTP status codes worth retrying: rate limiting and temporary server errors
+TRANSIENT_STATUS_CODES = frozenset([429, 500, 502, 503, 504])
+# HTTP status codes of requests the service turned away without handling them
+REJECTED_STATUS_CODES = frozenset([429, 503])
+
+_DONE = object()
+
+
+def is_transient_error(error):
+    """
+    Whether a failed call is worth retrying.
+
+    :param Exception error: The exception raised by a service call.
+    :rtype: bool
+    """
+    if isinstance(error, WatsonApiException):
+        return error.code in TRANSIENT_STATUS_CODES
+    return isinstance(error, (requests.exceptions.ConnectionError,
+                              requests.exceptions.Timeout))
+
+
+def is_rejected_error(error):
+    """
+    Whether a failed call is known not to have been handled, so that even a request
+    that is not idempotent, such as adding a document, can be sent again.
+
+    Server errors and timeouts after the request was sent are not: the service may
+    have handled it before failing.
+
+    :param Exception error: The exception raised by a service call.
+    :rtype: bool
+    """
+    if isinstance(error, WatsonApiException):
+        return error.code in REJECTED_STATUS_CODES
+    return isinstance(error, requests.exceptions.ConnectTimeout)
+
+
+def retry_call(func,
+               retries=3,
+               backoff=1.0,
+               max_backoff=30.0,
+               is_retryable=is_transient_error):
+    """
+    Call `func` until it succeeds, retrying transient failures with exponential backoff
+    and jitter.
+
+    :param func: A callable taking no arguments.
+    :param int retries: The maximum number of retries after the first attempt.
+    :param float backoff: The delay before the first retry, in seconds. Each further
+           retry doubles it, up to `max_backoff`.
+    :param float max_backoff: The longest delay between two attempts, in seconds.
+    :param is_retryable: A callable deciding whether an exception is retried.
+    :return: The return value of `func`.
+    """
+    attempt = 0
+    while True:
+        try:
+            return func()
+        except Exception as error:  # pylint: disable=broad-except
+            if attempt >= retries or not is_retryable(error):
+                raise
+            delay = min(max_backoff, backoff * (2 ** attempt))
+            time.sleep(delay * (0.5 + random.random() / 2))
+            attempt += 1
+
+
+class RateLimiter(object):
+    """
+    A thread-safe token bucket.
+
+    Tokens are added continuously at `rate` per second up to `burst`; every call to
+    `acquire` takes one token, waiting until one is available.
+
+    :attr float rate: The sustained number of acquisitions per second.
+    :attr float burst: The maximum number of tokens that can accumulate.
+    """
+
+    def __init__(self, rate, burst=None):
+        """
+        Initialize a RateLimiter object.
+
+        :param float rate: The sustained number of acquisitions per second.
+        :param float burst: The maximum number of tokens that can accumulate. Defaults
+               to one, which spaces acquisitions evenly.
+        """
+        if rate is None or rate <= 0:
+            raise ValueError('rate must be a positive number')
+        self.rate = float(rate)
+        self.burst = float(burst or 1)
+        self._tokens = self.burst
+        self._updated = _clock()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Take one token, blocking until one is available."""
+        while True:
+            with self._lock:
+                now = _clock()
+                self._tokens = min(self.burst,
+                                   self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class TaskResult(object):
+    """
+    The outcome of one item processed by `run_concurrently`.
+
+    :attr int index: The position of the item in the input.
+    :attr item: The input item.
+    :attr value: The return value of the function, when it succeeded.
+    :attr Exception error: The exception raised by the function, when it failed.
+    """
+
+    __slots__ = ('index', 'item', 'value', 'error')
+
+    def __init__(self, index, item, value=None, error=None):
+        self.index = index
+        self.item = item
+        self.value = value
+        self.error = error
+
+    @property
+    def ok(self):
+        """Whether the function succeeded."""
+        return self.error is None
+
+
+class _Slots(object):
+    """A counting semaphore whose waiters give up once `stop` is set."""
+
+    def __init__(self, count):
+        self._free = count
+        self._condition = threading.Condition()
+
+    def acquire(self, stop):
+        with self._condition:
+            while self._free == 0 and not stop.is_set():
+                self._condition.wait(0.1)
+            if stop.is_set():
+                return False
+            self._free -= 1
+            return True
+
+    def release(self):
+        with self._condition:
+            self._free += 1
+            self._condition.notify()
+
+
+def run_concurrently(func,
+                     items,
+                     max_workers=8,
+                     max_pending=None,
+                     ordered=True,
+                     rate_limiter=None):
+    """
+    Apply `func` to every item on a pool of worker threads.
+
+    Items are pulled from `items` lazily: at most `max_pending` items are in flight or
+    waiting to be consumed at any time, so a slow consumer applies backpressure to the
+    input instead of buffering it. Exceptions raised by `func` are captured per item and
+    do not stop the run. Closing the generator early stops feeding new items.
+
+    :param func: A callable taking one item.
+    :param items: An iterable of items, consumed lazily.
+    :param int max_workers: The number of worker threads.
+    :param int max_pending: The maximum number of items in flight or buffered. Defaults
+           to twice `max_workers`.
+    :param bool ordered: Yield results in input order (`True`) or as they complete.
+    :param RateLimiter rate_limiter: Limits how fast workers start calls.
+    :return: A generator of `TaskResult` objects.
+    """
+    if max_workers < 1:
+        raise ValueError('max_workers must be at least 1')
+    max_pending = max(max_pending or 2 * max_workers, 1)
+    slots = _Slots(max_pending)
+    tasks = queue.Queue()
+    results = queue.Queue()
+    stop = threading.Event()
+
+    def feed():
+        count = 0
+        try:
+            for item in items:
+                if not slots.acquire(stop):
+                    return
+                tasks.put((count, item))
+                count += 1
+            results.put(('end', count))
+        except Exception:  # pylint: disable=broad-except
+            results.put(('error', sys.exc_info()[1]))
+        finally:
+            for _ in range(max_workers):
+                tasks.put(_DONE)
+
+    def work():
+        while True:
+            task = tasks.get()
+            if task is _DONE:
+                return
+            index, item = task
+            if rate_limiter is not None:
+                rate_limiter.acquire()
+            try:
+                results.put(TaskResult(index, item, value=func(item)))
+            except Exception as error:  # pylint: disable=broad-except
+                results.put(TaskResult(index, item, error=error))
+
+    threads = [threading.Thread(target=feed)]
+    threads.extend(threading.Thread(target=work) for _ in range(max_workers))
+    for thread in threads:
+        thread.daemon = True
+        thread.start()
+
+    total = None
+    yielded = 0
+    buffered = {}
+    try:
+        while total is None or yielded < total:
+            message = results.get()
+            if not isinstance(message, TaskResult):
+                if message[0] == 'error':
+                    raise message[1]
+                total = message[1]
+                continue
+            if not ordered:
+                yielded += 1
+                slots.release()
+                yield message
+                continue
+            buffered[message.index] = message
+            while yielded in buffered:
+                result = buffered.pop(yielded)
+                yielded += 1
+                slots.release()
+                yield result
+    finally:
+        stop.set()
+
+
+class BackgroundCall(object):
+    """
+    Run a function on a daemon thread and collect its result later.
+    """
+
+    def __init__(self, func, *args, **kwargs):
+        """
+        Start calling `func(*args, **kwargs)` on a new thread.
+        """
+        self.value = None
+        self.error = None
+        self._done = threading.Event()
+        if func is None:
+            return
+        thread = threading.Thread(target=self._run, args=(func, args, kwargs))
+        thread.daemon = True
+        thread.start()
+
+    @classmethod
+    def completed(cls, value):
+        """
+        A call that has already finished with `value`.
+
+        :rtype: BackgroundCall
+        """
+        call = cls(None)
+        call.value = value
+        call._done.set()
+        return call
+
+    def _run(self, func, args, kwargs):
+        try:
+            self.value = func(*args, **kwargs)
+        except Exception as error:  # pylint: disable=broad-except
+            self.error = error
+        finally:
+            self._done.set()
+
+    def done(self):
+        """Whether the call has finished."""
+        return self._done.is_set()
+
+    def wait(self, timeout=None):
+        """
+        Wait for the call to finish.
+
+        :param float timeout: (optional) The longest time to wait, in seconds.
+        :return: Whether the call finished in time.
+        :rtype: bool
+        """
+        return self._done.wait(timeout)
+
+    def result(self, timeout=None):
+        """
+        The return value of the call, waiting for it to finish. Exceptions raised by the
+        call are raised again here.
+
+        :param float timeout: (optional) The longest time to wait, in seconds.
+        :raises RuntimeError: The call did not finish in time.
+        """
+        if not self._done.wait(timeout):
+            raise RuntimeError('the call did not finish within %s seconds' % timeout)
+        if self.error is not None:
+            raise self.error
+        return self.value
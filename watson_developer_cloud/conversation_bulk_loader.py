@@ -0,0 +1,402 @@
+# coding: utf-8
+
+# Copyright 2017 IBM All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Load large training sets into a workspace.
+
+New intents are created together with their examples, and new entities together with
+their values and synonyms, so most of a training set goes in with one call per intent or
+entity. Only intents, entities and values that already exist fall back to one call per
+example, value or synonym. All calls run concurrently under an optional rate limit, and
+every example, value and synonym gets its own line in the report.
+"""
+
+from __future__ import absolute_import
+
+import io
+import json
+from collections import OrderedDict
+
+from .concurrency import RateLimiter, retry_call, run_concurrently
+from .files import csv_rows
+from .watson_service import WatsonApiException
+
+CREATED = 'created'
+EXISTS = 'exists'
+FAILED = 'failed'
+
+
+def read_training_csv(intents_path=None, entities_path=None):
+    """
+    Read training data in the CSV formats of the workspace tooling.
+
+    Intent rows are `example,intent`; entity rows are `entity,value,synonym,...`.
+
+    :param str intents_path: (optional) The path of the intents CSV file.
+    :param str entities_path: (optional) The path of the entities CSV file.
+    :return: A `dict` with `intents` and `entities`, shaped like a workspace export.
+    :rtype: dict
+    """
+    intents = OrderedDict()
+    entities = OrderedDict()
+    if intents_path is not None:
+        for row in csv_rows(intents_path):
+            if len(row) < 2 or not row[0].strip():
+                continue
+            intent = intents.setdefault(row[1].strip(), {
+                'intent': row[1].strip(),
+                'examples': []
+            })
+            intent['examples'].append({'text': row[0].strip()})
+    if entities_path is not None:
+        for row in csv_rows(entities_path):
+            if len(row) < 2 or not row[1].strip():
+                continue
+            entity = entities.setdefault(row[0].strip(), {
+                'entity': row[0].strip(),
+                'values': []
+            })
+            entity['values'].append({
+                'value': row[1].strip(),
+                'synonyms': [s.strip() for s in row[2:] if s.strip()]
+            })
+    return {'intents': list(intents.values()), 'entities': list(entities.values())}
+
+
+def read_training_json(path):
+    """
+    Read training data from a workspace JSON file.
+
+    :param str path: The path of a file with `intents` and `entities`, such as a
+           workspace export.
+    :rtype: dict
+    """
+    with io.open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _merge_intents(intents):
+    merged = OrderedDict()
+    for intent in intents or ():
+        spec = merged.setdefault(intent['intent'], {
+            'description': intent.get('description'),
+            'examples': OrderedDict()
+        })
+        for example in intent.get('examples') or ():
+            text = example['text'] if isinstance(example, dict) else example
+            spec['examples'][text] = None
+    return merged
+
+
+def _merge_entities(entities):
+    merged = OrderedDict()
+    for entity in entities or ():
+        spec = merged.setdefault(entity['entity'], {
+            'description': entity.get('description'),
+            'metadata': entity.get('metadata'),
+            'fuzzy_match': entity.get('fuzzy_match'),
+            'values': OrderedDict()
+        })
+        for value in entity.get('values') or ():
+            value_spec = spec['values'].setdefault(value['value'], {
+                'value': value['value'],
+                'metadata': value.get('metadata'),
+                'type': value.get('type'),
+                'patterns': value.get('patterns'),
+                'synonyms': OrderedDict()
+            })
+            for synonym in value.get('synonyms') or ():
+                value_spec['synonyms'][synonym] = None
+    return merged
+
+
+class BulkLoadReport(object):
+    """
+    The outcome of a bulk load, one entry per intent, example, entity, value and synonym.
+
+    :attr list items: `dict` entries with `type`, `parent`, `name`, `status` (`created`,
+          `exists` or `failed`) and, for failures, `error`.
+    :attr int calls: The number of API calls made, including retries.
+    """
+
+    def __init__(self):
+        self.items = []
+        self.calls = 0
+
+    def add(self, item_type, parent, name, status, error=None):
+        entry = {'type': item_type, 'parent': parent, 'name': name, 'status': status}
+        if error is not None:
+            entry['error'] = error
+        self.items.append(entry)
+
+    def counts(self):
+        """
+        The number of items per type and status.
+
+        :rtype: dict
+        """
+        counts = {}
+        for item in self.items:
+            by_status = counts.setdefault(item['type'], {})
+            by_status[item['status']] = by_status.get(item['status'], 0) + 1
+        return counts
+
+    def failures(self):
+        """
+        The items that could not be loaded.
+
+        :rtype: list[dict]
+        """
+        return [item for item in self.items if item['status'] == FAILED]
+
+    def _to_dict(self):
+        return {'calls': self.calls, 'counts': self.counts(), 'items': self.items}
+
+    def __str__(self):
+        return json.dumps(self._to_dict(), indent=2)
+
+
+class BulkLoader(object):
+    """
+    Load intents, examples, entities, values and synonyms into a workspace.
+    """
+
+    def __init__(self,
+                 conversation,
+                 workspace_id,
+                 max_workers=8,
+                 rate=None,
+                 max_batch_size=500,
+                 retries=3,
+                 backoff=1.0):
+        """
+        Initialize a BulkLoader object.
+
+        :param ConversationV1 conversation: The service client.
+        :param str workspace_id: The workspace ID.
+        :param int max_workers: The number of concurrent API calls.
+        :param float rate: (optional) The maximum number of API calls per second.
+        :param int max_batch_size: The most examples or values sent with a single
+               `create_intent` or `create_entity` call; the rest are added one by one.
+        :param int retries: The number of retries for rate-limited or failed calls.
+        :param float backoff: The delay before the first retry, in seconds.
+        """
+        if conversation is None:
+            raise ValueError('conversation must be provided')
+        if workspace_id is None:
+            raise ValueError('workspace_id must be provided')
+        self.conversation = conversation
+        self.workspace_id = workspace_id
+        self.max_workers = max_workers
+        self.rate_limiter = RateLimiter(rate) if rate else None
+        self.max_batch_size = max(1, max_batch_size)
+        self.retries = retries
+        self.backoff = backoff
+
+    def load(self, training_data):
+        """
+        Load training data.
+
+        :param dict training_data: `intents` and `entities` shaped like a workspace
+               export, for example from `read_training_csv` or `read_training_json`.
+        :rtype: BulkLoadReport
+        """
+        report = BulkLoadReport()
+        tasks = [('intent', name, spec)
+                 for name, spec in _merge_intents(training_data.get('intents')).items()]
+        tasks.extend(
+            ('entity', name, spec)
+            for name, spec in _merge_entities(training_data.get('entities')).items())
+        # Each round runs the follow-up calls of the previous one, e.g. the examples
+        # of intents that already existed.
+        while tasks:
+            follow_ups = []
+            for result in run_concurrently(self._execute, tasks, self.max_workers):
+                if result.ok:
+                    calls, records, more = result.value
+                    report.calls += calls
+                    follow_ups.extend(more)
+                else:
+                    records = self._failed_records(result.item, _error_message(
+                        result.error))
+                for record in records:
+                    report.add(*record)
+            tasks = follow_ups
+        return report
+
+    def load_csv(self, intents_path=None, entities_path=None):
+        """
+        Load training data from CSV files. See `read_training_csv`.
+
+        :rtype: BulkLoadReport
+        """
+        return self.load(read_training_csv(intents_path, entities_path))
+
+    def load_json(self, path):
+        """
+        Load training data from a workspace JSON file.
+
+        :rtype: BulkLoadReport
+        """
+        return self.load(read_training_json(path))
+
+    def _call(self, counter, method, *args, **kwargs):
+        def attempt():
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire()
+            counter[0] += 1
+            return method(self.workspace_id, *args, **kwargs)
+
+        return retry_call(attempt, retries=self.retries, backoff=self.backoff)
+
+    def _execute(self, task):
+        counter = [0]
+        handler = getattr(self, '_create_' + task[0])
+        records, follow_ups = handler(counter, *task[1:])
+        return counter[0], records, follow_ups
+
+    def _create_intent(self, counter, name, spec):
+        examples = list(spec['examples'])
+        batch = examples[:self.max_batch_size]
+        try:
+            self._call(counter, self.conversation.create_intent, name,
+                       description=spec['description'],
+                       examples=[{'text': text} for text in batch])
+        except WatsonApiException as error:
+            if error.code == 409:
+                return ([('intent', None, name, EXISTS)],
+                        [('example', name, text) for text in examples])
+            if error.code != 400 or not batch:
+                return self._failed_records(('intent', name, spec),
+                                            _error_message(error)), []
+            # One bad example rejects the whole request; isolate it.
+            try:
+                self._call(counter, self.conversation.create_intent, name,
+                           description=spec['description'])
+            except WatsonApiException as retry_error:
+                return self._failed_records(('intent', name, spec),
+                                            _error_message(retry_error)), []
+            batch = []
+        records = [('intent', None, name, CREATED)]
+        records.extend(('example', name, text, CREATED) for text in batch)
+        return records, [('example', name, text) for text in examples[len(batch):]]
+
+    def _create_example(self, counter, intent, text):
+        try:
+            self._call(counter, self.conversation.create_example, intent, text)
+        except WatsonApiException as error:
+            if error.code == 409:
+                return [('example', intent, text, EXISTS)], []
+            return [('example', intent, text, FAILED, _error_message(error))], []
+        return [('example', intent, text, CREATED)], []
+
+    def _create_entity(self, counter, name, spec):
+        values = list(spec['values'].values())
+        batch = values[:self.max_batch_size]
+        try:
+            self._call(counter, self.conversation.create_entity, name,
+                       description=spec['description'], metadata=spec['metadata'],
+                       values=[_value_body(value) for value in batch],
+                       fuzzy_match=spec['fuzzy_match'])
+        except WatsonApiException as error:
+            if error.code == 409:
+                return ([('entity', None, name, EXISTS)],
+                        [('value', name, value) for value in values])
+            if error.code != 400 or not batch:
+                return self._failed_records(('entity', name, spec),
+                                            _error_message(error)), []
+            try:
+                self._call(counter, self.conversation.create_entity, name,
+                           description=spec['description'],
+                           metadata=spec['metadata'],
+                           fuzzy_match=spec['fuzzy_match'])
+            except WatsonApiException as retry_error:
+                return self._failed_records(('entity', name, spec),
+                                            _error_message(retry_error)), []
+            batch = []
+        records = [('entity', None, name, CREATED)]
+        for value in batch:
+            records.extend(_value_records(name, value, CREATED))
+        return records, [('value', name, value) for value in values[len(batch):]]
+
+    def _create_value(self, counter, entity, value):
+        synonyms = list(value['synonyms'])
+        try:
+            self._call(counter, self.conversation.create_value, entity,
+                       value['value'], metadata=value['metadata'],
+                       synonyms=synonyms or None, patterns=value['patterns'],
+                       value_type=value['type'])
+        except WatsonApiException as error:
+            if error.code == 409:
+                return ([('value', entity, value['value'], EXISTS)],
+                        [('synonym', entity, value['value'], synonym)
+                         for synonym in synonyms])
+            return (_value_records(entity, value, FAILED, _error_message(error)),
+                    [])
+        return _value_records(entity, value, CREATED), []
+
+    def _create_synonym(self, counter, entity, value, synonym):
+        parent = '%s:%s' % (entity, value)
+        try:
+            self._call(counter, self.conversation.create_synonym, entity, value,
+                       synonym)
+        except WatsonApiException as error:
+            if error.code == 409:
+                return [('synonym', parent, synonym, EXISTS)], []
+            return [('synonym', parent, synonym, FAILED, _error_message(error))], []
+        return [('synonym', parent, synonym, CREATED)], []
+
+    @staticmethod
+    def _failed_records(task, error):
+        """Mark the item of a task and everything it carries as failed."""
+        item_type = task[0]
+        if item_type == 'intent':
+            records = [('intent', None, task[1], FAILED, error)]
+            records.extend(('example', task[1], text, FAILED, error)
+                           for text in task[2]['examples'])
+            return records
+        if item_type == 'entity':
+            records = [('entity', None, task[1], FAILED, error)]
+            for value in task[2]['values'].values():
+                records.extend(_value_records(task[1], value, FAILED, error))
+            return records
+        if item_type == 'value':
+            return _value_records(task[1], task[2], FAILED, error)
+        if item_type == 'synonym':
+            return [('synonym', '%s:%s' % (task[1], task[2]), task[3], FAILED,
+                     error)]
+        return [(item_type, task[1], task[2], FAILED, error)]
+
+
+def _value_body(value):
+    body = {'value': value['value']}
+    for field in ('metadata', 'type', 'patterns'):
+        if value[field] is not None:
+            body[field] = value[field]
+    if value['synonyms']:
+        body['synonyms'] = list(value['synonyms'])
+    return body
+
+
+def _value_records(entity, value, status, error=None):
+    records = [('value', entity, value['value'], status, error)]
+    parent = '%s:%s' % (entity, value['value'])
+    records.extend(('synonym', parent, synonym, status, error)
+                   for synonym in value['synonyms'])
+    return records
+
+
+def _error_message(error):
+    return getattr(error, 'message', None) or str(error)
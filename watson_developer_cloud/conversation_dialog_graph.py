@@ -0,0 +1,294 @@
+# coding: utf-8
+
+# Copyright 2017 IBM All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+An indexed, in-memory view of a workspace dialog.
+
+The graph is built from the `dialog_nodes` of `get_workspace(export=True)` in a single
+pass, using the `parent`, `previous_sibling` and `next_step` (or `go_to`) links of each
+node. Hash indexes by node ID, condition and intent or entity reference make the usual
+consistency checks (unreachable nodes, broken jumps, intent coverage) linear in the size
+of the dialog.
+"""
+
+from __future__ import absolute_import
+
+import re
+from collections import defaultdict, deque
+
+_INTENT_REFERENCE = re.compile(r'#([\w\-\.]+)', re.UNICODE)
+_ENTITY_REFERENCE = re.compile(r'@([\w\-\.]+)', re.UNICODE)
+
+# Conditions that always match, hiding the siblings evaluated after them
+_ALWAYS_TRUE_CONDITIONS = frozenset(['true', 'anything_else'])
+
+
+def _references(pattern, conditions):
+    if not conditions:
+        return set()
+    return set(name.rstrip('.') for name in pattern.findall(conditions))
+
+
+class DialogGraph(object):
+    """
+    Dialog nodes indexed by ID, parent, condition, intent and entity reference and jump
+    target.
+    """
+
+    def __init__(self, dialog_nodes, intents=None):
+        """
+        Initialize a DialogGraph object.
+
+        :param list dialog_nodes: The dialog nodes, as dicts (for example the
+               `dialog_nodes` of a workspace export) or `DialogNode` objects.
+        :param list intents: (optional) The workspace intents, as dicts or names, used
+               by `uncovered_intents`.
+        """
+        self.nodes = {}
+        self._order = []
+        self._children = defaultdict(list)
+        self._next_sibling = {}
+        self._by_condition = defaultdict(list)
+        self._by_intent = defaultdict(list)
+        self._by_entity = defaultdict(list)
+        self._jumps = {}
+        self._incoming_jumps = defaultdict(list)
+        self.intents = [
+            intent['intent'] if isinstance(intent, dict) else intent
+            for intent in intents or ()
+        ]
+
+        for node in dialog_nodes:
+            if hasattr(node, '_to_dict'):
+                node = node._to_dict()
+            node_id = node['dialog_node']
+            self.nodes[node_id] = node
+            self._order.append(node_id)
+            self._children[node.get('parent')].append(node_id)
+            if node.get('previous_sibling') is not None:
+                self._next_sibling[node['previous_sibling']] = node_id
+            conditions = node.get('conditions')
+            if conditions is not None:
+                self._by_condition[conditions.strip()].append(node_id)
+            for intent in _references(_INTENT_REFERENCE, conditions):
+                self._by_intent[intent].append(node_id)
+            for entity in _references(_ENTITY_REFERENCE, conditions):
+                self._by_entity[entity].append(node_id)
+            next_step = node.get('next_step') or node.get('go_to') or {}
+            target = next_step.get('dialog_node')
+            if target is not None:
+                self._jumps[node_id] = target
+                self._incoming_jumps[target].append(node_id)
+
+    @classmethod
+    def from_workspace(cls, workspace):
+        """
+        Build the graph of a workspace export.
+
+        :param dict workspace: The response of `get_workspace(workspace_id, export=True)`.
+        :rtype: DialogGraph
+        """
+        return cls(workspace.get('dialog_nodes') or [],
+                   intents=workspace.get('intents'))
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def __contains__(self, node_id):
+        return node_id in self.nodes
+
+    def node(self, node_id):
+        """
+        The node with the given ID.
+
+        :rtype: dict
+        """
+        return self.nodes.get(node_id)
+
+    def children(self, node_id=None):
+        """
+        The child node IDs of a node in evaluation order, following the
+        `previous_sibling` chain. Siblings that are not on the chain are appended in
+        export order.
+
+        :param str node_id: The parent node ID, or `None` for the root level.
+        :rtype: list[str]
+        """
+        siblings = self._children.get(node_id, [])
+        sibling_set = set(siblings)
+        ordered = []
+        seen = set()
+        for candidate in siblings:
+            if self.nodes[candidate].get('previous_sibling') in sibling_set:
+                continue
+            current = candidate
+            while current is not None and current not in seen:
+                seen.add(current)
+                ordered.append(current)
+                current = self._next_sibling.get(current)
+                if current not in sibling_set:
+                    break
+        ordered.extend(s for s in siblings if s not in seen)
+        return ordered
+
+    def ancestors(self, node_id):
+        """
+        The parent chain of a node, nearest first.
+
+        :rtype: list[str]
+        """
+        chain = []
+        seen = set([node_id])
+        parent = self.nodes.get(node_id, {}).get('parent')
+        while parent is not None and parent not in seen and parent in self.nodes:
+            chain.append(parent)
+            seen.add(parent)
+            parent = self.nodes[parent].get('parent')
+        return chain
+
+    def nodes_with_condition(self, conditions):
+        """
+        The IDs of the nodes with exactly these conditions.
+
+        :rtype: list[str]
+        """
+        return list(self._by_condition.get(conditions.strip(), []))
+
+    def nodes_for_intent(self, intent):
+        """
+        The IDs of the nodes whose conditions reference `#intent`.
+
+        :rtype: list[str]
+        """
+        return list(self._by_intent.get(intent.lstrip('#'), []))
+
+    def nodes_for_entity(self, entity):
+        """
+        The IDs of the nodes whose conditions reference `@entity`.
+
+        :rtype: list[str]
+        """
+        return list(self._by_entity.get(entity.lstrip('@'), []))
+
+    def jump_target(self, node_id):
+        """
+        The node ID that `next_step` jumps to after this node, if any.
+
+        :rtype: str
+        """
+        return self._jumps.get(node_id)
+
+    def jumps_to(self, node_id):
+        """
+        The IDs of the nodes that jump to this node.
+
+        :rtype: list[str]
+        """
+        return list(self._incoming_jumps.get(node_id, []))
+
+    def broken_jumps(self):
+        """
+        Jumps to nodes that do not exist.
+
+        :return: `(node_id, missing_target)` pairs.
+        :rtype: list[tuple]
+        """
+        return [(node_id, self._jumps[node_id]) for node_id in self._order
+                if node_id in self._jumps and self._jumps[node_id] not in self.nodes]
+
+    def broken_links(self):
+        """
+        `parent` and `previous_sibling` references to nodes that do not exist.
+
+        :return: `(node_id, field, missing_target)` tuples.
+        :rtype: list[tuple]
+        """
+        broken = []
+        for node_id in self._order:
+            node = self.nodes[node_id]
+            for field in ('parent', 'previous_sibling'):
+                target = node.get(field)
+                if target is not None and target not in self.nodes:
+                    broken.append((node_id, field, target))
+        return broken
+
+    def unreachable_nodes(self):
+        """
+        Nodes that can never be evaluated.
+
+        Root-level nodes and the children of reachable nodes are reachable unless an
+        earlier sibling's condition is `true` or `anything_else`; jump targets of
+        reachable nodes are always reachable. Nodes caught in a `parent` cycle or below
+        a missing parent are never reached.
+
+        :return: Node IDs in export order.
+        :rtype: list[str]
+        """
+        reachable = set()
+        queue = deque()
+
+        def visit(node_id):
+            if node_id in self.nodes and node_id not in reachable:
+                reachable.add(node_id)
+                queue.append(node_id)
+
+        def visit_children(parent_id):
+            for child in self.children(parent_id):
+                visit(child)
+                conditions = (self.nodes[child].get('conditions') or '').strip()
+                if conditions in _ALWAYS_TRUE_CONDITIONS:
+                    break
+
+        visit_children(None)
+        while queue:
+            node_id = queue.popleft()
+            visit_children(node_id)
+            target = self._jumps.get(node_id)
+            if target is not None:
+                visit(target)
+        return [node_id for node_id in self._order if node_id not in reachable]
+
+    def uncovered_intents(self):
+        """
+        Workspace intents that no node condition references.
+
+        :rtype: list[str]
+        """
+        return [intent for intent in self.intents if intent not in self._by_intent]
+
+    def undefined_intents(self):
+        """
+        Intents referenced by node conditions that the workspace does not define.
+
+        :rtype: list[str]
+        """
+        defined = set(self.intents)
+        return sorted(intent for intent in self._by_intent if intent not in defined)
+
+    def validate(self):
+        """
+        Run all checks.
+
+        :return: A `dict` with the results of `unreachable_nodes`, `broken_jumps`,
+                 `broken_links`, `uncovered_intents` and `undefined_intents`.
+        :rtype: dict
+        """
+        return {
+            'unreachable_nodes': self.unreachable_nodes(),
+            'broken_jumps': self.broken_jumps(),
+            'broken_links': self.broken_links(),
+            'uncovered_intents': self.uncovered_intents(),
+            'undefined_intents': self.undefined_intents()
+        }
@@ -0,0 +1,417 @@
+# coding: utf-8
+
+# Copyright 2017 IBM All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Load testing for the Conversation `message` endpoint.
+
+Recorded multi-turn transcripts are replayed by concurrent virtual users, each carrying
+the `context` of one turn into the next, optionally at a fixed overall request rate.
+`StandInConversationServer` answers `message` requests locally so runs can be made
+offline.
+"""
+
+from __future__ import absolute_import
+
+import json
+import math
+import random
+import threading
+import time
+import uuid
+from array import array
+from collections import Counter
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer  # Python 3
+    from socketserver import ThreadingMixIn
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer  # Python 2
+    from SocketServer import ThreadingMixIn
+
+from .concurrency import RateLimiter
+from .watson_service import WatsonApiException
+
+_clock = getattr(time, 'monotonic', time.time)
+
+
+def _normalize_turn(turn):
+    if isinstance(turn, dict):
+        return turn
+    return {'text': turn}
+
+
+def load_transcripts(path):
+    """
+    Load transcripts from a JSON or JSONL file.
+
+    A JSON file holds a list of transcripts; a JSONL file holds one transcript per line.
+    A transcript is either a list of turns or an object with a `turns` list, and a turn
+    is either the user's text or a `MessageInput` dict.
+
+    :param str path: The file to read.
+    :return: The transcripts, as lists of `MessageInput` dicts.
+    :rtype: list[list[dict]]
+    """
+    with open(path, 'r') as transcript_file:
+        content = transcript_file.read().strip()
+    if content.startswith('['):
+        raw = json.loads(content)
+    else:
+        raw = [json.loads(line) for line in content.splitlines() if line.strip()]
+    transcripts = []
+    for transcript in raw:
+        if isinstance(transcript, dict):
+            transcript = transcript['turns']
+        transcripts.append([_normalize_turn(turn) for turn in transcript])
+    return transcripts
+
+
+class LoadTestReport(object):
+    """
+    The outcome of a load test run.
+
+    Latency percentiles are computed over successful requests only, so fast rejections
+    do not flatter the numbers.
+
+    :attr int requests: The number of `message` calls made.
+    :attr int errors: The number of failed calls, including rate limited ones.
+    :attr int rate_limited: The number of calls rejected with HTTP 429.
+    :attr float duration: The wall-clock duration of the run, in seconds.
+    :attr Counter status_codes: The number of failed calls per HTTP status code
+          (`None` for connection errors).
+    """
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.rate_limited = 0
+        self.duration = 0.0
+        self.status_codes = Counter()
+        self._latencies = array('d')
+        self._sorted = True
+        self._lock = threading.Lock()
+
+    def record(self, latency, status_code=None, error=False):
+        """
+        Record the outcome of one call.
+
+        :param float latency: The call latency, in seconds.
+        :param int status_code: The HTTP status code of a failed call.
+        :param bool error: Whether the call failed.
+        """
+        with self._lock:
+            self.requests += 1
+            if error:
+                self.errors += 1
+                self.status_codes[status_code] += 1
+                if status_code == 429:
+                    self.rate_limited += 1
+            else:
+                self._latencies.append(latency)
+                self._sorted = False
+
+    def percentile(self, percent):
+        """
+        Latency at the given percentile, using the nearest-rank method.
+
+        :param float percent: A percentile between 0 and 100.
+        :return: The latency in seconds, or `None` when no call succeeded.
+        :rtype: float
+        """
+        with self._lock:
+            if not self._latencies:
+                return None
+            if not self._sorted:
+                self._latencies = array('d', sorted(self._latencies))
+                self._sorted = True
+            rank = int(math.ceil(percent / 100.0 * len(self._latencies)))
+            return self._latencies[max(rank, 1) - 1]
+
+    @property
+    def throughput(self):
+        """Successful calls per second."""
+        if not self.duration:
+            return 0.0
+        return (self.requests - self.errors) / self.duration
+
+    @property
+    def error_rate(self):
+        """The fraction of calls that failed."""
+        return float(self.errors) / self.requests if self.requests else 0.0
+
+    @property
+    def rate_limited_rate(self):
+        """The fraction of calls rejected with HTTP 429."""
+        return float(self.rate_limited) / self.requests if self.requests else 0.0
+
+    def _to_dict(self):
+        """Return a json dictionary representing this report."""
+        latencies = self._latencies
+        return {
+            'requests': self.requests,
+            'errors': self.errors,
+            'rate_limited': self.rate_limited,
+            'error_rate': self.error_rate,
+            'rate_limited_rate': self.rate_limited_rate,
+            'duration': self.duration,
+            'throughput': self.throughput,
+            'status_codes': dict(
+                (str(k), v) for k, v in self.status_codes.items()),
+            'latency': {
+                'p50': self.percentile(50),
+                'p90': self.percentile(90),
+                'p95': self.percentile(95),
+                'p99': self.percentile(99),
+                'max': max(latencies) if latencies else None,
+                'mean': sum(latencies) / len(latencies) if latencies else None
+            }
+        }
+
+    def __str__(self):
+        """Return a `str` version of this LoadTestReport object."""
+        return json.dumps(self._to_dict(), indent=2)
+
+
+class LoadGenerator(object):
+    """
+    Replays transcripts against `ConversationV1.message` with concurrent virtual users.
+
+    Each virtual user replays transcripts one after the other, starting a new
+    conversation for every transcript. A failed turn ends the replay of that transcript,
+    because the context needed by the following turns is lost.
+    """
+
+    def __init__(self,
+                 conversation,
+                 workspace_id,
+                 transcripts,
+                 virtual_users=10,
+                 rate=None,
+                 duration=None,
+                 iterations=1):
+        """
+        Initialize a LoadGenerator object.
+
+        :param ConversationV1 conversation: The client to load.
+        :param str workspace_id: The workspace the messages are sent to.
+        :param list transcripts: The transcripts to replay (see `load_transcripts`).
+        :param int virtual_users: The number of concurrent conversations.
+        :param float rate: The target number of requests per second over all virtual
+               users. Unlimited by default.
+        :param float duration: Run for this many seconds, replaying transcripts in a
+               loop. When not set, every virtual user replays `iterations` transcripts.
+        :param int iterations: The number of transcripts each virtual user replays when
+               no `duration` is set.
+        """
+        if conversation is None:
+            raise ValueError('conversation must be provided')
+        if workspace_id is None:
+            raise ValueError('workspace_id must be provided')
+        if not transcripts:
+            raise ValueError('transcripts must be provided')
+        if not all(transcripts):
+            raise ValueError('every transcript must have at least one turn')
+        self.conversation = conversation
+        self.workspace_id = workspace_id
+        self.transcripts = [[_normalize_turn(turn) for turn in transcript]
+                            for transcript in transcripts]
+        self.virtual_users = virtual_users
+        self.rate_limiter = RateLimiter(rate) if rate else None
+        self.duration = duration
+        self.iterations = iterations
+
+    def _replay(self, transcript, report, deadline):
+        context = None
+        for turn in transcript:
+            if deadline is not None and _clock() >= deadline:
+                return False
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire()
+            start = _clock()
+            try:
+                response = self.conversation.message(
+                    self.workspace_id, input=turn, context=context)
+            except WatsonApiException as ex:
+                report.record(_clock() - start, ex.code, error=True)
+                return True
+            except Exception:  # pylint: disable=broad-except
+                report.record(_clock() - start, None, error=True)
+                return True
+            report.record(_clock() - start)
+            context = response.get('context')
+        return True
+
+    def _virtual_user(self, index, report, deadline):
+        replay = 0
+        while deadline is not None or replay < self.iterations:
+            if deadline is not None and _clock() >= deadline:
+                return
+            transcript = self.transcripts[(index + replay) % len(self.transcripts)]
+            if not self._replay(transcript, report, deadline):
+                return
+            replay += 1
+
+    def run(self):
+        """
+        Run the load test and wait for it to finish.
+
+        :rtype: LoadTestReport
+        """
+        report = LoadTestReport()
+        start = _clock()
+        deadline = start + self.duration if self.duration else None
+        threads = [
+            threading.Thread(
+                target=self._virtual_user, args=(index, report, deadline))
+            for index in range(self.virtual_users)
+        ]
+        for thread in threads:
+            thread.daemon = True
+            thread.start()
+        for thread in threads:
+            thread.join()
+        report.duration = _clock() - start
+        return report
+
+
+class _StandInHandler(BaseHTTPRequestHandler):
+
+    def log_message(self, *args):  # pylint: disable=arguments-differ
+        pass
+
+    def _send_json(self, status, body, headers=None):
+        payload = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_POST(self):  # pylint: disable=invalid-name
+        stand_in = self.server.stand_in
+        length = int(self.headers.get('Content-Length') or 0)
+        request = json.loads(self.rfile.read(length).decode('utf-8') or '{}')
+        path = self.path.split('?', 1)[0]
+        if not (path.startswith('/v1/workspaces/') and path.endswith('/message')):
+            self._send_json(404, {'error': 'Resource not found', 'code': 404})
+            return
+        if stand_in.response_delay:
+            time.sleep(stand_in.response_delay)
+        outcome = stand_in.roll()
+        if outcome == 429:
+            self._send_json(429, {'error': 'Rate limit exceeded', 'code': 429}, {
+                'X-RateLimit-Limit': '1000',
+                'X-RateLimit-Reset': str(int(time.time()) + 1)
+            })
+            return
+        if outcome == 500:
+            self._send_json(500, {'error': 'Stand-in failure', 'code': 500})
+            return
+        user_input = request.get('input') or {}
+        context = request.get('context') or {
+            'conversation_id': str(uuid.uuid4()),
+            'system': {'dialog_turn_counter': 0}
+        }
+        system = context.setdefault('system', {})
+        system['dialog_turn_counter'] = system.get('dialog_turn_counter', 0) + 1
+        self._send_json(200, {
+            'input': user_input,
+            'intents': [{'intent': 'stand_in', 'confidence': 1.0}],
+            'entities': [],
+            'context': context,
+            'output': {
+                'text': [user_input.get('text', '')],
+                'nodes_visited': ['stand_in'],
+                'log_messages': []
+            }
+        })
+
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class StandInConversationServer(object):
+    """
+    A local HTTP server that answers `message` requests like the Conversation service.
+
+    Every reply echoes the input text and increments `context.system.dialog_turn_counter`,
+    so context threading can be checked. Failures and rate limiting can be injected.
+    Point a client at it with `ConversationV1(version, url=server.url, ...)`.
+    """
+
+    def __init__(self,
+                 host='127.0.0.1',
+                 port=0,
+                 response_delay=0.0,
+                 error_rate=0.0,
+                 rate_limit_rate=0.0,
+                 seed=None):
+        """
+        Initialize a StandInConversationServer object.
+
+        :param str host: The interface to listen on.
+        :param int port: The port to listen on. By default a free port is picked.
+        :param float response_delay: Seconds to wait before answering each request.
+        :param float error_rate: The fraction of requests answered with HTTP 500.
+        :param float rate_limit_rate: The fraction of requests answered with HTTP 429.
+        :param int seed: Seed for the failure injection, for reproducible runs.
+        """
+        self.response_delay = response_delay
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = _ThreadingHTTPServer((host, port), _StandInHandler)
+        self._server.stand_in = self
+        self._thread = None
+
+    @property
+    def url(self):
+        """The base URL to pass to `ConversationV1`."""
+        host, port = self._server.server_address[:2]
+        return 'http://{0}:{1}'.format(host, port)
+
+    def roll(self):
+        """Pick the outcome of a request: 200, 429 or 500."""
+        with self._lock:
+            draw = self._random.random()
+        if draw < self.rate_limit_rate:
+            return 429
+        if draw < self.rate_limit_rate + self.error_rate:
+            return 500
+        return 200
+
+    def start(self):
+        """Start serving in a background thread."""
+        self._thread = threading.Thread(target=self._server.serve_forever)
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop serving and release the port."""
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
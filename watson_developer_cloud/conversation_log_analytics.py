@@ -0,0 +1,320 @@
+# coding: utf-8
+
+# Copyright 2017 IBM All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Local analytics over exported Conversation logs.
+
+Log events (`LogExport` dicts, or bare `MessageResponse` dicts) are read once and packed
+into compact typed columns: the top intent as an index into an intent vocabulary, its
+confidence, a fallback flag and the entities of each event. All reports are computed
+from those columns, with NumPy when it is installed and in pure Python otherwise.
+"""
+
+from __future__ import absolute_import
+
+import gzip
+import io
+import itertools
+import json
+from array import array
+from collections import Counter
+
+from .files import string_types
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+DEFAULT_CONFIDENCE_THRESHOLD = 0.2
+
+# Upper bound on the cells of one block of the entity incidence matrix
+_COOCCURRENCE_BLOCK_CELLS = 1 << 22
+
+
+def read_jsonl(paths):
+    """
+    Yield the records of one or more JSONL files, such as those written by
+    `LogExporter`. Files ending in `.gz` are decompressed on the fly.
+
+    :param list[str] paths: The files to read, in order.
+    :return: A generator of `dict` records.
+    """
+    if isinstance(paths, string_types):
+        paths = [paths]
+    for path in paths:
+        if path.endswith('.gz'):
+            stream = gzip.open(path, 'rb')
+        else:
+            stream = io.open(path, 'rb')
+        with stream:
+            for line in stream:
+                line = line.strip()
+                if line:
+                    yield json.loads(line.decode('utf-8'))
+
+
+class _Vocabulary(object):
+    """Interns strings as consecutive integer codes."""
+
+    def __init__(self):
+        self.codes = {}
+        self.names = []
+
+    def code(self, name):
+        code = self.codes.get(name)
+        if code is None:
+            code = len(self.names)
+            self.codes[name] = code
+            self.names.append(name)
+        return code
+
+
+class LogColumns(object):
+    """
+    Columnar representation of a set of log events.
+
+    :attr list[str] intent_names: The intent vocabulary.
+    :attr array intent_codes: Per event, the index of the top intent in
+          `intent_names`, or -1 when no intent was recognized.
+    :attr array confidences: Per event, the confidence of the top intent.
+    :attr array fallback: Per event, 1 when the event counts as a fallback.
+    :attr list[str] entity_names: The entity vocabulary.
+    :attr array entity_offsets: Event `i` has the entities
+          `entity_codes[entity_offsets[i]:entity_offsets[i + 1]]`.
+    :attr array entity_codes: Distinct entity codes of every event, concatenated.
+    """
+
+    def __init__(self):
+        self.intent_names = []
+        self.intent_codes = array('i')
+        self.confidences = array('d')
+        self.fallback = array('b')
+        self.entity_names = []
+        self.entity_offsets = array('l', [0])
+        self.entity_codes = array('i')
+
+    def __len__(self):
+        return len(self.intent_codes)
+
+
+def build_columns(records,
+                  confidence_threshold=DEFAULT_CONFIDENCE_THRESHOLD,
+                  fallback_nodes=None):
+    """
+    Build `LogColumns` from log events in a single pass.
+
+    An event counts as a fallback when no intent was recognized, when the top intent's
+    confidence is below `confidence_threshold`, or when one of `fallback_nodes` appears
+    in `output.nodes_visited`.
+
+    :param records: An iterable of `LogExport` or `MessageResponse` dicts.
+    :param float confidence_threshold: The minimum confidence of a handled event.
+    :param list[str] fallback_nodes: Dialog node IDs that mark a fallback response
+           (for example the `anything_else` node).
+    :rtype: LogColumns
+    """
+    fallback_nodes = frozenset(fallback_nodes or ())
+    intents = _Vocabulary()
+    entities = _Vocabulary()
+    columns = LogColumns()
+
+    for record in records:
+        response = record.get('response', record)
+        top = None
+        for intent in response.get('intents') or ():
+            if top is None or intent.get('confidence', 0) > top.get('confidence', 0):
+                top = intent
+        if top is None:
+            code, confidence = -1, 0.0
+        else:
+            code = intents.code(top['intent'])
+            confidence = float(top.get('confidence') or 0.0)
+        is_fallback = code < 0 or confidence < confidence_threshold
+        if not is_fallback and fallback_nodes:
+            visited = (response.get('output') or {}).get('nodes_visited') or ()
+            is_fallback = any(node in fallback_nodes for node in visited)
+        columns.intent_codes.append(code)
+        columns.confidences.append(confidence)
+        columns.fallback.append(1 if is_fallback else 0)
+
+        seen = set()
+        for entity in response.get('entities') or ():
+            seen.add(entities.code(entity['entity']))
+        columns.entity_codes.extend(sorted(seen))
+        columns.entity_offsets.append(len(columns.entity_codes))
+
+    columns.intent_names = intents.names
+    columns.entity_names = entities.names
+    return columns
+
+
+class LogAnalytics(object):
+    """
+    Reports over a `LogColumns` set.
+
+    :attr LogColumns columns: The underlying columns.
+    :attr bool vectorized: Whether NumPy is used for the computations.
+    """
+
+    def __init__(self, columns, vectorized=None):
+        """
+        Initialize a LogAnalytics object.
+
+        :param LogColumns columns: The columns to analyze.
+        :param bool vectorized: Force (`True`) or disable (`False`) the NumPy code
+               path. Defaults to using NumPy when it is installed.
+        """
+        if vectorized is None:
+            vectorized = numpy is not None
+        if vectorized and numpy is None:
+            raise ImportError('numpy is required for vectorized analytics')
+        self.columns = columns
+        self.vectorized = vectorized
+
+    @classmethod
+    def from_logs(cls, records, **kwargs):
+        """
+        Build the analytics for an iterable of log event dicts.
+
+        Keyword arguments are passed to `build_columns`.
+
+        :rtype: LogAnalytics
+        """
+        return cls(build_columns(records, **kwargs))
+
+    @classmethod
+    def from_jsonl(cls, paths, **kwargs):
+        """
+        Build the analytics for JSONL export files.
+
+        Keyword arguments are passed to `build_columns`.
+
+        :rtype: LogAnalytics
+        """
+        return cls(build_columns(read_jsonl(paths), **kwargs))
+
+    def _np(self, column, dtype):
+        # Zero-copy view over the array.array buffer
+        if not len(column):
+            return numpy.zeros(0, dtype=dtype)
+        return numpy.frombuffer(column, dtype=dtype)
+
+    def intent_frequency(self):
+        """
+        Count the events per top intent.
+
+        :return: `(intent, count)` pairs, most frequent first.
+        :rtype: list[tuple]
+        """
+        names = self.columns.intent_names
+        if self.vectorized:
+            codes = self._np(self.columns.intent_codes, numpy.int32)
+            counts = numpy.bincount(codes[codes >= 0], minlength=len(names))
+            pairs = [(names[i], int(c)) for i, c in enumerate(counts) if c]
+        else:
+            counter = Counter(c for c in self.columns.intent_codes if c >= 0)
+            pairs = [(names[i], c) for i, c in counter.items()]
+        return sorted(pairs, key=lambda pair: (-pair[1], pair[0]))
+
+    def confidence_histogram(self, bins=10):
+        """
+        Histogram of top-intent confidences over `[0, 1]`, for events with an intent.
+
+        :param int bins: The number of equal-width bins.
+        :return: A `dict` with `counts` (one per bin) and `edges` (`bins + 1` values).
+        :rtype: dict
+        """
+        edges = [float(i) / bins for i in range(bins + 1)]
+        if self.vectorized:
+            codes = self._np(self.columns.intent_codes, numpy.int32)
+            confidences = self._np(self.columns.confidences, numpy.float64)
+            counts, _ = numpy.histogram(
+                confidences[codes >= 0], bins=bins, range=(0.0, 1.0))
+            counts = [int(c) for c in counts]
+        else:
+            counts = [0] * bins
+            for code, confidence in zip(self.columns.intent_codes,
+                                        self.columns.confidences):
+                if code >= 0:
+                    counts[max(0, min(int(confidence * bins), bins - 1))] += 1
+        return {'counts': counts, 'edges': edges}
+
+    def fallback_rate(self):
+        """
+        The fraction of events that fell back.
+
+        :rtype: float
+        """
+        total = len(self.columns)
+        if not total:
+            return 0.0
+        if self.vectorized:
+            return float(self._np(self.columns.fallback, numpy.int8).mean())
+        return float(sum(self.columns.fallback)) / total
+
+    def entity_cooccurrence(self):
+        """
+        Count how often two entities are recognized in the same event.
+
+        :return: Counts keyed by `(entity_a, entity_b)` with `entity_a < entity_b`.
+        :rtype: dict
+        """
+        names = self.columns.entity_names
+        offsets = self.columns.entity_offsets
+        codes = self.columns.entity_codes
+        pairs = {}
+        if self.vectorized and names:
+            matrix = numpy.zeros((len(names), len(names)), dtype=numpy.int64)
+            offsets_np = self._np(offsets, numpy.dtype('l'))
+            codes_np = self._np(codes, numpy.int32)
+            rows = len(offsets) - 1
+            block_rows = max(1, _COOCCURRENCE_BLOCK_CELLS // len(names))
+            for start in range(0, rows, block_rows):
+                stop = min(start + block_rows, rows)
+                lengths = numpy.diff(offsets_np[start:stop + 1])
+                block = numpy.zeros((stop - start, len(names)), dtype=numpy.int64)
+                row_index = numpy.repeat(numpy.arange(stop - start), lengths)
+                block[row_index,
+                      codes_np[offsets_np[start]:offsets_np[stop]]] = 1
+                matrix += block.T.dot(block)
+            for a, b in zip(*numpy.nonzero(numpy.triu(matrix, k=1))):
+                pairs[tuple(sorted((names[a], names[b])))] = int(matrix[a, b])
+        else:
+            counter = Counter()
+            for i in range(len(offsets) - 1):
+                row = codes[offsets[i]:offsets[i + 1]]
+                counter.update(itertools.combinations(row, 2))
+            for (a, b), count in counter.items():
+                pairs[tuple(sorted((names[a], names[b])))] = count
+        return pairs
+
+    def summary(self, bins=10):
+        """
+        All reports in one JSON-serializable `dict`.
+
+        :param int bins: The number of confidence histogram bins.
+        :rtype: dict
+        """
+        return {
+            'events': len(self.columns),
+            'intent_frequency': self.intent_frequency(),
+            'confidence_histogram': self.confidence_histogram(bins),
+            'fallback_rate': self.fallback_rate(),
+            'entity_cooccurrence': [{
+                'entities': list(pair),
+                'count': count
+            } for pair, count in sorted(self.entity_cooccurrence().items())]
+        }
@@ -0,0 +1,322 @@
+# coding: utf-8
+
+# Copyright 2017 IBM All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Stream Conversation log events to JSONL or CSV files.
+
+Pages returned by `list_all_logs` (or `list_logs` for a single workspace) are written to
+disk as they arrive, so memory use is bounded by a single page no matter how many log
+events are exported. Output files can be rotated by size or age and optionally gzipped,
+and the pagination cursor is checkpointed after every page so an interrupted export
+resumes from the last completed page.
+"""
+
+from __future__ import absolute_import
+
+import csv
+import gzip
+import io
+import json
+import os
+import sys
+import time
+
+try:
+    from urllib.parse import unquote  # Python 3
+except ImportError:
+    from urllib import unquote  # Python 2
+
+from .checkpoint import JsonCheckpoint
+
+_clock = getattr(time, 'monotonic', time.time)
+
+
+def next_cursor(pagination):
+    """
+    Extract the cursor for the next page from a `LogPagination` or `Pagination` dict.
+
+    :param dict pagination: The `pagination` object of a collection response.
+    :return: The cursor, or `None` when there are no more pages.
+    :rtype: str
+    """
+    next_url = (pagination or {}).get('next_url')
+    if not next_url or '?' not in next_url:
+        return None
+    for pair in next_url.split('?', 1)[1].split('&'):
+        name, _, value = pair.partition('=')
+        if name == 'cursor':
+            # Cursors are base64 and may contain '+', so don't decode it as a space.
+            return unquote(value)
+    return None
+
+
+def flatten_field(record, path):
+    """
+    Resolve a dotted path such as `response.intents.0.intent` in a log record.
+
+    Numeric path segments index into lists. Dicts and lists found at the end of the
+    path are returned JSON-encoded so they fit in a single CSV cell.
+
+    :param dict record: A `LogExport` dict.
+    :param str path: The dotted path to resolve.
+    :return: The value, or an empty string when the path is missing.
+    :rtype: str
+    """
+    value = record
+    for segment in path.split('.'):
+        if isinstance(value, dict):
+            value = value.get(segment)
+        elif isinstance(value, list) and segment.isdigit():
+            index = int(segment)
+            value = value[index] if index < len(value) else None
+        else:
+            value = None
+        if value is None:
+            return ''
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, separators=(',', ':'))
+    return value
+
+
+if sys.version_info >= (3, 0):
+
+    def _csv_line(values):
+        buf = io.StringIO()
+        csv.writer(buf, lineterminator='\n').writerow(values)
+        return buf.getvalue().encode('utf-8')
+else:
+
+    def _csv_line(values):
+        buf = io.BytesIO()
+        csv.writer(buf, lineterminator='\n').writerow([
+            v.encode('utf-8') if isinstance(v, unicode) else v  # pylint: disable=E0602
+            for v in values
+        ])
+        return buf.getvalue()
+
+
+class _RotatingFile(object):
+    """Binary output file that rolls over by size or age at record boundaries."""
+
+    def __init__(self, directory, prefix, extension, compress, max_bytes,
+                 max_seconds, header, start_index):
+        self.directory = directory
+        self.prefix = prefix
+        self.extension = extension + ('.gz' if compress else '')
+        self.compress = compress
+        self.max_bytes = max_bytes
+        self.max_seconds = max_seconds
+        self.header = header
+        self.index = start_index
+        self.paths = []
+        self._file = None
+        self._bytes = 0
+        self._opened_at = None
+
+    def _open(self):
+        self.index += 1
+        path = os.path.join(self.directory, '{0}-{1:05d}.{2}'.format(
+            self.prefix, self.index, self.extension))
+        if self.compress:
+            self._file = gzip.open(path, 'wb')
+        else:
+            self._file = open(path, 'wb')
+        self.paths.append(path)
+        self._bytes = 0
+        self._opened_at = _clock()
+        if self.header:
+            self._file.write(self.header)
+            self._bytes += len(self.header)
+
+    def _should_rotate(self):
+        if self.max_bytes and self._bytes >= self.max_bytes:
+            return True
+        if self.max_seconds and _clock() - self._opened_at >= self.max_seconds:
+            return True
+        return False
+
+    def write(self, line):
+        if self._file is not None and self._should_rotate():
+            self.close()
+        if self._file is None:
+            self._open()
+        self._file.write(line)
+        self._bytes += len(line)
+
+    def sync(self):
+        """Flush buffered data to disk so a checkpoint never runs ahead of the output."""
+        if self._file is not None:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class LogExporter(object):
+    """
+    Export Conversation log events page by page.
+
+    Delivery is at-least-once: if a run is interrupted after a page was written but
+    before its checkpoint was saved, that page is exported again on resume. Use `log_id`
+    to drop duplicates downstream.
+    """
+
+    FORMAT_JSONL = 'jsonl'
+    FORMAT_CSV = 'csv'
+
+    DEFAULT_CSV_FIELDS = [
+        'log_id', 'request_timestamp', 'response_timestamp', 'workspace_id',
+        'language', 'response.context.conversation_id', 'request.input.text',
+        'response.intents.0.intent', 'response.intents.0.confidence',
+        'response.entities', 'response.output.text',
+        'response.output.nodes_visited'
+    ]
+
+    def __init__(self,
+                 conversation,
+                 output_dir,
+                 filter=None,
+                 workspace_id=None,
+                 export_format=FORMAT_JSONL,
+                 sort=None,
+                 page_limit=None,
+                 compress=False,
+                 max_file_bytes=None,
+                 max_file_seconds=None,
+                 checkpoint_path=None,
+                 file_prefix='logs',
+                 csv_fields=None):
+        """
+        Initialize a LogExporter object.
+
+        :param ConversationV1 conversation: The client used to list the logs.
+        :param str output_dir: The directory the export files are written to.
+        :param str filter: The log filter query. Required unless `workspace_id` is set.
+        :param str workspace_id: Export the logs of this workspace with `list_logs`
+               instead of using `list_all_logs`.
+        :param str export_format: `jsonl` (one `LogExport` JSON object per line) or
+               `csv` (one flattened row per log event).
+        :param str sort: Sorts the log events, as in `list_all_logs`.
+        :param int page_limit: The number of log events to request per page.
+        :param bool compress: Whether to gzip the output files.
+        :param int max_file_bytes: Start a new file once the current one holds this many
+               (uncompressed) bytes.
+        :param float max_file_seconds: Start a new file once the current one has been
+               open this many seconds.
+        :param str checkpoint_path: Where to store the resume checkpoint. Defaults to
+               `<file_prefix>.checkpoint.json` inside `output_dir`.
+        :param str file_prefix: The prefix of the output file names.
+        :param list[str] csv_fields: Dotted paths of the CSV columns (see
+               `flatten_field`). Defaults to `DEFAULT_CSV_FIELDS`.
+        """
+        if conversation is None:
+            raise ValueError('conversation must be provided')
+        if output_dir is None:
+            raise ValueError('output_dir must be provided')
+        if workspace_id is None and filter is None:
+            raise ValueError('filter must be provided')
+        if export_format not in (self.FORMAT_JSONL, self.FORMAT_CSV):
+            raise ValueError(
+                'export_format must be \'jsonl\' or \'csv\'')
+        self.conversation = conversation
+        self.output_dir = output_dir
+        self.filter = filter
+        self.workspace_id = workspace_id
+        self.export_format = export_format
+        self.sort = sort
+        self.page_limit = page_limit
+        self.compress = compress
+        self.max_file_bytes = max_file_bytes
+        self.max_file_seconds = max_file_seconds
+        self.file_prefix = file_prefix
+        self.csv_fields = list(csv_fields or self.DEFAULT_CSV_FIELDS)
+        self.checkpoint = JsonCheckpoint(
+            checkpoint_path or os.path.join(
+                output_dir, file_prefix + '.checkpoint.json'))
+
+    def _list_page(self, cursor):
+        if self.workspace_id is not None:
+            return self.conversation.list_logs(
+                self.workspace_id,
+                sort=self.sort,
+                filter=self.filter,
+                page_limit=self.page_limit,
+                cursor=cursor)
+        return self.conversation.list_all_logs(
+            self.filter,
+            sort=self.sort,
+            page_limit=self.page_limit,
+            cursor=cursor)
+
+    def _encode(self, log):
+        if self.export_format == self.FORMAT_CSV:
+            return _csv_line([flatten_field(log, f) for f in self.csv_fields])
+        return (json.dumps(log, separators=(',', ':')) + '\n').encode('utf-8')
+
+    def export(self):
+        """
+        Run (or resume) the export.
+
+        :return: A `dict` with the number of `logs` and `pages` exported in total, the
+                 `files` written by this run and whether the export is `done`.
+        :rtype: dict
+        """
+        if not os.path.isdir(self.output_dir):
+            os.makedirs(self.output_dir)
+        state = self.checkpoint.load() or {}
+        if state.get('done'):
+            return {
+                'logs': state.get('logs', 0),
+                'pages': state.get('pages', 0),
+                'files': [],
+                'done': True
+            }
+        cursor = state.get('cursor')
+        logs = state.get('logs', 0)
+        pages = state.get('pages', 0)
+
+        header = None
+        extension = 'jsonl'
+        if self.export_format == self.FORMAT_CSV:
+            header = _csv_line(self.csv_fields)
+            extension = 'csv'
+        output = _RotatingFile(self.output_dir, self.file_prefix, extension,
+                               self.compress, self.max_file_bytes,
+                               self.max_file_seconds, header,
+                               state.get('file_index', 0))
+        try:
+            while True:
+                page = self._list_page(cursor)
+                for log in page.get('logs', []):
+                    output.write(self._encode(log))
+                    logs += 1
+                pages += 1
+                output.sync()
+                cursor = next_cursor(page.get('pagination'))
+                self.checkpoint.save({
+                    'cursor': cursor,
+                    'file_index': output.index,
+                    'logs': logs,
+                    'pages': pages,
+                    'done': cursor is None
+                })
+                if cursor is None:
+                    break
+        finally:
+            output.close()
+        return {'logs': logs, 'pages': pages, 'files': output.paths, 'done': True}
@@ -0,0 +1,81 @@
+# coding: utf-8
+
+# Copyright 2017 IBM All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Decode only what a chat loop needs from a `message` response.
+
+`MessageResponse._from_dict` builds a model object for every intent, entity, the
+context and the output, copying the dict at each level. Most clients only read the
+output text, the top intent and the context to send with the next turn; `decode_message`
+takes those straight from the response without building or copying anything else.
+"""
+
+from __future__ import absolute_import
+
+import json
+
+_EMPTY = {}
+
+
+class MessageSummary(object):
+    """
+    The fields of a `MessageResponse` used to drive a conversation.
+
+    :attr list[str] text: The output text, as returned by the service.
+    :attr str intent: The top intent, or `None` when no intent was recognized.
+    :attr float confidence: The confidence of the top intent.
+    :attr dict context: The context to send with the next message. It is the dict of
+          the response, not a copy.
+    """
+
+    __slots__ = ('text', 'intent', 'confidence', 'context')
+
+    def __init__(self, text, intent, confidence, context):
+        self.text = text
+        self.intent = intent
+        self.confidence = confidence
+        self.context = context
+
+    @property
+    def conversation_id(self):
+        """The conversation ID from the context."""
+        return self.context.get('conversation_id')
+
+    def __repr__(self):
+        return 'MessageSummary(intent=%r, confidence=%r, text=%r)' % (
+            self.intent, self.confidence, self.text)
+
+
+def decode_message(response):
+    """
+    Extract the output text, top intent and context from a `message` response.
+
+    :param response: The response, as returned by `ConversationV1.message` or as the
+           raw JSON body in `bytes` or `str`.
+    :rtype: MessageSummary
+    """
+    if isinstance(response, bytes):
+        response = json.loads(response.decode('utf-8'))
+    elif not isinstance(response, dict):
+        response = json.loads(response)
+    intents = response.get('intents')
+    if intents:
+        # Intents are sorted by descending confidence.
+        top = intents[0]
+        intent, confidence = top.get('intent'), top.get('confidence')
+    else:
+        intent = confidence = None
+    return MessageSummary((response.get('output') or _EMPTY).get('text') or [],
+                          intent, confidence, response.get('context') or {})
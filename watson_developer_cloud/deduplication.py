@@ -0,0 +1,330 @@
+# coding: utf-8
+
+# Copyright 2017 IBM All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Send each distinct input of a bulk job to a service only once.
+
+`Deduplicator` reads the inputs in batches, normalizes and hashes each one, calls the
+service concurrently for the first occurrence of every distinct input and copies the
+result (or error) to all the positions holding the same input. Results of recent
+batches are remembered, so duplicates spread through a long stream are collapsed too.
+Factories are provided for `NaturalLanguageUnderstandingV1.analyze`,
+`ToneAnalyzerV3.tone` and `NaturalLanguageClassifierV1.classify`.
+"""
+
+from __future__ import absolute_import
+
+import copy
+import hashlib
+import itertools
+import json
+import re
+import unicodedata
+
+from .cache import LRUCache
+from .concurrency import RateLimiter, TaskResult, retry_call, run_concurrently
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+def normalize_text(text):
+    """
+    The form of a text used to detect duplicates: Unicode NFC, with runs of
+    whitespace collapsed to one space and leading and trailing whitespace removed.
+    Case is kept, since it can change the results of an analysis.
+
+    :param str text: The text.
+    :rtype: str
+    """
+    try:
+        text = unicodedata.normalize('NFC', text)
+    except TypeError:
+        pass  # Python 2 byte strings
+    return _WHITESPACE.sub(' ', text).strip()
+
+
+def input_key(item, normalize=normalize_text):
+    """
+    The hash identifying an input: a string, or a `dict` of call arguments whose
+    string values are normalized.
+
+    :param item: The input.
+    :param normalize: A callable normalizing a string, or `None` to compare inputs
+           exactly.
+    :rtype: str
+    """
+    if normalize is not None:
+        if isinstance(item, dict):
+            item = dict((name, normalize(value) if hasattr(value, 'split') else value)
+                        for name, value in item.items())
+        elif hasattr(item, 'split'):
+            item = normalize(item)
+    encoded = json.dumps(item, sort_keys=True, separators=(',', ':'))
+    if not isinstance(encoded, bytes):
+        encoded = encoded.encode('utf-8')
+    return hashlib.sha256(encoded).hexdigest()
+
+
+class DeduplicationStats(object):
+    """
+    Counters of a deduplicated run.
+
+    :attr int inputs: The number of inputs read.
+    :attr int unique: The number of inputs sent to the service.
+    :attr int duplicates: The number of inputs answered with the result of an identical
+          input of the same batch.
+    :attr int cached: The number of inputs answered with a remembered result of an
+          earlier batch.
+    :attr int calls: The number of service calls made, including retries.
+    :attr int failed: The number of inputs whose call failed.
+    """
+
+    def __init__(self):
+        self.inputs = 0
+        self.unique = 0
+        self.duplicates = 0
+        self.cached = 0
+        self.calls = 0
+        self.failed = 0
+
+    @property
+    def saved(self):
+        """The number of inputs answered without a call."""
+        return self.duplicates + self.cached
+
+    @property
+    def savings(self):
+        """The fraction of inputs answered without a call."""
+        return float(self.saved) / self.inputs if self.inputs else 0.0
+
+    def _to_dict(self):
+        return {
+            'inputs': self.inputs,
+            'unique': self.unique,
+            'duplicates': self.duplicates,
+            'cached': self.cached,
+            'calls': self.calls,
+            'failed': self.failed,
+            'saved': self.saved,
+            'savings': self.savings
+        }
+
+    def __str__(self):
+        return json.dumps(self._to_dict(), indent=2)
+
+
+class Deduplicator(object):
+    """
+    Call a service once per distinct input.
+
+    :attr DeduplicationStats stats: The counters of all the runs so far.
+    """
+
+    def __init__(self,
+                 call,
+                 normalize=normalize_text,
+                 max_workers=8,
+                 rate=None,
+                 retries=3,
+                 backoff=1.0,
+                 batch_size=1000,
+                 cache_size=10000):
+        """
+        Initialize a Deduplicator object.
+
+        :param call: A callable taking one input and returning the service response.
+        :param normalize: A callable normalizing the strings of an input before it is
+               hashed, or `None` to collapse only identical inputs. The first
+               occurrence of an input is sent as is.
+        :param int max_workers: The number of concurrent calls.
+        :param float rate: (optional) The maximum number of calls started per second.
+        :param int retries: The number of retries for rate-limited or failed calls.
+        :param float backoff: The delay before the first retry, in seconds.
+        :param int batch_size: The number of inputs read and collapsed at a time.
+        :param int cache_size: The number of results of earlier batches remembered, or
+               `None` to only collapse duplicates within a batch.
+        """
+        if call is None:
+            raise ValueError('call must be provided')
+        if batch_size < 1:
+            raise ValueError('batch_size must be at least 1')
+        self.call = call
+        self.normalize = normalize
+        self.max_workers = max_workers
+        self.rate_limiter = RateLimiter(rate) if rate else None
+        self.retries = retries
+        self.backoff = backoff
+        self.batch_size = batch_size
+        self.cache = LRUCache(cache_size) if cache_size else None
+        self.stats = DeduplicationStats()
+
+    @classmethod
+    def for_analyze(cls, natural_language_understanding, features, analyze_args=None,
+                    **kwargs):
+        """
+        Deduplicate `NaturalLanguageUnderstandingV1.analyze` calls. Inputs are texts,
+        or `dict` of `analyze` arguments such as `html` or `url`.
+
+        :param NaturalLanguageUnderstandingV1 natural_language_understanding: The
+               service client.
+        :param Features features: The features to analyze each input for.
+        :param dict analyze_args: (optional) Other arguments of every call.
+        :param kwargs: The arguments of `Deduplicator`.
+        :rtype: Deduplicator
+        """
+        if features is None:
+            raise ValueError('features must be provided')
+        features = natural_language_understanding._convert_model(features)
+        analyze_args = analyze_args or {}
+
+        def call(item):
+            arguments = dict(analyze_args)
+            arguments.update(item if isinstance(item, dict) else {'text': item})
+            arguments.setdefault('features', features)
+            return natural_language_understanding.analyze(**arguments)
+
+        return cls(call, **kwargs)
+
+    @classmethod
+    def for_tone(cls, tone_analyzer, content_type='text/plain;charset=utf-8',
+                 tone_args=None, **kwargs):
+        """
+        Deduplicate `ToneAnalyzerV3.tone` calls. Inputs are texts, or `ToneInput`
+        dicts with `content_type` `application/json`.
+
+        :param ToneAnalyzerV3 tone_analyzer: The service client.
+        :param str content_type: The content type of the inputs.
+        :param dict tone_args: (optional) Other arguments of every call, such as
+               `sentences`.
+        :param kwargs: The arguments of `Deduplicator`.
+        :rtype: Deduplicator
+        """
+        tone_args = tone_args or {}
+
+        def call(item):
+            return tone_analyzer.tone(item, content_type=content_type, **tone_args)
+
+        return cls(call, **kwargs)
+
+    @classmethod
+    def for_classify(cls, natural_language_classifier, classifier_id, **kwargs):
+        """
+        Deduplicate `NaturalLanguageClassifierV1.classify` calls. Inputs are texts.
+
+        :param NaturalLanguageClassifierV1 natural_language_classifier: The service
+               client.
+        :param str classifier_id: The classifier to use.
+        :param kwargs: The arguments of `Deduplicator`.
+        :rtype: Deduplicator
+        """
+        if classifier_id is None:
+            raise ValueError('classifier_id must be provided')
+
+        def call(item):
+            return natural_language_classifier.classify(classifier_id, item)
+
+        return cls(call, **kwargs)
+
+    def run(self, items, ordered=True):
+        """
+        Process every input, calling the service once per distinct input.
+
+        :param items: An iterable of inputs, consumed one batch at a time.
+        :param bool ordered: Yield results in input order (`True`), or each batch as
+               its calls complete.
+        :return: A generator of `TaskResult` objects, one per input, with the response
+                 as `value` or the exception as `error`. Duplicates get their own
+                 copy of the response.
+        """
+        iterator = iter(items)
+        start = 0
+        while True:
+            batch = list(itertools.islice(iterator, self.batch_size))
+            if not batch:
+                return
+            for result in self._run_batch(batch, start, ordered):
+                yield result
+            start += len(batch)
+
+    def _run_batch(self, batch, start, ordered):
+        positions = {}
+        known = {}
+        for offset, item in enumerate(batch):
+            self.stats.inputs += 1
+            key = input_key(item, self.normalize)
+            if key in positions:
+                positions[key].append(offset)
+                self.stats.duplicates += 1
+                continue
+            cached = self.cache.get(key) if self.cache is not None else None
+            if cached is not None:
+                known[offset] = cached
+                self.stats.cached += 1
+                continue
+            positions[key] = [offset]
+        self.stats.unique += len(positions)
+
+        results = [None] * len(batch)
+        # Results of earlier batches are ready first
+        ready = sorted(known)
+        for offset in ready:
+            results[offset] = TaskResult(start + offset, batch[offset],
+                                         value=copy.deepcopy(known[offset]))
+        next_offset = 0
+        if not ordered:
+            for offset in ready:
+                yield results[offset]
+
+        tasks = sorted((offsets[0], key) for key, offsets in positions.items())
+        for task in run_concurrently(lambda t: self._call(batch[t[0]]), tasks,
+                                     self.max_workers, ordered=ordered):
+            key = task.item[1]
+            if task.ok:
+                value, calls, error = task.value
+            else:
+                value, calls, error = None, 0, task.error
+            self.stats.calls += calls
+            if error is None and self.cache is not None:
+                self.cache.set(key, copy.deepcopy(value))
+            for number, offset in enumerate(positions[key]):
+                if error is not None:
+                    self.stats.failed += 1
+                results[offset] = TaskResult(
+                    start + offset, batch[offset], error=error,
+                    value=copy.deepcopy(value) if number else value)
+                if not ordered:
+                    yield results[offset]
+            if ordered:
+                while next_offset < len(batch) and results[next_offset] is not None:
+                    yield results[next_offset]
+                    next_offset += 1
+        if ordered:
+            for result in results[next_offset:]:
+                yield result
+
+    def _call(self, item):
+        calls = [0]
+
+        def attempt():
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire()
+            calls[0] += 1
+            return self.call(item)
+
+        try:
+            response = retry_call(attempt, retries=self.retries, backoff=self.backoff)
+        except Exception as error:  # pylint: disable=broad-except
+            return None, calls[0], error
+        return response, calls[0], None
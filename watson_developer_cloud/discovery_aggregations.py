@@ -0,0 +1,375 @@
+# coding: utf-8
+
+# Copyright 2017 IBM All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Build Discovery aggregation expressions and decode their results into columns.
+
+An aggregation is built as a chain, where each step runs on every bucket of the one
+before::
+
+    by_day = timeslice('publication_date', '1day').term(
+        'enriched_text.sentiment.document.label', count=3)
+    response = discovery.query(environment_id, collection_id,
+                               aggregation=str(by_day), count=0)
+    table = by_day.decode(response)
+
+The nested result tree is flattened once into an `AggregationTable`: one key column per
+bucket step (`term`, `histogram`, `timeslice`) and a `counts` column holding the
+`matching_results` of the innermost buckets, one row per bucket combination. Columns
+are `array` objects, or NumPy arrays when NumPy is installed, with `timeslice` keys as
+`datetime64[ms]`.
+"""
+
+from __future__ import absolute_import
+
+import json
+from array import array
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+TERM = 'term'
+HISTOGRAM = 'histogram'
+TIMESLICE = 'timeslice'
+NESTED = 'nested'
+FILTER = 'filter'
+
+_BUCKET_TYPES = (TERM, HISTOGRAM, TIMESLICE)
+
+
+class Aggregation(object):
+    """
+    A chain of aggregation steps.
+
+    `str()` gives the expression to pass as the `aggregation` argument of
+    `DiscoveryV1.query`. Aggregations are immutable: every method returns a new chain.
+
+    :attr list steps: `(type, field, arguments)` tuples, outermost first.
+    """
+
+    def __init__(self, steps=()):
+        self.steps = tuple(steps)
+
+    def _then(self, kind, field, *arguments):
+        if not field:
+            raise ValueError('field must be provided')
+        return Aggregation(self.steps + ((kind, field, tuple(
+            str(a) for a in arguments if a is not None)),))
+
+    def term(self, field, count=None):
+        """
+        Group by the values of a field.
+
+        :param str field: The field to group by.
+        :param int count: (optional) The number of most frequent values to return.
+        :rtype: Aggregation
+        """
+        return self._then(TERM, field,
+                          'count:%d' % count if count is not None else None)
+
+    def histogram(self, field, interval):
+        """
+        Group a numeric field into intervals.
+
+        :param str field: The numeric field.
+        :param interval: The width of each interval.
+        :rtype: Aggregation
+        """
+        if interval is None:
+            raise ValueError('interval must be provided')
+        return self._then(HISTOGRAM, field, 'interval:%s' % interval)
+
+    def timeslice(self, field, interval, time_zone=None):
+        """
+        Group a date field into time intervals.
+
+        :param str field: The date field.
+        :param str interval: The length of each interval, for example `1day` or
+               `6hours`.
+        :param str time_zone: (optional) The time zone of the intervals, for example
+               `America/New_York`.
+        :rtype: Aggregation
+        """
+        if interval is None:
+            raise ValueError('interval must be provided')
+        return self._then(TIMESLICE, field, interval, time_zone)
+
+    def nested(self, path):
+        """
+        Aggregate over the elements of an array of objects, such as
+        `enriched_text.entities`. Following steps apply to those elements.
+
+        :param str path: The path of the array.
+        :rtype: Aggregation
+        """
+        return self._then(NESTED, path)
+
+    def filter(self, query):
+        """
+        Restrict the following steps to the documents matching a filter. To start a
+        chain with a filter, use `Aggregation().filter(query)`.
+
+        :param str query: The filter expression.
+        :rtype: Aggregation
+        """
+        return self._then(FILTER, query)
+
+    def __str__(self):
+        return '.'.join('%s(%s)' % (kind, ','.join((field,) + arguments))
+                        for kind, field, arguments in self.steps)
+
+    def __repr__(self):
+        return 'Aggregation(%r)' % str(self)
+
+    def __eq__(self, other):
+        return isinstance(other, Aggregation) and self.steps == other.steps
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash(self.steps)
+
+    def find(self, response):
+        """
+        The result of this aggregation in a query response.
+
+        :param dict response: A `QueryResponse` dict.
+        :return: The `QueryAggregation` dict, or None.
+        :rtype: dict
+        """
+        if not self.steps:
+            raise ValueError('the aggregation is empty')
+        kind, field, _ = self.steps[0]
+        for result in response.get('aggregations') or ():
+            if _matches(result, kind, field):
+                return result
+        return None
+
+    def decode(self, response, vectorized=None):
+        """
+        Decode the result of this aggregation into columns.
+
+        :param dict response: A `QueryResponse` dict, or the `QueryAggregation` dict
+               of this aggregation.
+        :param bool vectorized: Force (`True`) or disable (`False`) NumPy columns.
+               Defaults to using NumPy when it is installed.
+        :rtype: AggregationTable
+        """
+        result = response if 'type' in response else self.find(response)
+        if result is None:
+            raise ValueError('the response has no result for %s' % self)
+        return decode_aggregation(result, self, vectorized)
+
+
+def _start(kind):
+
+    def start(*args, **kwargs):
+        return getattr(Aggregation(), kind)(*args, **kwargs)
+
+    start.__name__ = kind
+    start.__doc__ = 'Start an aggregation with a `%s` step. See `Aggregation.%s`.' % (
+        kind, kind)
+    return start
+
+
+term = _start(TERM)
+histogram = _start(HISTOGRAM)
+timeslice = _start(TIMESLICE)
+nested = _start(NESTED)
+
+
+def combine(*aggregations):
+    """
+    The expression running several aggregations in one query.
+
+    :param list[Aggregation] aggregations: The aggregations.
+    :rtype: str
+    """
+    return ','.join(str(aggregation) for aggregation in aggregations)
+
+
+def _matches(result, kind, field):
+    if result.get('type') != kind:
+        return False
+    if kind == NESTED:
+        return result.get('path') == field
+    if kind == FILTER:
+        return result.get('match', field) == field
+    return result.get('field') == field
+
+
+class AggregationTable(object):
+    """
+    The flattened result of an aggregation: one row per combination of buckets.
+
+    :attr list[str] names: The field of each bucket step, outermost first.
+    :attr list columns: The key columns, aligned with `names`. `term` keys are
+          strings, `histogram` keys numbers and `timeslice` keys epoch milliseconds
+          (`datetime64[ms]` with NumPy).
+    :attr counts: The `matching_results` of the innermost bucket of each row.
+    :attr int matching_results: The `matching_results` of the whole aggregation, when
+          the service reports one.
+    :attr bool vectorized: Whether the columns are NumPy arrays.
+    """
+
+    def __init__(self, names, columns, counts, matching_results=None, vectorized=False):
+        self.names = names
+        self.columns = columns
+        self.counts = counts
+        self.matching_results = matching_results
+        self.vectorized = vectorized
+
+    def __len__(self):
+        return len(self.counts)
+
+    def column(self, name):
+        """
+        The key column of a field.
+
+        :param str name: The field name, as in `names`.
+        """
+        if name not in self.names:
+            raise KeyError(name)
+        return self.columns[self.names.index(name)]
+
+    def rows(self):
+        """
+        Iterate over the rows as tuples of the keys followed by the count.
+        """
+        return zip(*(list(self.columns) + [self.counts]))
+
+    def _to_dict(self):
+        _dict = {}
+        for name, column in zip(self.names, self.columns):
+            _dict[name] = [_plain(value) for value in column]
+        _dict['counts'] = [int(count) for count in self.counts]
+        return _dict
+
+    def __str__(self):
+        return json.dumps(self._to_dict(), indent=2)
+
+
+def _plain(value):
+    if numpy is not None and isinstance(value, numpy.generic):
+        if isinstance(value, numpy.datetime64):
+            return int(value.astype('int64'))
+        return value.item()
+    return value
+
+
+def decode_aggregation(result, aggregation=None, vectorized=None):
+    """
+    Flatten a `QueryAggregation` dict into an `AggregationTable`.
+
+    Each bucket step contributes a key column. When a step returns several child
+    aggregations, only the one continuing `aggregation` is followed, or the first one
+    when `aggregation` is not given.
+
+    :param dict result: The `QueryAggregation` dict.
+    :param Aggregation aggregation: (optional) The aggregation that produced it.
+    :param bool vectorized: Force (`True`) or disable (`False`) NumPy columns.
+    :rtype: AggregationTable
+    """
+    if vectorized is None:
+        vectorized = numpy is not None
+    if vectorized and numpy is None:
+        raise ImportError('numpy is required for vectorized aggregations')
+
+    steps = aggregation.steps if aggregation is not None else None
+    names = []
+    kinds = []
+    node = result
+    depth = 0
+    # The chain of bucket steps, found from the first bucket of each level
+    while node is not None:
+        kind = node.get('type')
+        if kind in _BUCKET_TYPES:
+            names.append(node.get('field'))
+            kinds.append(kind)
+        children = _children(node)
+        node = _next(children, steps, depth + 1)
+        depth += 1
+
+    keys = [[] for _ in names]
+    counts = array('l')
+    _collect(result, steps, 0, 0, [], keys, counts)
+
+    columns = [_column(kind, values, vectorized) for kind, values in zip(kinds, keys)]
+    if vectorized:
+        counts = numpy.frombuffer(counts, dtype=numpy.dtype('l')) if len(counts) \
+            else numpy.zeros(0, dtype=numpy.dtype('l'))
+    return AggregationTable(names, columns, counts, result.get('matching_results'),
+                            vectorized)
+
+
+def _children(node):
+    """The child aggregations of a step, from its first non-empty bucket."""
+    if node.get('type') in _BUCKET_TYPES:
+        for bucket in node.get('results') or ():
+            if bucket.get('aggregations'):
+                return bucket['aggregations']
+        return ()
+    return node.get('aggregations') or ()
+
+
+def _next(children, steps, depth):
+    if not children:
+        return None
+    if steps is None:
+        return children[0]
+    if depth >= len(steps):
+        return None
+    kind, field, _ = steps[depth]
+    for child in children:
+        if _matches(child, kind, field):
+            return child
+    return None
+
+
+def _collect(node, steps, depth, level, prefix, keys, counts):
+    """Append the rows below `node`, whose outer bucket keys are `prefix`."""
+    if node.get('type') not in _BUCKET_TYPES:
+        child = _next(node.get('aggregations') or (), steps, depth + 1)
+        if child is not None:
+            _collect(child, steps, depth + 1, level, prefix, keys, counts)
+        elif level == len(keys):
+            _append(prefix, node.get('matching_results') or 0, keys, counts)
+        return
+    for bucket in node.get('results') or ():
+        row = prefix + [bucket.get('key')]
+        child = _next(bucket.get('aggregations') or (), steps, depth + 1)
+        if child is not None:
+            _collect(child, steps, depth + 1, level + 1, row, keys, counts)
+        elif level + 1 == len(keys):
+            _append(row, bucket.get('matching_results') or 0, keys, counts)
+
+
+def _append(row, count, keys, counts):
+    for column, key in zip(keys, row):
+        column.append(key)
+    counts.append(count)
+
+
+def _column(kind, values, vectorized):
+    if kind == TERM:
+        return numpy.array(values, dtype=object) if vectorized else values
+    if kind == TIMESLICE:
+        if vectorized:
+            return numpy.array(values, dtype='int64').astype('datetime64[ms]')
+        return array('d', values)
+    return numpy.array(values, dtype=float) if vectorized else array('d', values)
@@ -0,0 +1,306 @@
+# coding: utf-8
+
+# Copyright 2017 IBM All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Test a Discovery configuration against many sample documents at once.
+
+`test_configuration_in_environment` previews one document per call. The tester sends
+the samples concurrently, caches each preview by the hashes of the configuration and
+of the sample, so that only the samples or configurations that changed are sent again
+while iterating on a configuration, and summarizes the statuses, notices and snapshot
+fields of all the previews.
+"""
+
+from __future__ import absolute_import
+
+import hashlib
+import json
+import os
+
+from .cache import LRUCache
+from .concurrency import RateLimiter, retry_call, run_concurrently
+from .discovery_ingestion import walk_documents
+from .discovery_sync import content_hash, metadata_hash
+from .files import open_document, string_types
+
+
+def configuration_hash(configuration=None, configuration_id=None):
+    """
+    A key identifying a configuration, independent of the JSON key order.
+
+    :param configuration: (optional) The configuration, as a `dict` or JSON string.
+    :param str configuration_id: (optional) The ID of a stored configuration.
+    :rtype: str
+    """
+    if configuration is None:
+        return 'id:%s' % (configuration_id or 'default')
+    if isinstance(configuration, string_types):
+        configuration = json.loads(configuration)
+    encoded = json.dumps(configuration, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+
+
+class ConfigurationTestReport(object):
+    """
+    The previews of a set of samples and their summary.
+
+    :attr dict results: The `TestDocument` dict of each sample key.
+    :attr dict errors: The error message of each sample that could not be previewed.
+    :attr int calls: The number of preview calls made, including retries.
+    :attr int cached: The number of samples answered from the cache.
+    """
+
+    def __init__(self):
+        self.results = {}
+        self.errors = {}
+        self.calls = 0
+        self.cached = 0
+
+    def statuses(self):
+        """
+        The number of samples per preview status.
+
+        :rtype: dict
+        """
+        counts = {}
+        for result in self.results.values():
+            status = result.get('status')
+            counts[status] = counts.get(status, 0) + 1
+        return counts
+
+    def notices(self):
+        """
+        The notices of all samples, grouped by notice ID, severity and step.
+
+        :return: `dict` entries with `notice_id`, `severity`, `step`, `description`
+                 (of the first occurrence), `count` and the sorted `samples` keys,
+                 most frequent first.
+        :rtype: list[dict]
+        """
+        groups = {}
+        for key, result in self.results.items():
+            for notice in result.get('notices') or ():
+                group_key = (notice.get('notice_id'), notice.get('severity'),
+                             notice.get('step'))
+                group = groups.get(group_key)
+                if group is None:
+                    group = groups[group_key] = {
+                        'notice_id': group_key[0],
+                        'severity': group_key[1],
+                        'step': group_key[2],
+                        'description': notice.get('description'),
+                        'count': 0,
+                        'samples': set()
+                    }
+                group['count'] += 1
+                group['samples'].add(key)
+        for group in groups.values():
+            group['samples'] = sorted(group['samples'])
+        return sorted(groups.values(),
+                      key=lambda g: (-g['count'], '%s' % (g['notice_id'],)))
+
+    def steps(self):
+        """
+        For each snapshot step, the number of samples whose snapshot has each
+        top-level field, such as `enriched_text`.
+
+        :return: A `dict` of step to a `dict` of field name to sample count.
+        :rtype: dict
+        """
+        steps = {}
+        for result in self.results.values():
+            for snapshot in result.get('snapshots') or ():
+                fields = steps.setdefault(snapshot.get('step'), {})
+                document = snapshot.get('snapshot')
+                if isinstance(document, dict):
+                    for name in document:
+                        fields[name] = fields.get(name, 0) + 1
+        return steps
+
+    def enriched_field_units(self):
+        """
+        The enriched field units of all samples, to estimate the cost of ingestion.
+
+        :rtype: int
+        """
+        return sum(result.get('enriched_field_units') or 0
+                   for result in self.results.values())
+
+    def _to_dict(self):
+        return {
+            'samples': len(self.results) + len(self.errors),
+            'calls': self.calls,
+            'cached': self.cached,
+            'statuses': self.statuses(),
+            'enriched_field_units': self.enriched_field_units(),
+            'notices': self.notices(),
+            'steps': self.steps(),
+            'errors': self.errors
+        }
+
+    def __str__(self):
+        return json.dumps(self._to_dict(), indent=2)
+
+
+class ConfigurationTester(object):
+    """
+    Preview many sample documents against a configuration concurrently.
+
+    Previews are cached in memory across `test` calls. A configuration given by
+    `configuration_id` is cached by its ID: the previews of stored configurations are
+    dropped when the client updates or deletes a configuration of the environment, but
+    call `cache.clear()` after a configuration is changed by another client.
+    """
+
+    def __init__(self,
+                 discovery,
+                 environment_id,
+                 max_workers=8,
+                 rate=None,
+                 retries=3,
+                 backoff=1.0,
+                 cache=None):
+        """
+        Initialize a ConfigurationTester object.
+
+        :param DiscoveryV1 discovery: The service client.
+        :param str environment_id: The ID of the environment.
+        :param int max_workers: The number of concurrent preview calls.
+        :param float rate: (optional) The maximum number of calls started per second.
+        :param int retries: The number of retries for rate-limited or failed calls.
+        :param float backoff: The delay before the first retry, in seconds.
+        :param LRUCache cache: (optional) The cache of previews. Defaults to an
+               `LRUCache` of 4096 previews. It must support `invalidate_where`.
+        """
+        if environment_id is None:
+            raise ValueError('environment_id must be provided')
+        if cache is not None and not hasattr(cache, 'invalidate_where'):
+            raise ValueError('the preview cache must support invalidate_where, '
+                             'such as LRUCache')
+        self.discovery = discovery
+        self.environment_id = environment_id
+        self.max_workers = max_workers
+        self.rate_limiter = RateLimiter(rate) if rate else None
+        self.retries = retries
+        self.backoff = backoff
+        self.cache = cache if cache is not None else LRUCache(4096)
+        discovery.add_change_listener(self._configuration_changed, documents=False)
+
+    def _configuration_changed(self, environment_id, collection_id):
+        # Configuration changes are the ones that affect the whole environment
+        if environment_id == self.environment_id and collection_id is None:
+            self.cache.invalidate_where(lambda key: key[0].startswith('id:'))
+
+    def close(self):
+        """Stop listening to the changes of the client."""
+        self.discovery.remove_change_listener(self._configuration_changed)
+
+    def test(self, samples, configuration=None, configuration_id=None, step=None):
+        """
+        Preview the samples.
+
+        :param samples: An iterable of file paths, or of `dict` with `key`, `file`
+               (a path, a file-like object or, on Python 3, `bytes`) and optionally
+               `filename`, `metadata` and `file_content_type`.
+        :param configuration: (optional) The configuration to test, as a `dict` or
+               JSON string.
+        :param str configuration_id: (optional) The ID of a stored configuration to
+               test instead.
+        :param str step: (optional) Only run the samples through this step: `convert`,
+               `enrich` or `normalize`.
+        :rtype: ConfigurationTestReport
+        """
+        if configuration is not None and configuration_id is not None:
+            raise ValueError('configuration and configuration_id are exclusive')
+        if configuration is not None and not isinstance(configuration, string_types):
+            configuration = json.dumps(configuration)
+        config_key = (configuration_hash(configuration, configuration_id), step)
+        report = ConfigurationTestReport()
+
+        def preview(sample):
+            return self._preview(sample, config_key, configuration, configuration_id,
+                                 step)
+
+        for result in run_concurrently(preview, self._samples(samples),
+                                       self.max_workers, ordered=False):
+            key = result.item['key']
+            if result.ok:
+                response, calls, error = result.value
+            else:
+                response, calls, error = None, 0, result.error
+            report.calls += calls
+            if error is not None:
+                report.errors[key] = getattr(error, 'message', None) or str(error)
+                continue
+            if calls == 0:
+                report.cached += 1
+            report.results[key] = response
+        return report
+
+    def test_directory(self, root, extensions=None, **kwargs):
+        """
+        Preview every file below a directory. See `walk_documents` and `test`.
+
+        :rtype: ConfigurationTestReport
+        """
+        return self.test(walk_documents(root, extensions), **kwargs)
+
+    def _samples(self, samples):
+        for sample in samples:
+            if not isinstance(sample, dict):
+                sample = {'key': sample, 'file': sample}
+            elif 'key' not in sample:
+                raise ValueError('key must be provided for each sample')
+            yield sample
+
+    def _preview(self, sample, config_key, configuration, configuration_id, step):
+        source = sample.get('file')
+        metadata = sample.get('metadata')
+        if metadata is not None and not isinstance(metadata, string_types):
+            metadata = json.dumps(metadata)
+        # Samples made of metadata alone have no content
+        cache_key = config_key + (content_hash(source) if source is not None else None,
+                                  metadata_hash(metadata))
+        response = self.cache.get(cache_key)
+        if response is not None:
+            return response, 0, None
+
+        filename = sample.get('filename')
+        if filename is None and isinstance(source, string_types):
+            filename = os.path.basename(source)
+        calls = [0]
+
+        def attempt():
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire()
+            calls[0] += 1
+            stream = open_document(source)
+            try:
+                return self.discovery.test_configuration_in_environment(
+                    self.environment_id, configuration=configuration, step=step,
+                    configuration_id=configuration_id, file=stream,
+                    metadata=metadata,
+                    file_content_type=sample.get('file_content_type'),
+                    filename=filename or 'sample')
+            finally:
+                if stream is not None and stream is not source:
+                    stream.close()
+
+        try:
+            response = retry_call(attempt, retries=self.retries, backoff=self.backoff)
+        except Exception as error:  # pylint: disable=broad-except
+            return None, calls[0], error
+        self.cache.set(cache_key, response)
+        return response, calls[0], None
@@ -0,0 +1,338 @@
+# coding: utf-8
+
+# Copyright 2017 IBM All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Export every document of a Discovery collection to JSONL files.
+
+Paging through a whole collection with `offset` is slow, and gets slower the deeper it
+goes. The exporter instead splits the collection into partitions, disjoint filters
+found from the data with an aggregation (`term_partitions`, `range_partitions`) or
+from document ID prefixes (`id_prefix_partitions`), and scans the partitions in
+parallel, each with shallow offsets into its own JSONL file. The progress of every
+partition (offset and file size) is checkpointed after each page, so an interrupted
+export resumes where each partition stopped.
+
+Pages are sorted by `id` unless another `sort` is given, so that consecutive offsets
+read disjoint pages. Offset paging only reaches the first `MAX_QUERY_DEPTH` (10000)
+documents of a query, so every partition must hold fewer documents than that: a
+larger partition fails with an error asking to split it, for example with longer ID
+prefixes or a smaller histogram interval.
+"""
+
+from __future__ import absolute_import
+
+import json
+import os
+import threading
+
+from .checkpoint import JsonCheckpoint
+from .concurrency import retry_call, run_concurrently
+from .discovery_aggregations import histogram, term
+from .discovery_query_iterator import MAX_QUERY_DEPTH
+
+
+def _quote(value):
+    value = '%s' % (value,)
+    return '"%s"' % value.replace('\\', '\\\\').replace('"', '\\"')
+
+
+class Partition(object):
+    """
+    A subset of a collection, selected by a filter.
+
+    :attr str name: The name of the partition, unique within an export.
+    :attr str filter: The filter selecting the documents of the partition.
+    :attr int expected: (optional) The number of documents the partition is
+          expected to hold.
+    """
+
+    def __init__(self, name, filter, expected=None):
+        if not name:
+            raise ValueError('name must be provided')
+        if not filter:
+            raise ValueError('filter must be provided')
+        self.name = name
+        self.filter = filter
+        self.expected = expected
+
+    def __repr__(self):
+        return 'Partition(%r, %r)' % (self.name, self.filter)
+
+
+def _aggregate(discovery, environment_id, collection_id, aggregation, query_args):
+    response = discovery.query(environment_id, collection_id, count=0,
+                               aggregation=str(aggregation), **query_args)
+    return aggregation.decode(response, vectorized=False), \
+        response.get('matching_results')
+
+
+def term_partitions(discovery, environment_id, collection_id, field, count=100,
+                    **query_args):
+    """
+    One partition per value of a field, plus one for the documents with other values.
+
+    The partitions are disjoint only if every document has at most one value in
+    `field`.
+
+    :param DiscoveryV1 discovery: The service client.
+    :param str environment_id: The ID of the environment.
+    :param str collection_id: The ID of the collection.
+    :param str field: A field with a small number of distinct values, such as a
+           source or a category.
+    :param int count: The largest number of values to partition by.
+    :param query_args: Other arguments of `DiscoveryV1.query`, such as `filter`.
+    :rtype: list[Partition]
+    """
+    table, total = _aggregate(discovery, environment_id, collection_id,
+                              term(field, count=count), query_args)
+    partitions = []
+    covered = 0
+    for index, (key, matching) in enumerate(table.rows()):
+        partitions.append(Partition('%s-%04d' % (field, index),
+                                    '%s::%s' % (field, _quote(key)), matching))
+        covered += matching
+    rest = ','.join('%s!::%s' % (field, _quote(key)) for key in table.columns[0]) \
+        if partitions else None
+    expected = total - covered if total is not None else None
+    if rest and expected != 0:
+        partitions.append(Partition('%s-rest' % field, rest, expected))
+    return partitions
+
+
+def range_partitions(discovery, environment_id, collection_id, field, interval,
+                     **query_args):
+    """
+    One partition per interval of a numeric field that holds documents.
+
+    Documents without a value in `field` are in no partition.
+
+    :param DiscoveryV1 discovery: The service client.
+    :param str environment_id: The ID of the environment.
+    :param str collection_id: The ID of the collection.
+    :param str field: A numeric field.
+    :param interval: The width of each partition.
+    :param query_args: Other arguments of `DiscoveryV1.query`, such as `filter`.
+    :rtype: list[Partition]
+    """
+    table, _ = _aggregate(discovery, environment_id, collection_id,
+                          histogram(field, interval), query_args)
+    partitions = []
+    for index, (key, matching) in enumerate(table.rows()):
+        if matching:
+            partitions.append(Partition(
+                '%s-%04d' % (field, index),
+                '%s>=%s,%s<%s' % (field, _number(key), field, _number(key + interval)),
+                matching))
+    return partitions
+
+
+def _number(value):
+    return str(int(value)) if value == int(value) else repr(value)
+
+
+def id_prefix_partitions(alphabet='0123456789abcdef', length=1):
+    """
+    One partition per document ID prefix.
+
+    Suited to collections whose document IDs were generated by the service, which are
+    hexadecimal. No query is needed to find the partitions.
+
+    :param str alphabet: The characters document IDs start with.
+    :param int length: The length of the prefixes, giving `len(alphabet) ** length`
+           partitions.
+    :rtype: list[Partition]
+    """
+    prefixes = ['']
+    for _ in range(length):
+        prefixes = [prefix + char for prefix in prefixes for char in alphabet]
+    return [Partition('id-' + prefix, 'id:%s*' % prefix) for prefix in prefixes]
+
+
+class CollectionExporter(object):
+    """
+    Export a collection partition by partition, in parallel.
+
+    On resume, each output file is truncated back to its checkpointed size, so it
+    holds every document of its partition once. Compare `documents` with `expected`
+    in the result to check the partitions covered the collection. Documents added or
+    removed while the export runs can shift the offsets of a partition and be missed
+    or exported twice.
+    """
+
+    def __init__(self,
+                 discovery,
+                 environment_id,
+                 collection_id,
+                 output_dir,
+                 partitions,
+                 max_workers=4,
+                 page_size=100,
+                 checkpoint_path=None,
+                 file_prefix='documents',
+                 retries=3,
+                 **query_args):
+        """
+        Initialize a CollectionExporter object.
+
+        :param DiscoveryV1 discovery: The service client.
+        :param str environment_id: The ID of the environment.
+        :param str collection_id: The ID of the collection.
+        :param str output_dir: The directory the export files are written to.
+        :param list[Partition] partitions: The partitions to export.
+        :param int max_workers: The number of partitions scanned at the same time.
+        :param int page_size: The number of documents requested per call.
+        :param str checkpoint_path: Where to store the resume checkpoint. Defaults to
+               `<file_prefix>.checkpoint.json` inside `output_dir`.
+        :param str file_prefix: The prefix of the output file names.
+        :param int retries: The number of retries for rate-limited or failed calls.
+        :param query_args: Other arguments of `DiscoveryV1.query`, such as
+               `return_fields`, or a `filter` applied to every partition. Pages are
+               sorted by `id` unless a `sort` on another unique field is given.
+        """
+        if environment_id is None:
+            raise ValueError('environment_id must be provided')
+        if collection_id is None:
+            raise ValueError('collection_id must be provided')
+        if output_dir is None:
+            raise ValueError('output_dir must be provided')
+        names = [partition.name for partition in partitions]
+        if len(set(names)) != len(names):
+            raise ValueError('partition names must be unique')
+        self.discovery = discovery
+        self.environment_id = environment_id
+        self.collection_id = collection_id
+        self.output_dir = output_dir
+        self.partitions = list(partitions)
+        self.max_workers = max_workers
+        self.page_size = page_size
+        self.file_prefix = file_prefix
+        self.retries = retries
+        self.query_args = query_args
+        self.checkpoint = JsonCheckpoint(
+            checkpoint_path or os.path.join(
+                output_dir, file_prefix + '.checkpoint.json'))
+        self._lock = threading.Lock()
+
+    def path(self, partition):
+        """
+        The output file of a partition.
+
+        :param Partition partition: The partition.
+        :rtype: str
+        """
+        return os.path.join(self.output_dir, '%s-%s.jsonl' % (self.file_prefix,
+                                                              partition.name))
+
+    def export(self):
+        """
+        Run (or resume) the export.
+
+        :return: A `dict` with the number of `documents` exported in total, the state
+                 of each partition under `partitions` (`documents`, `expected`,
+                 `done` and `error` when it failed), the `files` holding the export
+                 and whether every partition is `done`.
+        :rtype: dict
+        """
+        if not os.path.isdir(self.output_dir):
+            os.makedirs(self.output_dir)
+        saved = (self.checkpoint.load() or {}).get('partitions', {})
+        state = {}
+        for partition in self.partitions:
+            progress = saved.get(partition.name)
+            if progress is None or progress.get('filter') != partition.filter:
+                progress = {'filter': partition.filter, 'offset': 0, 'bytes': 0,
+                            'done': False}
+            state[partition.name] = progress
+
+        errors = {}
+        pending = [p for p in self.partitions if not state[p.name]['done']]
+        for result in run_concurrently(lambda p: self._scan(p, state), pending,
+                                       self.max_workers, ordered=False):
+            if not result.ok:
+                errors[result.item.name] = getattr(result.error, 'message', None) or \
+                    str(result.error)
+
+        partitions = {}
+        for partition in self.partitions:
+            progress = state[partition.name]
+            partitions[partition.name] = {
+                'documents': progress['offset'],
+                'expected': progress.get('matching_results', partition.expected),
+                'done': progress['done']
+            }
+            if partition.name in errors:
+                partitions[partition.name]['error'] = errors[partition.name]
+        return {
+            'documents': sum(p['documents'] for p in partitions.values()),
+            'partitions': partitions,
+            'files': [self.path(p) for p in self.partitions
+                      if os.path.exists(self.path(p))],
+            'done': all(p['done'] for p in partitions.values())
+        }
+
+    def _filter(self, partition):
+        extra = self.query_args.get('filter')
+        if extra:
+            return '(%s),(%s)' % (extra, partition.filter)
+        return partition.filter
+
+    def _fetch(self, partition, offset):
+        args = dict(self.query_args)
+        args['filter'] = self._filter(partition)
+        # Without a stable order, pages at consecutive offsets can overlap or skip
+        args.setdefault('sort', 'id')
+        return retry_call(lambda: self.discovery.query(
+            self.environment_id, self.collection_id, offset=offset,
+            count=self.page_size, **args), retries=self.retries)
+
+    def _scan(self, partition, state):
+        with self._lock:
+            progress = dict(state[partition.name])
+        path = self.path(partition)
+        output = open(path, 'r+b' if os.path.exists(path) else 'wb')
+        try:
+            # Drop anything written after the last checkpoint
+            output.seek(progress['bytes'])
+            output.truncate()
+            while True:
+                page = self._fetch(partition, progress['offset'])
+                matching_results = page.get('matching_results') or 0
+                if matching_results > MAX_QUERY_DEPTH:
+                    raise ValueError(
+                        'partition %s holds %d documents, more than the %d offset '
+                        'paging can reach: split it into smaller partitions' %
+                        (partition.name, matching_results, MAX_QUERY_DEPTH))
+                results = page.get('results') or []
+                for document in results:
+                    output.write((json.dumps(document, separators=(',', ':')) +
+                                  '\n').encode('utf-8'))
+                output.flush()
+                os.fsync(output.fileno())
+                progress['offset'] += len(results)
+                progress['bytes'] = output.tell()
+                if page.get('matching_results') is not None:
+                    progress['matching_results'] = page['matching_results']
+                progress['done'] = not results or \
+                    progress['offset'] >= progress.get('matching_results', 0)
+                self._save(partition, progress, state)
+                if progress['done']:
+                    return progress
+        finally:
+            output.close()
+
+    def _save(self, partition, progress, state):
+        with self._lock:
+            state[partition.name] = dict(progress)
+            self.checkpoint.save({'partitions': state})
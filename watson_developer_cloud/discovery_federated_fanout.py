@@ -0,0 +1,188 @@
+# coding: utf-8
+
+# Copyright 2017 IBM All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Run one query against collections in several environments or service instances.
+
+`DiscoveryV1.federated_query` only spans collections of a single environment. Here every
+target is queried in parallel (with `federated_query` when a target names several
+collections), and the per-target result lists, which the service returns in descending
+score order, are merged with a k-way heap merge. Each target is read page by page only
+as far as the merge needs, so asking for the top 10 downloads about 10 results per
+target rather than the full result sets.
+"""
+
+from __future__ import absolute_import
+
+import heapq
+
+from .concurrency import run_concurrently
+from .discovery_query_iterator import PagedResults
+
+_EXHAUSTED = object()
+
+
+def result_score(result):
+    """
+    The relevance score of a query result.
+
+    :param dict result: A `QueryResult` dict.
+    :rtype: float
+    """
+    metadata = result.get('result_metadata') or {}
+    score = metadata.get('score', result.get('score'))
+    return score if score is not None else 0.0
+
+
+def _field_value(result, path):
+    value = result
+    for segment in path.split('.'):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(segment)
+    if isinstance(value, list):
+        value = tuple(value)
+    return value
+
+
+class QueryTarget(object):
+    """
+    A collection, or several collections of one environment, to query.
+
+    :attr DiscoveryV1 discovery: The client for the instance holding the collections.
+    :attr str environment_id: The ID of the environment.
+    :attr list[str] collection_ids: The IDs of the collections.
+    """
+
+    def __init__(self, discovery, environment_id, collection_ids):
+        """
+        Initialize a QueryTarget object.
+
+        :param DiscoveryV1 discovery: The client for the instance holding the
+               collections.
+        :param str environment_id: The ID of the environment.
+        :param collection_ids: The ID of a collection, or a list of collection IDs of
+               the environment.
+        """
+        if environment_id is None:
+            raise ValueError('environment_id must be provided')
+        if not collection_ids:
+            raise ValueError('collection_ids must be provided')
+        if not isinstance(collection_ids, (list, tuple)):
+            collection_ids = [collection_ids]
+        self.discovery = discovery
+        self.environment_id = environment_id
+        self.collection_ids = list(collection_ids)
+
+    def pages(self, page_size, query_args):
+        """The results of the query against this target, fetched page by page."""
+        if len(self.collection_ids) == 1:
+
+            def fetch_page(offset, count):
+                return self.discovery.query(self.environment_id,
+                                            self.collection_ids[0], offset=offset,
+                                            count=count, **query_args)
+        else:
+
+            def fetch_page(offset, count):
+                return self.discovery.federated_query(self.environment_id,
+                                                      self.collection_ids,
+                                                      offset=offset, count=count,
+                                                      **query_args)
+
+        # Later pages are only needed when earlier results were duplicates or the
+        # target dominates the top k, so they are not prefetched.
+        return PagedResults(fetch_page, page_size, prefetch=False)
+
+    def __repr__(self):
+        return 'QueryTarget(%r, %r)' % (self.environment_id, self.collection_ids)
+
+
+def fanout_query(targets,
+                 top_k=10,
+                 deduplicate_field=None,
+                 page_size=None,
+                 max_workers=8,
+                 **kwargs):
+    """
+    Query several targets in parallel and merge the results by score.
+
+    :param list[QueryTarget] targets: The collections to query.
+    :param int top_k: The number of results to return.
+    :param str deduplicate_field: (optional) A dotted field path; of several results
+           with the same value only the highest scoring one is kept.
+    :param int page_size: The number of results requested per call to each target.
+           Defaults to `top_k`.
+    :param int max_workers: The number of targets queried at the same time.
+    :param kwargs: Arguments of `DiscoveryV1.query`, such as `query`, `filter` and
+           `return_fields`. Do not pass `sort`, `count` or `offset`: results must
+           arrive in score order.
+    :return: A `dict` with the merged `results`, the total `matching_results` of the
+             targets that answered, and `errors` for the targets that failed. Each
+             result gets the `environment_id` of its target, and its `collection_id`
+             if the service did not include one.
+    :rtype: dict
+    """
+    if top_k < 1:
+        raise ValueError('top_k must be at least 1')
+    page_size = page_size or top_k
+    pages = [target.pages(page_size, kwargs) for target in targets]
+    iterators = [iter(target_pages) for target_pages in pages]
+    failed = {}
+    sequence = [0]
+    heap = []
+
+    def advance(index):
+        return next(iterators[index], _EXHAUSTED)
+
+    def push(index, item):
+        if item is _EXHAUSTED:
+            return
+        target = targets[index]
+        item.setdefault('collection_id', target.collection_ids[0])
+        item['environment_id'] = target.environment_id
+        # The sequence number breaks score ties in target order, without comparing
+        # the result dicts.
+        sequence[0] += 1
+        heapq.heappush(heap, (-result_score(item), index, sequence[0], item))
+
+    # The first page of every target is requested in parallel; later pages only when
+    # the merge reaches the end of a target's page.
+    for result in run_concurrently(advance, range(len(targets)), max_workers):
+        if result.ok:
+            push(result.index, result.value)
+        else:
+            failed[result.index] = result.error
+
+    merged = []
+    seen = set()
+    while heap and len(merged) < top_k:
+        _, index, _, item = heapq.heappop(heap)
+        key = _field_value(item, deduplicate_field) if deduplicate_field else None
+        if key is None or key not in seen:
+            merged.append(item)
+            if key is not None:
+                seen.add(key)
+        try:
+            push(index, advance(index))
+        except Exception as error:  # pylint: disable=broad-except
+            failed[index] = error
+
+    return {
+        'matching_results': sum(pages[i].matching_results or 0
+                                for i in range(len(targets)) if i not in failed),
+        'results': merged,
+        'errors': [{'target': targets[i], 'error': failed[i]} for i in sorted(failed)]
+    }
@@ -0,0 +1,288 @@
+# coding: utf-8
+
+# Copyright 2017 IBM All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Upload large numbers of documents to a Discovery collection.
+
+Documents are read lazily from a directory walk or any iterable and uploaded with
+`add_document` on a pool of threads. Only a bounded number of documents is in flight at
+once, so memory use does not depend on the size of the input. Transient failures are
+retried with backoff, and the outcome of every upload is committed to a SQLite
+checkpoint, so a run that is interrupted and started again skips the documents that
+were already accepted.
+"""
+
+from __future__ import absolute_import
+
+import json
+import os
+import time
+
+from .checkpoint import SqliteCheckpoint
+from .concurrency import RateLimiter, is_rejected_error, retry_call, \
+    run_concurrently
+from .discovery_streaming_upload import add_document_streaming
+from .files import open_document, string_types
+
+_clock = getattr(time, 'monotonic', time.time)
+
+UPLOADED = 'uploaded'
+FAILED = 'failed'
+
+
+def walk_documents(root, extensions=None):
+    """
+    List the files below a directory, in a stable order.
+
+    :param str root: The directory to walk.
+    :param list[str] extensions: (optional) Only include files with these extensions,
+           for example `['.json', '.pdf']`.
+    :return: A generator of file paths.
+    """
+    if extensions is not None:
+        extensions = tuple(e.lower() for e in extensions)
+    for directory, subdirectories, filenames in os.walk(root):
+        subdirectories.sort()
+        for filename in sorted(filenames):
+            if extensions is None or filename.lower().endswith(extensions):
+                yield os.path.join(directory, filename)
+
+
+class IngestionReport(object):
+    """
+    Counts and throughput of an ingestion run.
+
+    :attr int uploaded: The number of documents accepted by the service.
+    :attr int skipped: The number of documents already uploaded by a previous run.
+    :attr int failed: The number of documents that could not be uploaded.
+    :attr int bytes: The number of bytes uploaded.
+    :attr int attempts: The number of `add_document` calls, including retries.
+    :attr list failures: `(key, error)` pairs for the failed documents.
+    """
+
+    def __init__(self):
+        self.uploaded = 0
+        self.skipped = 0
+        self.failed = 0
+        self.bytes = 0
+        self.attempts = 0
+        self.failures = []
+        self.started = _clock()
+        self.finished = None
+
+    @property
+    def elapsed(self):
+        """The duration of the run so far, in seconds."""
+        return (self.finished or _clock()) - self.started
+
+    @property
+    def documents_per_second(self):
+        """The number of documents uploaded per second."""
+        elapsed = self.elapsed
+        return self.uploaded / elapsed if elapsed > 0 else 0.0
+
+    @property
+    def bytes_per_second(self):
+        """The number of bytes uploaded per second."""
+        elapsed = self.elapsed
+        return self.bytes / elapsed if elapsed > 0 else 0.0
+
+    def _to_dict(self):
+        return {
+            'uploaded': self.uploaded,
+            'skipped': self.skipped,
+            'failed': self.failed,
+            'bytes': self.bytes,
+            'attempts': self.attempts,
+            'elapsed_seconds': round(self.elapsed, 3),
+            'documents_per_second': round(self.documents_per_second, 2),
+            'bytes_per_second': round(self.bytes_per_second, 2),
+            'failures': [{'key': key, 'error': error} for key, error in self.failures]
+        }
+
+    def __str__(self):
+        return json.dumps(self._to_dict(), indent=2)
+
+
+class DocumentIngester(object):
+    """
+    Upload documents to a collection concurrently, resuming from a checkpoint.
+    """
+
+    def __init__(self,
+                 discovery,
+                 environment_id,
+                 collection_id,
+                 checkpoint_path=None,
+                 max_workers=8,
+                 max_pending=None,
+                 rate=None,
+                 retries=3,
+                 backoff=1.0,
+                 streaming=False):
+        """
+        Initialize a DocumentIngester object.
+
+        :param DiscoveryV1 discovery: The service client.
+        :param str environment_id: The ID of the environment.
+        :param str collection_id: The ID of the collection.
+        :param str checkpoint_path: (optional) The SQLite file recording the outcome of
+               each upload. Documents recorded as uploaded are skipped.
+        :param int max_workers: The number of concurrent uploads.
+        :param int max_pending: The maximum number of documents read ahead of the
+               uploads. Defaults to twice `max_workers`.
+        :param float rate: (optional) The maximum number of uploads started per second.
+        :param int retries: The number of retries of uploads the service rejected
+               (rate limited or unavailable). Other failures are not retried, since
+               the document may have been added before the failure and sending it
+               again would add a duplicate.
+        :param float backoff: The delay before the first retry, in seconds.
+        :param bool streaming: Send files from paths and file handles with
+               `add_document_streaming`, without reading them into memory.
+        """
+        if discovery is None:
+            raise ValueError('discovery must be provided')
+        if environment_id is None:
+            raise ValueError('environment_id must be provided')
+        if collection_id is None:
+            raise ValueError('collection_id must be provided')
+        self.discovery = discovery
+        self.environment_id = environment_id
+        self.collection_id = collection_id
+        self.checkpoint = SqliteCheckpoint(checkpoint_path) \
+            if checkpoint_path is not None else None
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.rate_limiter = RateLimiter(rate) if rate else None
+        self.retries = retries
+        self.backoff = backoff
+        self.streaming = streaming
+
+    def ingest(self, documents, on_result=None):
+        """
+        Upload documents.
+
+        :param documents: An iterable of file paths, or of `dict` with `key` (used in
+               the checkpoint), `file` (a path, a file-like object or, on Python 3,
+               `bytes`) and optionally `filename`, `metadata` (a `dict` or JSON
+               string) and `file_content_type`.
+        :param on_result: (optional) A callable invoked with
+               `(key, document_id, error, report)` after each upload.
+        :rtype: IngestionReport
+        """
+        report = IngestionReport()
+        pending = self._pending_documents(documents, report)
+        try:
+            for result in run_concurrently(self._upload, pending, self.max_workers,
+                                           max_pending=self.max_pending,
+                                           ordered=False):
+                key = result.item['key']
+                if result.ok:
+                    response, size, attempts, error = result.value
+                else:
+                    response, size, attempts, error = None, 0, 0, result.error
+                report.attempts += attempts
+                document_id = None
+                if error is None:
+                    report.uploaded += 1
+                    report.bytes += size
+                    document_id = response.get('document_id')
+                    if self.checkpoint is not None:
+                        self.checkpoint.record(key, document_id, UPLOADED,
+                                               response.get('status'))
+                else:
+                    error = getattr(error, 'message', None) or str(error)
+                    report.failed += 1
+                    report.failures.append((key, error))
+                    if self.checkpoint is not None:
+                        self.checkpoint.record(key, None, FAILED, error)
+                if on_result is not None:
+                    on_result(key, document_id, error, report)
+        finally:
+            report.finished = _clock()
+        return report
+
+    def ingest_directory(self, root, extensions=None, on_result=None):
+        """
+        Upload every file below a directory. See `walk_documents` and `ingest`.
+
+        :rtype: IngestionReport
+        """
+        return self.ingest(walk_documents(root, extensions), on_result=on_result)
+
+    def _pending_documents(self, documents, report):
+        for document in documents:
+            if not isinstance(document, dict):
+                document = {'key': document, 'file': document}
+            elif 'key' not in document:
+                raise ValueError('key must be provided for each document')
+            if self.checkpoint is not None:
+                record = self.checkpoint.get(document['key'])
+                if record is not None and record['status'] == UPLOADED:
+                    report.skipped += 1
+                    continue
+            yield document
+
+    def _upload(self, document):
+        source = document.get('file')
+        metadata = document.get('metadata')
+        if metadata is not None and not isinstance(metadata, string_types):
+            metadata = json.dumps(metadata)
+        filename = document.get('filename')
+        if filename is None and isinstance(source, string_types):
+            filename = os.path.basename(source)
+        attempts = [0]
+
+        def attempt():
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire()
+            attempts[0] += 1
+            if self.streaming and (isinstance(source, string_types) or
+                                   hasattr(source, 'read')):
+                return self._upload_streaming(source, metadata, filename,
+                                              document.get('file_content_type'))
+            stream = open_document(source)
+            try:
+                response = self.discovery.add_document(
+                    self.environment_id, self.collection_id, file=stream,
+                    metadata=metadata,
+                    file_content_type=document.get('file_content_type'),
+                    filename=filename)
+                return response, stream.tell() if stream is not None else 0
+            finally:
+                if stream is not None and stream is not source:
+                    stream.close()
+
+        try:
+            # add_document is not idempotent: only resend what was not handled
+            response, size = retry_call(attempt, retries=self.retries,
+                                        backoff=self.backoff,
+                                        is_retryable=is_rejected_error)
+        except Exception as error:  # pylint: disable=broad-except
+            return None, 0, attempts[0], error
+        return response, size, attempts[0], None
+
+    def _upload_streaming(self, source, metadata, filename, file_content_type):
+        is_path = isinstance(source, string_types)
+        if not is_path:
+            source.seek(0)
+        response = add_document_streaming(
+            self.discovery, self.environment_id, self.collection_id, file=source,
+            metadata=metadata, file_content_type=file_content_type, filename=filename)
+        if is_path:
+            size = os.path.getsize(source)
+        else:
+            size = source.tell()
+        return response, size
@@ -0,0 +1,195 @@
+# coding: utf-8
+
+# Copyright 2017 IBM All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Read and summarize the ingestion notices of Discovery collections.
+
+`notices` pages through `query_notices` (or `federated_query_notices` for several
+collections) and yields one notice at a time, and `NoticeAggregator` groups them by
+notice ID, severity and step. The aggregator keeps a count, the first and last
+creation dates and a few sample document IDs per group, so its memory does not grow
+with the number of notices.
+"""
+
+from __future__ import absolute_import
+
+import json
+
+from .discovery_query_iterator import PagedResults
+
+
+def notices(discovery,
+            environment_id,
+            collection_ids,
+            page_size=100,
+            max_results=None,
+            prefetch=True,
+            **kwargs):
+    """
+    Iterate over the notices of one or more collections.
+
+    :param DiscoveryV1 discovery: The service client.
+    :param str environment_id: The ID of the environment.
+    :param collection_ids: The ID of a collection, or a list of collection IDs.
+    :param int page_size: The number of results requested per call.
+    :param int max_results: (optional) Stop after this many results (documents or
+           queries with notices).
+    :param bool prefetch: Request the next page while the current one is consumed.
+    :param kwargs: Other arguments of `query_notices`, such as `filter`, for example
+           `notices.severity::"error"`.
+    :return: A generator of `Notice` dicts. Each has a `document_id`, taken from its
+             result when the notice has none.
+    :raises ValueError: More results match than offset paging can reach (see
+            `PagedResults`). Narrow the `filter`, for example to a range of
+            `notices.created` dates.
+    """
+    if environment_id is None:
+        raise ValueError('environment_id must be provided')
+    if not collection_ids:
+        raise ValueError('collection_ids must be provided')
+    if isinstance(collection_ids, (list, tuple)) and len(collection_ids) > 1:
+
+        def fetch_page(offset, count):
+            return discovery.federated_query_notices(environment_id, collection_ids,
+                                                     offset=offset, count=count,
+                                                     **kwargs)
+    else:
+        if isinstance(collection_ids, (list, tuple)):
+            collection_ids = collection_ids[0]
+
+        def fetch_page(offset, count):
+            return discovery.query_notices(environment_id, collection_ids,
+                                           offset=offset, count=count, **kwargs)
+
+    for result in PagedResults(fetch_page, page_size, max_results, prefetch):
+        for notice in result.get('notices') or ():
+            if notice.get('document_id') is None and result.get('id') is not None:
+                notice = dict(notice, document_id=result['id'])
+            yield notice
+
+
+class NoticeAggregator(object):
+    """
+    Counts of notices grouped by `notice_id`, `severity` and `step`.
+
+    :attr int total: The number of notices added.
+    :attr int overflow: The number of notices not grouped because `max_groups` groups
+          already existed. They are still counted in `severities`.
+    """
+
+    def __init__(self, max_samples=5, max_groups=1000):
+        """
+        Initialize a NoticeAggregator object.
+
+        :param int max_samples: The number of distinct document IDs kept per group.
+        :param int max_groups: The maximum number of groups. Notices of further groups
+               are only counted in `overflow`.
+        """
+        self.max_samples = max_samples
+        self.max_groups = max_groups
+        self.total = 0
+        self.overflow = 0
+        self._groups = {}
+        self._severities = {}
+
+    def add(self, notice):
+        """
+        Count a notice.
+
+        :param dict notice: A `Notice` dict.
+        """
+        self.total += 1
+        key = (notice.get('notice_id'), notice.get('severity'), notice.get('step'))
+        self._severities[key[1]] = self._severities.get(key[1], 0) + 1
+        group = self._groups.get(key)
+        if group is None:
+            if self.max_groups is not None and len(self._groups) >= self.max_groups:
+                self.overflow += 1
+                return
+            group = self._groups[key] = {
+                'notice_id': key[0],
+                'severity': key[1],
+                'step': key[2],
+                'description': notice.get('description'),
+                'count': 0,
+                'first_created': None,
+                'last_created': None,
+                'sample_document_ids': []
+            }
+        group['count'] += 1
+        created = notice.get('created')
+        if created is not None:
+            # ISO 8601 timestamps of one format sort as strings
+            if group['first_created'] is None or created < group['first_created']:
+                group['first_created'] = created
+            if group['last_created'] is None or created > group['last_created']:
+                group['last_created'] = created
+        document_id = notice.get('document_id')
+        samples = group['sample_document_ids']
+        if document_id is not None and len(samples) < self.max_samples and \
+                document_id not in samples:
+            samples.append(document_id)
+
+    def update(self, items):
+        """
+        Count every notice of an iterable.
+
+        :return: This aggregator.
+        :rtype: NoticeAggregator
+        """
+        for notice in items:
+            self.add(notice)
+        return self
+
+    def groups(self, severity=None):
+        """
+        The groups, most frequent first.
+
+        :param str severity: (optional) Only the groups of this severity, such as
+               `error` or `warning`.
+        :rtype: list[dict]
+        """
+        groups = [dict(group, sample_document_ids=list(group['sample_document_ids']))
+                  for group in self._groups.values()
+                  if severity is None or group['severity'] == severity]
+        return sorted(groups, key=lambda g: (-g['count'], '%s' % (g['notice_id'],),
+                                             '%s' % (g['step'],)))
+
+    def severities(self):
+        """
+        The number of notices per severity, including the ones counted in `overflow`,
+        so that the counts add up to `total`.
+
+        :rtype: dict
+        """
+        return dict(self._severities)
+
+    def _to_dict(self):
+        return {'total': self.total, 'overflow': self.overflow,
+                'severities': self.severities(), 'groups': self.groups()}
+
+    def __str__(self):
+        return json.dumps(self._to_dict(), indent=2)
+
+
+def summarize_notices(discovery, environment_id, collection_ids, max_samples=5,
+                      **kwargs):
+    """
+    Aggregate all notices of one or more collections. See `notices` for the arguments.
+
+    :rtype: NoticeAggregator
+    """
+    return NoticeAggregator(max_samples=max_samples).update(
+        notices(discovery, environment_id, collection_ids, **kwargs))
@@ -0,0 +1,150 @@
+# coding: utf-8
+
+# Copyright 2017 IBM All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Iterate over every result of a Discovery query.
+
+Pages are requested with `count` and `offset` and the results are yielded one at a time.
+The next page is requested in the background while the current one is consumed, and
+iteration stops once `matching_results` results have been returned. Combine with
+`return_fields` to fetch only the fields you need, and with a `sort` on a unique field
+to keep the order stable across pages.
+
+Offset paging only reaches the first `MAX_QUERY_DEPTH` results of a query. When a query
+matches more, iteration raises `ValueError` after the last reachable result rather than
+stopping short: narrow the query with a filter, for example one date range at a time.
+"""
+
+from __future__ import absolute_import
+
+from .concurrency import BackgroundCall
+
+# The service rejects queries whose offset and count add up to more than this, so
+# offset paging reaches at most this many results of one query
+MAX_QUERY_DEPTH = 10000
+
+
+class PagedResults(object):
+    """
+    The results of an offset-paginated query, fetched page by page.
+
+    :attr int matching_results: The total number of matching results reported by the
+          service, once the first page has been fetched.
+    :attr int pages: The number of pages fetched so far.
+    :attr dict first_page: The first response, without its results, for fields such as
+          `aggregations`.
+    """
+
+    def __init__(self, fetch_page, page_size=100, max_results=None, prefetch=True,
+                 max_depth=MAX_QUERY_DEPTH):
+        """
+        Initialize a PagedResults object.
+
+        :param fetch_page: A callable taking `offset` and `count` and returning a
+               response with `results` and `matching_results`.
+        :param int page_size: The number of results requested per page.
+        :param int max_results: (optional) Stop after this many results.
+        :param bool prefetch: Request the next page while the current one is consumed.
+        :param int max_depth: The number of results offset paging can reach, or `None`
+               for no limit. Iterating past it raises `ValueError`.
+        """
+        if page_size < 1:
+            raise ValueError('page_size must be at least 1')
+        self.fetch_page = fetch_page
+        self.page_size = page_size
+        self.max_results = max_results
+        self.prefetch = prefetch
+        self.max_depth = max_depth
+        self.matching_results = None
+        self.pages = 0
+        self.first_page = None
+
+    def _request(self, offset, remaining):
+        """A callable returning the page, started now when prefetching."""
+        count = self.page_size if remaining is None else min(self.page_size, remaining)
+        if self.max_depth is not None:
+            count = min(count, self.max_depth - offset)
+        if self.prefetch:
+            return BackgroundCall(self.fetch_page, offset, count).result
+        return lambda: self.fetch_page(offset, count)
+
+    def __iter__(self):
+        offset = 0
+        remaining = self.max_results
+        if remaining is not None and remaining <= 0:
+            return
+        pending = self._request(offset, remaining)
+        while pending is not None:
+            page = pending()
+            results = page.get('results') or []
+            self.pages += 1
+            if self.first_page is None:
+                self.first_page = dict((k, v) for k, v in page.items() if k != 'results')
+            if page.get('matching_results') is not None:
+                self.matching_results = page['matching_results']
+            if remaining is not None:
+                results = results[:remaining]
+                remaining -= len(results)
+            offset += len(results)
+            pending = None
+            too_deep = False
+            if results and remaining != 0 and (self.matching_results is None or
+                                               offset < self.matching_results):
+                if self.max_depth is not None and offset >= self.max_depth:
+                    too_deep = True
+                else:
+                    pending = self._request(offset, remaining)
+            for result in results:
+                yield result
+            if too_deep:
+                raise ValueError(
+                    'offset paging reaches only the first %d results, and the query '
+                    'matches %s: narrow it with a filter, for example on a date range' %
+                    (self.max_depth, self.matching_results
+                     if self.matching_results is not None else 'more'))
+
+
+def query_results(discovery,
+                  environment_id,
+                  collection_id,
+                  page_size=100,
+                  max_results=None,
+                  prefetch=True,
+                  **kwargs):
+    """
+    Iterate over all results of `DiscoveryV1.query`.
+
+    :param DiscoveryV1 discovery: The service client.
+    :param str environment_id: The ID of the environment.
+    :param str collection_id: The ID of the collection.
+    :param int page_size: The number of results requested per call.
+    :param int max_results: (optional) Stop after this many results.
+    :param bool prefetch: Request the next page while the current one is consumed.
+    :param kwargs: Other arguments of `DiscoveryV1.query`, such as `filter`, `query`,
+           `return_fields` and `sort`. `count` and `offset` are managed by the iterator.
+    :return: An iterable of `QueryResult` dicts. Iterating past the first
+             `MAX_QUERY_DEPTH` results raises `ValueError`.
+    :rtype: PagedResults
+    """
+    if environment_id is None:
+        raise ValueError('environment_id must be provided')
+    if collection_id is None:
+        raise ValueError('collection_id must be provided')
+
+    def fetch_page(offset, count):
+        return discovery.query(environment_id, collection_id, offset=offset,
+                               count=count, **kwargs)
+
+    return PagedResults(fetch_page, page_size, max_results, prefetch)
@@ -0,0 +1,246 @@
+# coding: utf-8
+
+# Copyright 2017 IBM All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Look up the fields of Discovery collections without a request per lookup.
+
+`SchemaIndex` fetches `list_collection_fields` once per collection and keeps the result
+as a `FieldSchema`, a sorted index of field paths to types that answers exact and
+prefix lookups locally. Entries expire after a time to live, and are dropped as soon
+as the client that owns them updates or deletes the collection or a configuration of
+its environment. Document changes don't drop them, so fields introduced by new
+documents appear once the entry expires.
+"""
+
+from __future__ import absolute_import
+
+import bisect
+import threading
+
+from .cache import LRUCache
+
+_SORT_PREFIXES = '+-'
+
+
+def _split(fields):
+    if fields is None:
+        return []
+    if hasattr(fields, 'split'):
+        fields = fields.split(',')
+    return [field.strip() for field in fields if field and field.strip()]
+
+
+class FieldSchema(object):
+    """
+    The field paths of one or more collections and their types.
+
+    :attr dict types: The type of each field path, such as `string`, `date` or
+          `nested`.
+    """
+
+    def __init__(self, fields):
+        """
+        Initialize a FieldSchema object.
+
+        :param list[dict] fields: `Field` dicts with `field` and `type`, as in the
+               `fields` of a `ListCollectionFieldsResponse`.
+        """
+        self.types = dict((field['field'], field.get('type')) for field in fields
+                          if field.get('field'))
+        self._paths = sorted(self.types)
+
+    @classmethod
+    def merge(cls, schemas):
+        """
+        The union of several schemas. Where the types of a path differ, the type of the
+        first schema is kept.
+
+        :rtype: FieldSchema
+        """
+        types = {}
+        for schema in reversed(list(schemas)):
+            types.update(schema.types)
+        return cls([{'field': path, 'type': kind} for path, kind in types.items()])
+
+    def __len__(self):
+        return len(self._paths)
+
+    def __contains__(self, path):
+        return path in self.types
+
+    def type(self, path):
+        """
+        The type of a field.
+
+        :param str path: The field path, for example `enriched_text.concepts.text`.
+        :return: The type, or `None` for an unknown field.
+        :rtype: str
+        """
+        return self.types.get(path)
+
+    def with_prefix(self, prefix):
+        """
+        The field paths starting with a prefix, in sorted order.
+
+        :param str prefix: The prefix, for example `enriched_text.` or `extracted_`.
+        :rtype: list[str]
+        """
+        start = bisect.bisect_left(self._paths, prefix)
+        end = start
+        while end < len(self._paths) and self._paths[end].startswith(prefix):
+            end += 1
+        return self._paths[start:end]
+
+    def children(self, path):
+        """
+        The direct sub-fields of an object or nested field.
+
+        :param str path: The parent field path.
+        :rtype: list[str]
+        """
+        depth = path.count('.') + 1
+        return [child for child in self.with_prefix(path + '.')
+                if child.count('.') == depth]
+
+    def has_path(self, path):
+        """
+        Whether a path is a field or the parent of fields.
+
+        :rtype: bool
+        """
+        return path in self.types or bool(self.with_prefix(path + '.')[:1])
+
+    def unknown_fields(self, return_fields=None, sort=None):
+        """
+        The paths of a query that do not exist in the schema.
+
+        :param return_fields: (optional) The `return_fields` of a query, as a
+               comma-separated string or a list.
+        :param sort: (optional) The `sort` of a query, with optional `+` or `-`
+               prefixes.
+        :return: The unknown paths, in the order given.
+        :rtype: list[str]
+        """
+        paths = _split(return_fields) + [
+            field.lstrip(_SORT_PREFIXES) for field in _split(sort)]
+        return [path for path in paths if not self.has_path(path)]
+
+    def validate(self, return_fields=None, sort=None):
+        """
+        Raise `ValueError` when a query refers to unknown fields. See
+        `unknown_fields`.
+        """
+        unknown = self.unknown_fields(return_fields, sort)
+        if unknown:
+            raise ValueError('unknown fields: %s' % ', '.join(unknown))
+
+
+class SchemaIndex(object):
+    """
+    Cached `FieldSchema` objects of the collections of one client.
+    """
+
+    def __init__(self, discovery, ttl=300.0, max_size=256):
+        """
+        Initialize a SchemaIndex object.
+
+        :param DiscoveryV1 discovery: The service client. The index listens to its
+               collection and configuration changes, see
+               `DiscoveryV1.add_change_listener`.
+        :param float ttl: The number of seconds a schema is kept, or `None` to keep
+               it until a change invalidates it.
+        :param int max_size: The maximum number of collections kept.
+        """
+        self.discovery = discovery
+        self.cache = LRUCache(max_size, ttl)
+        self.fetches = 0
+        self._lock = threading.Lock()
+        self._fetch_locks = {}
+        self._generation = 0
+        discovery.add_change_listener(self.invalidate, documents=False)
+
+    def schema(self, environment_id, collection_ids):
+        """
+        The schema of a collection, or the union of the schemas of several.
+
+        :param str environment_id: The ID of the environment.
+        :param collection_ids: The ID of a collection, or a list of IDs.
+        :rtype: FieldSchema
+        """
+        if environment_id is None:
+            raise ValueError('environment_id must be provided')
+        if not collection_ids:
+            raise ValueError('collection_ids must be provided')
+        if not isinstance(collection_ids, (list, tuple)):
+            return self._collection_schema(environment_id, collection_ids)
+        return FieldSchema.merge(self._collection_schema(environment_id, collection_id)
+                                 for collection_id in collection_ids)
+
+    def validate(self, environment_id, collection_ids, return_fields=None, sort=None):
+        """
+        Raise `ValueError` when a query refers to fields missing from the collections.
+        See `FieldSchema.unknown_fields`.
+        """
+        self.schema(environment_id, collection_ids).validate(return_fields, sort)
+
+    def invalidate(self, environment_id, collection_id=None):
+        """
+        Drop the schema of a collection, or of every collection of an environment.
+
+        :param str environment_id: The ID of the environment.
+        :param str collection_id: (optional) The ID of the collection.
+        """
+        with self._lock:
+            self._generation += 1
+        self.cache.invalidate_where(
+            lambda key: key[0] == environment_id and
+            (collection_id is None or key[1] == collection_id))
+
+    def close(self):
+        """Stop listening to the changes of the client."""
+        self.discovery.remove_change_listener(self.invalidate)
+
+    def _collection_schema(self, environment_id, collection_id):
+        key = (environment_id, collection_id)
+        schema = self.cache.get(key)
+        if schema is not None:
+            return schema
+        with self._lock:
+            # A fetch that finished since the first lookup has cached its schema and
+            # dropped its lock in one step, so look again before starting another
+            schema = self.cache.get(key)
+            if schema is not None:
+                return schema
+            fetch_lock = self._fetch_locks.setdefault(key, threading.Lock())
+        # One request per collection, however many threads ask at the same time
+        with fetch_lock:
+            schema = self.cache.get(key)
+            if schema is not None:
+                return schema
+            with self._lock:
+                generation = self._generation
+            try:
+                response = self.discovery.list_collection_fields(environment_id,
+                                                                 collection_id)
+                self.fetches += 1
+                schema = FieldSchema(response.get('fields') or ())
+                with self._lock:
+                    # Don't keep a schema fetched before a change that invalidated it
+                    if generation == self._generation:
+                        self.cache.set(key, schema)
+            finally:
+                with self._lock:
+                    self._fetch_locks.pop(key, None)
+        return schema
@@ -0,0 +1,271 @@
+# coding: utf-8
+
+# Copyright 2017 IBM All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Wait for many ingested documents to finish processing.
+
+Instead of polling `get_document_status` for every document in a loop, the tracker
+checks the collection's `document_counts` once per round: while documents are still
+processing, only the documents that are due are polled, each with its own interval that
+grows while it stays in `processing`, and documents drop out as soon as they finish.
+Once the collection reports nothing in processing, the remaining documents are resolved
+with a few `query_notices` and `query` calls instead of one status call each. When the
+collection or the notices cannot be read, the tracker keeps polling the documents
+instead.
+"""
+
+from __future__ import absolute_import
+
+import json
+import time
+
+from .concurrency import retry_call, run_concurrently
+
+_clock = getattr(time, 'monotonic', time.time)
+
+PROCESSING = 'processing'
+FAILED = 'failed'
+AVAILABLE = 'available'
+AVAILABLE_WITH_NOTICES = 'available with notices'
+UNKNOWN = 'unknown'
+
+
+def _quote(value):
+    return '"%s"' % value.replace('\\', '\\\\').replace('"', '\\"')
+
+
+class StatusReport(object):
+    """
+    The final status of tracked documents.
+
+    :attr dict statuses: The status of each document ID. Documents still processing at
+          the timeout are `processing`, and documents the collection has no trace of
+          are `unknown`.
+    :attr dict notices: The notices of each document that has any.
+    :attr dict descriptions: The `status_description` of polled documents.
+    :attr dict calls: The number of `get_document_status`, `get_collection`,
+          `query_notices` and `query` calls made.
+    """
+
+    def __init__(self, document_ids):
+        self.statuses = dict((document_id, PROCESSING) for document_id in document_ids)
+        self.notices = {}
+        self.descriptions = {}
+        self.calls = {'get_document_status': 0, 'get_collection': 0,
+                      'query_notices': 0, 'query': 0}
+
+    def counts(self):
+        """
+        The number of documents per status.
+
+        :rtype: dict
+        """
+        counts = {}
+        for status in self.statuses.values():
+            counts[status] = counts.get(status, 0) + 1
+        return counts
+
+    def failed(self):
+        """
+        The failed documents with their notices.
+
+        :return: `dict` entries with `document_id`, `status_description` and `notices`,
+                 ordered by document ID.
+        :rtype: list[dict]
+        """
+        return [{
+            'document_id': document_id,
+            'status_description': self.descriptions.get(document_id),
+            'notices': self.notices.get(document_id, [])
+        } for document_id in sorted(self.statuses)
+                if self.statuses[document_id] == FAILED]
+
+    def pending(self):
+        """
+        The documents that were still processing when tracking stopped.
+
+        :rtype: list[str]
+        """
+        return sorted(document_id for document_id, status in self.statuses.items()
+                      if status == PROCESSING)
+
+    def _to_dict(self):
+        return {'counts': self.counts(), 'calls': self.calls, 'failed': self.failed(),
+                'pending': self.pending()}
+
+    def __str__(self):
+        return json.dumps(self._to_dict(), indent=2)
+
+
+class DocumentStatusTracker(object):
+    """
+    Track the ingestion status of many documents in one collection.
+    """
+
+    def __init__(self,
+                 discovery,
+                 environment_id,
+                 collection_id,
+                 max_workers=8,
+                 initial_interval=1.0,
+                 max_interval=60.0,
+                 backoff_factor=2.0,
+                 notices_batch_size=50,
+                 retries=3):
+        """
+        Initialize a DocumentStatusTracker object.
+
+        :param DiscoveryV1 discovery: The service client.
+        :param str environment_id: The ID of the environment.
+        :param str collection_id: The ID of the collection.
+        :param int max_workers: The number of concurrent status calls.
+        :param float initial_interval: The first delay before polling a document again,
+               in seconds.
+        :param float max_interval: The longest delay between two polls of a document.
+        :param float backoff_factor: The factor applied to a document's interval each
+               time it is still processing.
+        :param int notices_batch_size: The number of documents looked up per
+               `query_notices` call.
+        :param int retries: The number of retries for rate-limited or failed calls.
+        """
+        if environment_id is None:
+            raise ValueError('environment_id must be provided')
+        if collection_id is None:
+            raise ValueError('collection_id must be provided')
+        self.discovery = discovery
+        self.environment_id = environment_id
+        self.collection_id = collection_id
+        self.max_workers = max_workers
+        self.initial_interval = initial_interval
+        self.max_interval = max_interval
+        self.backoff_factor = backoff_factor
+        self.notices_batch_size = notices_batch_size
+        self.retries = retries
+
+    def track(self, document_ids, timeout=None):
+        """
+        Wait until the documents finish processing, or until `timeout`.
+
+        :param list[str] document_ids: The IDs of the documents, for example from the
+               `add_document` responses.
+        :param float timeout: (optional) The longest time to wait, in seconds.
+        :rtype: StatusReport
+        """
+        report = StatusReport(document_ids)
+        deadline = _clock() + timeout if timeout is not None else None
+        # document ID -> (next poll time, current interval). Freshly added documents
+        # are processing, so the first poll waits one interval.
+        first_poll = _clock() + self.initial_interval
+        schedule = dict((document_id, (first_poll, self.initial_interval))
+                        for document_id in report.statuses)
+
+        use_notices = True
+        while schedule:
+            if use_notices and self._processing_count(report) == 0:
+                try:
+                    self._resolve_with_notices(report, schedule)
+                except Exception:  # pylint: disable=broad-except
+                    # Poll the documents left instead
+                    use_notices = False
+                if not schedule:
+                    break
+            now = _clock()
+            due = [document_id for document_id, (when, _) in schedule.items()
+                   if when <= now]
+            for result in run_concurrently(self._status, due, self.max_workers):
+                report.calls['get_document_status'] += 1
+                document_id = result.item
+                if not result.ok:
+                    # Try again later, as if the document were still processing.
+                    status = {'status': PROCESSING}
+                else:
+                    status = result.value
+                if status.get('status') == PROCESSING:
+                    interval = min(self.max_interval,
+                                   schedule[document_id][1] * self.backoff_factor)
+                    schedule[document_id] = (_clock() + interval, interval)
+                    continue
+                del schedule[document_id]
+                report.statuses[document_id] = status.get('status') or UNKNOWN
+                report.descriptions[document_id] = status.get('status_description')
+                if status.get('notices'):
+                    report.notices[document_id] = status['notices']
+            if not schedule:
+                break
+            wake = min(when for when, _ in schedule.values())
+            if deadline is not None:
+                if _clock() >= deadline:
+                    break
+                wake = min(wake, deadline)
+            time.sleep(max(0.0, wake - _clock()))
+        return report
+
+    def _call(self, method, *args, **kwargs):
+        return retry_call(lambda: method(self.environment_id, self.collection_id,
+                                         *args, **kwargs),
+                          retries=self.retries)
+
+    def _status(self, document_id):
+        return self._call(self.discovery.get_document_status, document_id)
+
+    def _processing_count(self, report):
+        """The number of documents processing, or `None` when it is unknown."""
+        report.calls['get_collection'] += 1
+        try:
+            collection = self._call(self.discovery.get_collection)
+        except Exception:  # pylint: disable=broad-except
+            # Keep polling the documents, as if the collection were busy
+            return None
+        counts = collection.get('document_counts') or {}
+        return counts.get('processing', 0)
+
+    def _resolve_with_notices(self, report, schedule):
+        """
+        Set the final status of the scheduled documents from their notices, removing
+        them from the schedule one batch at a time.
+
+        Documents without notices are `available` when a query finds them, and
+        `unknown` otherwise.
+        """
+        document_ids = sorted(schedule)
+        for start in range(0, len(document_ids), self.notices_batch_size):
+            batch = document_ids[start:start + self.notices_batch_size]
+            report.calls['query_notices'] += 1
+            id_filter = '|'.join('id::' + _quote(d) for d in batch)
+            response = self._call(self.discovery.query_notices, filter=id_filter,
+                                  count=len(batch))
+            found = {}
+            for result in response.get('results') or ():
+                found.setdefault(result.get('id'), []).extend(
+                    result.get('notices') or ())
+            indexed = set()
+            if any(not found.get(document_id) for document_id in batch):
+                report.calls['query'] += 1
+                response = self._call(self.discovery.query, filter=id_filter,
+                                      return_fields='id', count=len(batch))
+                indexed = set(result.get('id')
+                              for result in response.get('results') or ())
+            for document_id in batch:
+                del schedule[document_id]
+                notices = found.get(document_id)
+                if not notices:
+                    report.statuses[document_id] = \
+                        AVAILABLE if document_id in indexed else UNKNOWN
+                    continue
+                report.notices[document_id] = notices
+                if any(n.get('severity') == 'error' for n in notices):
+                    report.statuses[document_id] = FAILED
+                else:
+                    report.statuses[document_id] = AVAILABLE_WITH_NOTICES
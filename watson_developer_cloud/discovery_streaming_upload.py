@@ -0,0 +1,325 @@
+# coding: utf-8
+
+# Copyright 2017 IBM All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Upload documents to Discovery without loading them into memory.
+
+Passing a file to `add_document` or `update_document` lets `requests` encode the
+multipart body in memory, which holds the whole document at least once, and more for
+large files. `MultipartStream` produces the same body lazily: file parts are read in
+chunks, from a memory map for paths and from the handle otherwise, while the body is
+sent. Its length is known up front, so the upload is still sent with a
+`Content-Length` header.
+"""
+
+from __future__ import absolute_import
+
+import binascii
+import mmap
+import os
+
+try:
+    from urllib.parse import quote  # Python 3
+except ImportError:
+    from urllib import quote  # Python 2
+
+from .files import string_types
+
+DEFAULT_CHUNK_SIZE = 1 << 16
+
+
+def _header_value(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"')
+
+
+def _disposition(name, filename):
+    disposition = 'form-data; name="%s"' % _header_value(name)
+    if filename is not None:
+        try:
+            filename.encode('ascii')
+            disposition += '; filename="%s"' % _header_value(filename)
+        except UnicodeError:
+            disposition += "; filename*=utf-8''%s" % quote(filename.encode('utf-8'))
+    return disposition
+
+
+class _BytesPart(object):
+
+    def __init__(self, data):
+        self.data = data
+        self.length = len(data)
+
+    def read(self, offset, size):
+        return self.data[offset:offset + size]
+
+    def close(self):
+        pass
+
+
+class _MmapPart(object):
+
+    def __init__(self, path):
+        self._file = open(path, 'rb')
+        self.length = os.fstat(self._file.fileno()).st_size
+        # Zero-length files cannot be mapped
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) \
+            if self.length else None
+
+    def read(self, offset, size):
+        return self._map[offset:offset + size] if self._map is not None else b''
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+        self._file.close()
+
+
+class _FilePart(object):
+
+    def __init__(self, handle):
+        self._handle = handle
+        self._start = handle.tell()
+        handle.seek(0, os.SEEK_END)
+        self.length = handle.tell() - self._start
+        handle.seek(self._start)
+
+    def read(self, offset, size):
+        self._handle.seek(self._start + offset)
+        return self._handle.read(size)
+
+    def close(self):
+        pass
+
+
+class MultipartStream(object):
+    """
+    A `multipart/form-data` body that is produced while it is sent.
+
+    Pass it as the `data` of a request together with the `content_type` header. File
+    parts opened from a path are closed by `close`; file handles given by the caller
+    are left open.
+
+    :attr str boundary: The multipart boundary.
+    """
+
+    def __init__(self, boundary=None, chunk_size=DEFAULT_CHUNK_SIZE):
+        """
+        Initialize a MultipartStream object.
+
+        :param str boundary: (optional) The multipart boundary. A random one is used
+               by default.
+        :param int chunk_size: The size of the blocks produced when iterating.
+        """
+        self.boundary = boundary or binascii.hexlify(os.urandom(16)).decode('ascii')
+        self.chunk_size = chunk_size
+        self._parts = []
+        self._closing = False
+        self._index = 0
+        self._offset = 0
+
+    @property
+    def content_type(self):
+        """The `Content-Type` header value of the body."""
+        return 'multipart/form-data; boundary=%s' % self.boundary
+
+    def _add(self, name, filename, content_type, body):
+        if self._closing:
+            raise ValueError('parts cannot be added after reading started')
+        header = '--%s\r\nContent-Disposition: %s\r\n' % (
+            self.boundary, _disposition(name, filename))
+        if content_type:
+            header += 'Content-Type: %s\r\n' % content_type
+        self._parts.append(_BytesPart((header + '\r\n').encode('utf-8')))
+        self._parts.append(body)
+        self._parts.append(_BytesPart(b'\r\n'))
+
+    def add_field(self, name, value, content_type='text/plain'):
+        """
+        Add a text part.
+
+        :param str name: The part name.
+        :param value: The part content, as `str` or `bytes`.
+        :param str content_type: The part content type.
+        """
+        if not isinstance(value, bytes):
+            value = value.encode('utf-8')
+        self._add(name, None, content_type, _BytesPart(value))
+
+    def add_file(self, name, source, filename=None,
+                 content_type='application/octet-stream'):
+        """
+        Add a file part.
+
+        :param str name: The part name.
+        :param source: A file path, which is memory-mapped, or a seekable binary file
+               handle, read from its current position.
+        :param str filename: The file name sent with the part. Defaults to the base name
+               of the path or handle.
+        :param str content_type: The part content type.
+        """
+        if hasattr(source, 'read'):
+            part = _FilePart(source)
+            path = getattr(source, 'name', None)
+        else:
+            part = _MmapPart(source)
+            path = source
+        if filename is None and isinstance(path, string_types):
+            filename = os.path.basename(path)
+        if not filename:
+            part.close()
+            raise ValueError('filename must be provided')
+        self._add(name, filename, content_type, part)
+
+    def _start_reading(self):
+        if not self._closing:
+            self._parts.append(_BytesPart(('--%s--\r\n' % self.boundary).encode('ascii')))
+            self._closing = True
+
+    def __len__(self):
+        self._start_reading()
+        return sum(part.length for part in self._parts)
+
+    def read(self, size=-1):
+        """
+        Read the next block of the body.
+
+        :param int size: The largest number of bytes to return. A block never spans two
+               parts. By default the rest of the body is returned, as with files.
+        :rtype: bytes
+        """
+        self._start_reading()
+        if size is None or size < 0:
+            return b''.join(iter(lambda: self.read(self.chunk_size), b''))
+        while self._index < len(self._parts):
+            part = self._parts[self._index]
+            if self._offset < part.length:
+                block = part.read(self._offset, size)
+                self._offset += len(block)
+                return block
+            self._index += 1
+            self._offset = 0
+        return b''
+
+    def __iter__(self):
+        while True:
+            block = self.read(self.chunk_size)
+            if not block:
+                return
+            yield block
+
+    def rewind(self):
+        """Start reading the body from the beginning again, for example to retry."""
+        self._start_reading()
+        self._index = 0
+        self._offset = 0
+
+    def close(self):
+        """Release the memory maps and files opened from paths."""
+        for part in self._parts:
+            part.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def _document_body(file, metadata, file_content_type, filename, chunk_size):
+    body = MultipartStream(chunk_size=chunk_size)
+    try:
+        if file is not None:
+            body.add_file('file', file, filename=filename,
+                          content_type=file_content_type or 'application/octet-stream')
+        if metadata is not None:
+            body.add_field('metadata', metadata)
+    except Exception:
+        body.close()
+        raise
+    return body
+
+
+def add_document_streaming(discovery,
+                           environment_id,
+                           collection_id,
+                           file=None,
+                           metadata=None,
+                           file_content_type=None,
+                           filename=None,
+                           chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    `DiscoveryV1.add_document` with the document streamed from disk.
+
+    :param DiscoveryV1 discovery: The service client.
+    :param str environment_id: The ID of the environment.
+    :param str collection_id: The ID of the collection.
+    :param file: The path of the document, or a seekable binary file handle.
+    :param str metadata: (optional) The document metadata, as a JSON string.
+    :param str file_content_type: (optional) The content type of the file.
+    :param str filename: (optional) The file name. Defaults to the base name of the path.
+    :param int chunk_size: The size of the blocks read from the file.
+    :return: A `dict` containing the `DocumentAccepted` response.
+    :rtype: dict
+    """
+    if environment_id is None:
+        raise ValueError('environment_id must be provided')
+    if collection_id is None:
+        raise ValueError('collection_id must be provided')
+    url = '/v1/environments/{0}/collections/{1}/documents'.format(
+        *discovery._encode_path_vars(environment_id, collection_id))
+    with _document_body(file, metadata, file_content_type, filename,
+                        chunk_size) as body:
+        response = discovery.request(
+            method='POST', url=url, params={'version': discovery.version},
+            headers={'content-type': body.content_type}, data=body,
+            accept_json=True)
+    discovery._collection_changed(environment_id, collection_id, documents=True)
+    return response
+
+
+def update_document_streaming(discovery,
+                              environment_id,
+                              collection_id,
+                              document_id,
+                              file=None,
+                              metadata=None,
+                              file_content_type=None,
+                              filename=None,
+                              chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    `DiscoveryV1.update_document` with the document streamed from disk.
+
+    See `add_document_streaming` for the arguments.
+
+    :param str document_id: The ID of the document.
+    :return: A `dict` containing the `DocumentAccepted` response.
+    :rtype: dict
+    """
+    if environment_id is None:
+        raise ValueError('environment_id must be provided')
+    if collection_id is None:
+        raise ValueError('collection_id must be provided')
+    if document_id is None:
+        raise ValueError('document_id must be provided')
+    url = '/v1/environments/{0}/collections/{1}/documents/{2}'.format(
+        *discovery._encode_path_vars(environment_id, collection_id, document_id))
+    with _document_body(file, metadata, file_content_type, filename,
+                        chunk_size) as body:
+        response = discovery.request(
+            method='POST', url=url, params={'version': discovery.version},
+            headers={'content-type': body.content_type}, data=body,
+            accept_json=True)
+    discovery._collection_changed(environment_id, collection_id, documents=True)
+    return response
@@ -0,0 +1,367 @@
+# coding: utf-8
+
+# Copyright 2017 IBM All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Keep a Discovery collection in sync with a set of local documents.
+
+A local SQLite index remembers, for every document key (such as a file path), the
+`document_id` it was uploaded as and the SHA-256 hashes of its content and metadata.
+Each sync hashes the documents and only moves the difference: new documents are added,
+documents whose content or metadata changed are sent to `update_document`, unchanged
+ones are skipped without any call, and, optionally, documents that disappeared are
+removed with `delete_document`.
+"""
+
+from __future__ import absolute_import
+
+import hashlib
+import json
+import os
+
+from .checkpoint import SqliteRecords
+from .concurrency import RateLimiter, is_rejected_error, is_transient_error, \
+    retry_call, run_concurrently
+from .discovery_ingestion import walk_documents
+from .discovery_streaming_upload import add_document_streaming, \
+    update_document_streaming
+from .files import open_document, string_types
+from .watson_service import WatsonApiException
+
+ADDED = 'added'
+UPDATED = 'updated'
+UNCHANGED = 'unchanged'
+DELETED = 'deleted'
+FAILED = 'failed'
+
+_HASH_CHUNK_SIZE = 1 << 16
+
+
+def content_hash(source):
+    """
+    The SHA-256 hex digest of a document, read in chunks.
+
+    :param source: A file path, `bytes` or a seekable binary file handle.
+    :rtype: str
+    """
+    digest = hashlib.sha256()
+    stream = open_document(source)
+    try:
+        for block in iter(lambda: stream.read(_HASH_CHUNK_SIZE), b''):
+            digest.update(block)
+    finally:
+        if stream is not source:
+            stream.close()
+    return digest.hexdigest()
+
+
+def metadata_hash(metadata):
+    """
+    The SHA-256 hex digest of document metadata, independent of key order.
+
+    :param metadata: A `dict`, a JSON string or `None`.
+    :rtype: str
+    """
+    if metadata is None:
+        return None
+    if isinstance(metadata, string_types):
+        metadata = json.loads(metadata)
+    encoded = json.dumps(metadata, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+
+
+class ContentIndex(SqliteRecords):
+    """
+    The document ID and hashes of every synced document, kept in a SQLite database.
+
+    The object can be shared between threads. `get` returns a `dict` with `document_id`,
+    `content_hash`, `metadata_hash` and `updated`.
+
+    :attr str path: The location of the database file.
+    """
+
+    columns = ('document_id', 'content_hash', 'metadata_hash')
+
+    def __init__(self, path, table='documents'):
+        """
+        Initialize a ContentIndex object.
+
+        :param str path: The location of the database file. It is created if needed.
+        :param str table: The name of the table holding the index.
+        """
+        super(ContentIndex, self).__init__(path, table)
+
+    def record(self, key, document_id, content_digest, metadata_digest=None):
+        """
+        Create or replace the index entry of a document.
+
+        :param str key: The document key, for example a file path.
+        :param str document_id: The ID of the document in the collection.
+        :param str content_digest: The `content_hash` of the uploaded content.
+        :param str metadata_digest: (optional) The `metadata_hash` of the uploaded
+               metadata.
+        """
+        self._write(key, (document_id, content_digest, metadata_digest))
+
+    def items(self):
+        """
+        All index entries.
+
+        :return: `(key, document_id)` tuples, ordered by key.
+        :rtype: list[tuple]
+        """
+        return self._select(('document_id',))
+
+
+class SyncReport(object):
+    """
+    The outcome of a sync.
+
+    :attr dict counts: The number of documents `added`, `updated`, `unchanged`,
+          `deleted` and `failed`.
+    :attr int calls: The number of `add_document`, `update_document` and
+          `delete_document` calls, including retries.
+    :attr list failures: `(key, error)` pairs for the failed documents.
+    """
+
+    def __init__(self):
+        self.counts = dict((action, 0) for action in (ADDED, UPDATED, UNCHANGED,
+                                                      DELETED, FAILED))
+        self.calls = 0
+        self.failures = []
+
+    def _to_dict(self):
+        return {
+            'counts': self.counts,
+            'calls': self.calls,
+            'failures': [{'key': key, 'error': error} for key, error in self.failures]
+        }
+
+    def __str__(self):
+        return json.dumps(self._to_dict(), indent=2)
+
+
+class DocumentSync(object):
+    """
+    Incrementally sync local documents to a collection.
+    """
+
+    def __init__(self,
+                 discovery,
+                 environment_id,
+                 collection_id,
+                 index_path,
+                 max_workers=8,
+                 rate=None,
+                 retries=3,
+                 backoff=1.0,
+                 streaming=False):
+        """
+        Initialize a DocumentSync object.
+
+        :param DiscoveryV1 discovery: The service client.
+        :param str environment_id: The ID of the environment.
+        :param str collection_id: The ID of the collection.
+        :param str index_path: The SQLite file of the `ContentIndex`.
+        :param int max_workers: The number of documents hashed and sent concurrently.
+        :param float rate: (optional) The maximum number of calls started per second.
+        :param int retries: The number of retries for rate-limited or failed calls.
+               New documents are only sent again when the service rejected them,
+               since a failed `add_document` may still have added the document.
+        :param float backoff: The delay before the first retry, in seconds.
+        :param bool streaming: Send files from paths and file handles without reading
+               them into memory. See `add_document_streaming`.
+        """
+        if environment_id is None:
+            raise ValueError('environment_id must be provided')
+        if collection_id is None:
+            raise ValueError('collection_id must be provided')
+        self.discovery = discovery
+        self.environment_id = environment_id
+        self.collection_id = collection_id
+        self.index = ContentIndex(index_path)
+        self.max_workers = max_workers
+        self.rate_limiter = RateLimiter(rate) if rate else None
+        self.retries = retries
+        self.backoff = backoff
+        self.streaming = streaming
+
+    def sync(self, documents, delete_missing=False, on_result=None):
+        """
+        Sync documents to the collection.
+
+        :param documents: An iterable of file paths, or of `dict` with `key`, `file` (a
+               path, a file-like object or, on Python 3, `bytes`) and optionally
+               `filename`, `metadata` (a `dict` or JSON string) and
+               `file_content_type`, as for `DocumentIngester.ingest`.
+        :param bool delete_missing: Delete the indexed documents that are not in
+               `documents` from the collection. Only done when every document was
+               read; documents whose sync failed are never deleted.
+        :param on_result: (optional) A callable invoked with `(key, action, error)`
+               after each document.
+        :rtype: SyncReport
+        """
+        report = SyncReport()
+        seen = set()
+
+        def pending():
+            for document in documents:
+                if not isinstance(document, dict):
+                    document = {'key': document, 'file': document}
+                elif 'key' not in document:
+                    raise ValueError('key must be provided for each document')
+                seen.add(document['key'])
+                yield document
+
+        for result in run_concurrently(self._sync_document, pending(),
+                                       self.max_workers, ordered=False):
+            key = result.item['key']
+            if result.ok:
+                action, calls, error = result.value
+            else:
+                action, calls, error = FAILED, 0, result.error
+            self._report(report, key, action, calls, error, on_result)
+
+        if delete_missing:
+            missing = [(key, document_id) for key, document_id in self.index.items()
+                       if key not in seen]
+            for result in run_concurrently(self._delete_document, missing,
+                                           self.max_workers, ordered=False):
+                key = result.item[0]
+                if result.ok:
+                    action, calls, error = result.value
+                else:
+                    action, calls, error = FAILED, 0, result.error
+                self._report(report, key, action, calls, error, on_result)
+        return report
+
+    def sync_directory(self, root, extensions=None, delete_missing=False,
+                       on_result=None):
+        """
+        Sync every file below a directory. See `walk_documents` and `sync`.
+
+        :rtype: SyncReport
+        """
+        return self.sync(walk_documents(root, extensions),
+                         delete_missing=delete_missing, on_result=on_result)
+
+    def close(self):
+        """Close the index."""
+        self.index.close()
+
+    def _report(self, report, key, action, calls, error, on_result):
+        report.calls += calls
+        if error is not None:
+            action = FAILED
+            error = getattr(error, 'message', None) or str(error)
+            report.failures.append((key, error))
+        report.counts[action] += 1
+        if on_result is not None:
+            on_result(key, action, error)
+
+    def _call(self, method, calls, *args, **kwargs):
+        is_retryable = kwargs.pop('is_retryable', is_transient_error)
+
+        def attempt():
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire()
+            calls[0] += 1
+            return method(*args, **kwargs)
+
+        return retry_call(attempt, retries=self.retries, backoff=self.backoff,
+                          is_retryable=is_retryable)
+
+    def _sync_document(self, document):
+        key = document['key']
+        source = document.get('file')
+        metadata = document.get('metadata')
+        if metadata is not None and not isinstance(metadata, string_types):
+            metadata = json.dumps(metadata)
+        hashes = (content_hash(source) if source is not None else None,
+                  metadata_hash(metadata))
+        entry = self.index.get(key)
+        if entry is not None and (entry['content_hash'],
+                                  entry['metadata_hash']) == hashes:
+            return UNCHANGED, 0, None
+
+        calls = [0]
+        upload = dict(file=source, metadata=metadata,
+                      file_content_type=document.get('file_content_type'),
+                      filename=document.get('filename'))
+        action = ADDED
+        try:
+            if entry is not None:
+                action = UPDATED
+                try:
+                    response = self._call(self._send, calls, entry['document_id'],
+                                          upload)
+                except WatsonApiException as error:
+                    # The document was removed from the collection: add it again
+                    if error.code != 404:
+                        raise
+                    action = ADDED
+                    response = self._add(calls, upload)
+            else:
+                response = self._add(calls, upload)
+        except Exception as error:  # pylint: disable=broad-except
+            return FAILED, calls[0], error
+        self.index.record(key, response.get('document_id') or
+                          (entry or {}).get('document_id'), *hashes)
+        return action, calls[0], None
+
+    def _add(self, calls, upload):
+        # add_document is not idempotent: only resend what the service did not handle
+        return self._call(self._send, calls, None, upload,
+                          is_retryable=is_rejected_error)
+
+    def _send(self, document_id, upload):
+        upload = dict(upload)
+        source = upload['file']
+        if self.streaming and (isinstance(source, string_types) or
+                               hasattr(source, 'read')):
+            if hasattr(source, 'seek'):
+                source.seek(0)
+            if document_id is None:
+                return add_document_streaming(self.discovery, self.environment_id,
+                                              self.collection_id, **upload)
+            return update_document_streaming(self.discovery, self.environment_id,
+                                             self.collection_id, document_id, **upload)
+
+        stream = open_document(source)
+        upload['file'] = stream
+        if upload['filename'] is None and isinstance(source, string_types):
+            upload['filename'] = os.path.basename(source)
+        try:
+            if document_id is None:
+                return self.discovery.add_document(
+                    self.environment_id, self.collection_id, **upload)
+            return self.discovery.update_document(
+                self.environment_id, self.collection_id, document_id, **upload)
+        finally:
+            if stream is not None and stream is not source:
+                stream.close()
+
+    def _delete_document(self, item):
+        key, document_id = item
+        calls = [0]
+        try:
+            self._call(self.discovery.delete_document, calls, self.environment_id,
+                       self.collection_id, document_id)
+        except WatsonApiException as error:
+            if error.code != 404:
+                return FAILED, calls[0], error
+        except Exception as error:  # pylint: disable=broad-except
+            return FAILED, calls[0], error
+        self.index.delete(key)
+        return DELETED, calls[0], None
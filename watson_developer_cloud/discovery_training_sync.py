@@ -0,0 +1,326 @@
+# coding: utf-8
+
+# Copyright 2017 IBM All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Make the relevance training data of a Discovery collection match a local training set.
+
+The current training data is read with `list_training_data`, and the examples of the
+queries that also exist locally are fetched with `list_training_examples`
+concurrently. The two sets are compared, queries by natural language query and filter
+and examples by document ID, and only the differences are applied, in parallel: new
+queries are added with all their examples in one `add_training_data` call, and
+examples are created, updated or deleted one by one. Re-syncing an unchanged set
+makes no changes at all.
+"""
+
+from __future__ import absolute_import
+
+import io
+import json
+
+from .concurrency import RateLimiter, retry_call, run_concurrently
+from .files import csv_rows
+
+ADD_QUERY = 'add_query'
+DELETE_QUERY = 'delete_query'
+CREATE_EXAMPLE = 'create_example'
+UPDATE_EXAMPLE = 'update_example'
+DELETE_EXAMPLE = 'delete_example'
+
+_ACTIONS = (ADD_QUERY, DELETE_QUERY, CREATE_EXAMPLE, UPDATE_EXAMPLE, DELETE_EXAMPLE)
+
+
+def read_training_csv(path):
+    """
+    Read a training set from CSV rows of a query followed by document ID and
+    relevance pairs: `query,document_id,relevance,document_id,relevance,...`.
+
+    :param str path: The CSV file.
+    :return: `TrainingQuery` dicts, without IDs.
+    :rtype: list[dict]
+    """
+    queries = []
+    for row in csv_rows(path):
+        if not row or not row[0].strip():
+            continue
+        examples = []
+        for start in range(1, len(row) - 1, 2):
+            if row[start].strip():
+                examples.append({'document_id': row[start].strip(),
+                                 'relevance': int(row[start + 1])})
+        queries.append({'natural_language_query': row[0].strip(),
+                        'examples': examples})
+    return queries
+
+
+def read_training_json(path):
+    """
+    Read a training set from a JSON file holding a `TrainingDataSet`, such as the
+    output of `list_training_data`, or a list of `TrainingQuery` dicts.
+
+    :param str path: The JSON file.
+    :rtype: list[dict]
+    """
+    with io.open(path, 'r', encoding='utf-8') as json_file:
+        data = json.load(json_file)
+    if isinstance(data, dict):
+        data = data.get('queries') or []
+    return data
+
+
+def _query_key(query):
+    return (query.get('natural_language_query') or '', query.get('filter') or '')
+
+
+def _example_value(example):
+    return (example.get('relevance'), example.get('cross_reference') or None)
+
+
+def _merge_local(queries):
+    """Local queries by key, with the examples of duplicate queries merged."""
+    merged = {}
+    for query in queries:
+        key = _query_key(query)
+        examples = merged.setdefault(key, {})
+        for example in query.get('examples') or ():
+            examples[example['document_id']] = example
+    return merged
+
+
+class TrainingSyncReport(object):
+    """
+    The outcome of a training data sync.
+
+    :attr dict counts: The number of changes applied per action: `add_query`,
+          `delete_query`, `create_example`, `update_example` and `delete_example`.
+    :attr int unchanged: The number of local examples already up to date.
+    :attr int calls: The number of calls made, including reads and retries.
+    :attr list failures: `(operation, error)` pairs for the changes that failed.
+    """
+
+    def __init__(self):
+        self.counts = dict((action, 0) for action in _ACTIONS)
+        self.unchanged = 0
+        self.calls = 0
+        self.failures = []
+
+    def _to_dict(self):
+        return {
+            'counts': self.counts,
+            'unchanged': self.unchanged,
+            'calls': self.calls,
+            'failures': [{'operation': operation, 'error': error}
+                         for operation, error in self.failures]
+        }
+
+    def __str__(self):
+        return json.dumps(self._to_dict(), indent=2)
+
+
+class TrainingDataSync(object):
+    """
+    Sync a local training set to a collection.
+    """
+
+    def __init__(self,
+                 discovery,
+                 environment_id,
+                 collection_id,
+                 max_workers=8,
+                 rate=None,
+                 retries=3,
+                 backoff=1.0):
+        """
+        Initialize a TrainingDataSync object.
+
+        :param DiscoveryV1 discovery: The service client.
+        :param str environment_id: The ID of the environment.
+        :param str collection_id: The ID of the collection.
+        :param int max_workers: The number of concurrent calls.
+        :param float rate: (optional) The maximum number of calls started per second.
+        :param int retries: The number of retries for rate-limited or failed calls.
+        :param float backoff: The delay before the first retry, in seconds.
+        """
+        if environment_id is None:
+            raise ValueError('environment_id must be provided')
+        if collection_id is None:
+            raise ValueError('collection_id must be provided')
+        self.discovery = discovery
+        self.environment_id = environment_id
+        self.collection_id = collection_id
+        self.max_workers = max_workers
+        self.rate_limiter = RateLimiter(rate) if rate else None
+        self.retries = retries
+        self.backoff = backoff
+
+    def plan(self, queries, prune=False, report=None):
+        """
+        The changes that would make the collection's training data match `queries`.
+
+        :param list[dict] queries: The local training set, as `TrainingQuery` dicts
+               with `natural_language_query`, optionally `filter`, and `examples`
+               with `document_id`, `relevance` and optionally `cross_reference`.
+        :param bool prune: Also delete the remote queries and examples that are not in
+               `queries`.
+        :param TrainingSyncReport report: (optional) The report counting the calls.
+        :return: Operation dicts with an `action` and its arguments.
+        :rtype: list[dict]
+        """
+        report = report or TrainingSyncReport()
+        local = _merge_local(queries)
+        calls = [0]
+        try:
+            response = self._call(self.discovery.list_training_data, calls)
+        finally:
+            report.calls += calls[0]
+        remote = {}
+        for query in response.get('queries') or ():
+            remote.setdefault(_query_key(query), query)
+
+        operations = []
+        shared = []
+        for key, examples in sorted(local.items()):
+            query = remote.get(key)
+            if query is None:
+                operations.append({
+                    'action': ADD_QUERY,
+                    'natural_language_query': key[0] or None,
+                    'filter': key[1] or None,
+                    'examples': [examples[d] for d in sorted(examples)]
+                })
+            else:
+                shared.append((query, examples))
+        if prune:
+            for key, query in sorted(remote.items()):
+                if key not in local:
+                    operations.append({'action': DELETE_QUERY,
+                                       'query_id': query['query_id']})
+
+        for result in run_concurrently(self._remote_examples, shared, self.max_workers):
+            if not result.ok:
+                raise result.error
+            remote_examples, calls = result.value
+            report.calls += calls
+            query, examples = result.item
+            current = dict((e['document_id'], e) for e in remote_examples)
+            for document_id in sorted(examples):
+                example = examples[document_id]
+                existing = current.get(document_id)
+                operation = {'query_id': query['query_id'], 'document_id': document_id,
+                             'relevance': example.get('relevance'),
+                             'cross_reference': example.get('cross_reference')}
+                if existing is None:
+                    operation['action'] = CREATE_EXAMPLE
+                elif _example_value(existing) != _example_value(example):
+                    operation['action'] = UPDATE_EXAMPLE
+                else:
+                    report.unchanged += 1
+                    continue
+                operations.append(operation)
+            if prune:
+                for document_id in sorted(set(current) - set(examples)):
+                    operations.append({'action': DELETE_EXAMPLE,
+                                       'query_id': query['query_id'],
+                                       'document_id': document_id})
+        return operations
+
+    def sync(self, queries, prune=False, dry_run=False, on_result=None):
+        """
+        Apply the changes planned by `plan`.
+
+        :param list[dict] queries: The local training set. See `plan`.
+        :param bool prune: Also delete remote queries and examples missing locally.
+        :param bool dry_run: Only plan the changes. The report counts the changes
+               that would be applied.
+        :param on_result: (optional) A callable invoked with `(operation, error)` after
+               each change.
+        :rtype: TrainingSyncReport
+        """
+        report = TrainingSyncReport()
+        operations = self.plan(queries, prune=prune, report=report)
+        if dry_run:
+            for operation in operations:
+                report.counts[operation['action']] += 1
+            return report
+        for result in run_concurrently(self._apply, operations, self.max_workers,
+                                       ordered=False):
+            calls, error = result.value if result.ok else (0, result.error)
+            report.calls += calls
+            if error is None:
+                report.counts[result.item['action']] += 1
+            else:
+                error = getattr(error, 'message', None) or str(error)
+                report.failures.append((result.item, error))
+            if on_result is not None:
+                on_result(result.item, error)
+        return report
+
+    def sync_file(self, path, **kwargs):
+        """
+        Sync a training set read from a `.csv` or `.json` file. See `sync`.
+
+        :rtype: TrainingSyncReport
+        """
+        if path.lower().endswith('.csv'):
+            return self.sync(read_training_csv(path), **kwargs)
+        return self.sync(read_training_json(path), **kwargs)
+
+    def _call(self, method, calls, *args, **kwargs):
+
+        def attempt():
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire()
+            calls[0] += 1
+            return method(self.environment_id, self.collection_id, *args, **kwargs)
+
+        return retry_call(attempt, retries=self.retries, backoff=self.backoff)
+
+    def _remote_examples(self, item):
+        query = item[0]
+        if 'examples' in query:
+            # The training data listing already included the examples
+            return query['examples'] or [], 0
+        calls = [0]
+        response = self._call(self.discovery.list_training_examples, calls,
+                              query['query_id'])
+        return response.get('examples') or [], calls[0]
+
+    def _apply(self, operation):
+        calls = [0]
+        action = operation['action']
+        try:
+            if action == ADD_QUERY:
+                self._call(self.discovery.add_training_data, calls,
+                           natural_language_query=operation['natural_language_query'],
+                           filter=operation['filter'], examples=operation['examples'])
+            elif action == DELETE_QUERY:
+                self._call(self.discovery.delete_training_data, calls,
+                           operation['query_id'])
+            elif action == CREATE_EXAMPLE:
+                self._call(self.discovery.create_training_example, calls,
+                           operation['query_id'], document_id=operation['document_id'],
+                           cross_reference=operation['cross_reference'],
+                           relevance=operation['relevance'])
+            elif action == UPDATE_EXAMPLE:
+                self._call(self.discovery.update_training_example, calls,
+                           operation['query_id'], operation['document_id'],
+                           cross_reference=operation['cross_reference'],
+                           relevance=operation['relevance'])
+            else:
+                self._call(self.discovery.delete_training_example, calls,
+                           operation['query_id'], operation['document_id'])
+        except Exception as error:  # pylint: disable=broad-except
+            return calls[0], error
+        return calls[0], None
@@ -23,10 +23,15 @@ results.
 
 from __future__ import absolute_import
 
+import copy
 import json
+import threading
 from .watson_service import datetime_to_string, string_to_datetime
 from .watson_service import WatsonService
 
+# Query parameters whose comma-separated values can be given in any order
+_UNORDERED_LIST_PARAMS = ('return', 'passages.fields')
+
 ##############################################################################
 # Service
 ##############################################################################
@@ -84,6 +89,82 @@ class DiscoveryV1(WatsonService):
             password=password,
             use_vcap_services=True)
         self.version = version
+        self.query_cache = None
+        self._change_listeners = []
+        self._cache_lock = threading.Lock()
+        self._generations = {}
+
+    def set_query_cache(self, cache):
+        """
+        Cache the responses of `query`.
+
+        Queries are keyed on their normalized parameters, so the same query with its
+        parameters or return fields in a different order is a cache hit. Adding,
+        updating or deleting a document, or updating a collection, invalidates the
+        cached queries of the collection; updating a configuration invalidates those
+        of its environment.
+
+        :param LRUCache cache: The cache, for example
+               `watson_developer_cloud.cache.LRUCache(max_size=1000, ttl=60)`, or
+               `None` to stop caching. It must support `invalidate_where`.
+        """
+        if cache is not None and not hasattr(cache, 'invalidate_where'):
+            raise ValueError('the query cache must support invalidate_where, '
+                             'such as LRUCache')
+        self.query_cache = cache
+
+    def add_change_listener(self, listener, documents=True):
+        """
+        Register a callable invoked with `environment_id` and `collection_id` after a
+        request of this client changes the documents or settings of a collection.
+        `collection_id` is `None` when the change may affect every collection of the
+        environment, as with a configuration update.
+
+        :param listener: A callable taking `environment_id` and `collection_id`.
+        :param bool documents: Also call it when documents are added, updated or
+               deleted (`True`), or only for collection and configuration changes.
+        """
+        self._change_listeners.append((listener, documents))
+
+    def remove_change_listener(self, listener):
+        """Unregister a listener added with `add_change_listener`."""
+        for entry in self._change_listeners:
+            if entry[0] == listener:
+                self._change_listeners.remove(entry)
+                return
+        raise ValueError('listener is not registered')
+
+    def _collection_changed(self, environment_id, collection_id=None, documents=False):
+        with self._cache_lock:
+            changed = (environment_id, collection_id)
+            self._generations[changed] = self._generations.get(changed, 0) + 1
+            if self.query_cache is not None:
+                self.query_cache.invalidate_where(
+                    lambda key: key[0] == environment_id and
+                    (collection_id is None or key[1] == collection_id))
+        for listener, document_changes in list(self._change_listeners):
+            if document_changes or not documents:
+                listener(environment_id, collection_id)
+
+    def _generation(self, environment_id, collection_id):
+        # Changes to the collection, and to the whole environment
+        return (self._generations.get((environment_id, collection_id), 0),
+                self._generations.get((environment_id, None), 0))
+
+    @staticmethod
+    def _query_cache_key(environment_id, collection_id, params):
+        normalized = []
+        for name, value in params.items():
+            if value is None:
+                continue
+            if name in _UNORDERED_LIST_PARAMS and hasattr(value, 'split'):
+                value = ','.join(sorted(v.strip() for v in value.split(',')))
+            elif name == 'sort' and hasattr(value, 'split'):
+                value = ','.join(v.strip() for v in value.split(','))
+            elif isinstance(value, bool):
+                value = 'true' if value else 'false'
+            normalized.append((name, value))
+        return (environment_id, collection_id, tuple(sorted(normalized)))
 
     #########################
     # environments
@@ -291,6 +372,7 @@ class DiscoveryV1(WatsonService):
             *self._encode_path_vars(environment_id, configuration_id))
         response = self.request(
             method='DELETE', url=url, params=params, accept_json=True)
+        self._collection_changed(environment_id)
         return response
 
     def get_configuration(self, environment_id, configuration_id):
@@ -386,6 +468,7 @@ class DiscoveryV1(WatsonService):
             *self._encode_path_vars(environment_id, configuration_id))
         response = self.request(
             method='PUT', url=url, params=params, json=data, accept_json=True)
+        self._collection_changed(environment_id)
         return response
 
     #########################
@@ -510,6 +593,7 @@ class DiscoveryV1(WatsonService):
             *self._encode_path_vars(environment_id, collection_id))
         response = self.request(
             method='DELETE', url=url, params=params, accept_json=True)
+        self._collection_changed(environment_id, collection_id)
         return response
 
     def get_collection(self, environment_id, collection_id):
@@ -605,6 +689,7 @@ class DiscoveryV1(WatsonService):
             *self._encode_path_vars(environment_id, collection_id))
         response = self.request(
             method='PUT', url=url, params=params, json=data, accept_json=True)
+        self._collection_changed(environment_id, collection_id)
         return response
 
     #########################
@@ -670,6 +755,7 @@ class DiscoveryV1(WatsonService):
             files={'file': file_tuple,
                    'metadata': metadata_tuple},
             accept_json=True)
+        self._collection_changed(environment_id, collection_id, documents=True)
         return response
 
     def delete_document(self, environment_id, collection_id, document_id):
@@ -697,6 +783,7 @@ class DiscoveryV1(WatsonService):
             *self._encode_path_vars(environment_id, collection_id, document_id))
         response = self.request(
             method='DELETE', url=url, params=params, accept_json=True)
+        self._collection_changed(environment_id, collection_id, documents=True)
         return response
 
     def get_document_status(self, environment_id, collection_id, document_id):
@@ -777,6 +864,7 @@ class DiscoveryV1(WatsonService):
             files={'file': file_tuple,
                    'metadata': metadata_tuple},
             accept_json=True)
+        self._collection_changed(environment_id, collection_id, documents=True)
         return response
 
     #########################
@@ -973,10 +1061,24 @@ class DiscoveryV1(WatsonService):
             'deduplicate': deduplicate,
             'deduplicate.field': deduplicate_field
         }
+        cache_key = None
+        generation = None
+        if self.query_cache is not None:
+            cache_key = self._query_cache_key(environment_id, collection_id, params)
+            cached = self.query_cache.get(cache_key)
+            if cached is not None:
+                return copy.deepcopy(cached)
+            with self._cache_lock:
+                generation = self._generation(environment_id, collection_id)
         url = '/v1/environments/{0}/collections/{1}/query'.format(
             *self._encode_path_vars(environment_id, collection_id))
         response = self.request(
             method='GET', url=url, params=params, accept_json=True)
+        if cache_key is not None:
+            with self._cache_lock:
+                # Don't keep a response that may predate a change made meanwhile
+                if generation == self._generation(environment_id, collection_id):
+                    self.query_cache.set(cache_key, copy.deepcopy(response))
         return response
 
     def query_entities(self,
@@ -0,0 +1,76 @@
+# coding: utf-8
+
+# Copyright 2017 IBM All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Helpers shared by the bulk loaders to read documents and CSV files on Python 2 and 3.
+"""
+
+from __future__ import absolute_import
+
+import csv
+import io
+import sys
+
+try:
+    string_types = (basestring,)  # pylint: disable=E0602 # Python 2
+except NameError:
+    string_types = (str,)
+
+
+def open_document(source):
+    """
+    A binary stream over a document, read from its start.
+
+    :param source: A file path, `bytes`, a seekable binary file handle or `None`.
+    :return: A new file or `io.BytesIO` for a path or `bytes`, which the caller
+             closes, the handle itself rewound, or `None`.
+    """
+    if source is None:
+        return None
+    if isinstance(source, string_types):
+        return open(source, 'rb')
+    if isinstance(source, bytes):
+        return io.BytesIO(source)
+    source.seek(0)
+    return source
+
+
+if sys.version_info >= (3, 0):
+
+    def csv_rows(path):
+        """
+        The rows of a UTF-8 CSV file, with a leading byte order mark removed.
+
+        :param str path: The path of the file.
+        :return: A generator of lists of unicode strings.
+        """
+        with io.open(path, encoding='utf-8-sig', newline='') as f:
+            for row in csv.reader(f):
+                yield row
+else:
+
+    def csv_rows(path):
+        """
+        The rows of a UTF-8 CSV file, with a leading byte order mark removed.
+
+        :param str path: The path of the file.
+        :return: A generator of lists of unicode strings.
+        """
+        with open(path, 'rb') as f:
+            for row in csv.reader(f):
+                row = [cell.decode('utf-8') for cell in row]
+                if row and row[0].startswith(u'\ufeff'):
+                    row[0] = row[0][1:]
+                yield row
@@ -0,0 +1,169 @@
+# coding: utf-8
+
+# Copyright 2017 IBM All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Analyze many texts or HTML documents with Natural Language Understanding.
+
+`BatchAnalyzer` sends `analyze` calls on a pool of worker threads, pulling the inputs
+lazily so an unbounded stream can be processed in constant memory. Calls are spaced by
+an optional rate limit and rate-limited or failed calls are retried with backoff. Each
+input yields one `TaskResult`, in input order or as calls complete, and an input that
+still fails after its retries yields its error without stopping the batch.
+"""
+
+from __future__ import absolute_import
+
+import json
+
+from .concurrency import RateLimiter, retry_call, run_concurrently
+
+_INPUT_TYPES = ('text', 'html', 'url')
+
+
+class BatchStats(object):
+    """
+    Counters of a batch.
+
+    :attr int succeeded: The number of inputs analyzed.
+    :attr int failed: The number of inputs that failed after their retries.
+    :attr int calls: The number of `analyze` calls made, including retries.
+    """
+
+    def __init__(self):
+        self.succeeded = 0
+        self.failed = 0
+        self.calls = 0
+
+    def _to_dict(self):
+        return {'succeeded': self.succeeded, 'failed': self.failed,
+                'calls': self.calls}
+
+    def __str__(self):
+        return json.dumps(self._to_dict(), indent=2)
+
+
+class BatchAnalyzer(object):
+    """
+    Run `NaturalLanguageUnderstandingV1.analyze` over many inputs concurrently.
+
+    :attr BatchStats stats: The counters of all the batches run so far.
+    """
+
+    def __init__(self,
+                 natural_language_understanding,
+                 features,
+                 max_workers=8,
+                 max_pending=None,
+                 rate=None,
+                 retries=3,
+                 backoff=1.0,
+                 input_type='text',
+                 **analyze_args):
+        """
+        Initialize a BatchAnalyzer object.
+
+        :param NaturalLanguageUnderstandingV1 natural_language_understanding: The
+               service client.
+        :param Features features: The features to analyze each input for.
+        :param int max_workers: The number of concurrent calls.
+        :param int max_pending: The maximum number of inputs in flight or waiting to be
+               consumed. Defaults to twice `max_workers`.
+        :param float rate: (optional) The maximum number of calls started per second.
+        :param int retries: The number of retries for rate-limited or failed calls.
+        :param float backoff: The delay before the first retry, in seconds.
+        :param str input_type: How plain string inputs are sent: `text`, `html` or
+               `url`.
+        :param analyze_args: Other arguments of `analyze` used for every input, such as
+               `language` or `return_analyzed_text`.
+        """
+        if features is None:
+            raise ValueError('features must be provided')
+        if input_type not in _INPUT_TYPES:
+            raise ValueError('input_type must be one of %s' % ', '.join(_INPUT_TYPES))
+        self.natural_language_understanding = natural_language_understanding
+        # Serialized once rather than for every call
+        self.features = natural_language_understanding._convert_model(features)
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.rate_limiter = RateLimiter(rate) if rate else None
+        self.retries = retries
+        self.backoff = backoff
+        self.input_type = input_type
+        self.analyze_args = analyze_args
+        self.stats = BatchStats()
+
+    def analyze(self, items, ordered=True):
+        """
+        Analyze every input.
+
+        :param items: An iterable of inputs, consumed lazily. A string is sent as
+               `input_type`; a `dict` holds the `text`, `html` or `url` and any other
+               `analyze` arguments for that input.
+        :param bool ordered: Yield results in input order (`True`) or as calls
+               complete.
+        :return: A generator of `TaskResult` objects, with the `AnalysisResults` dict
+                 as `value` or the exception as `error`.
+        """
+        for result in run_concurrently(self._analyze, items, self.max_workers,
+                                       max_pending=self.max_pending, ordered=ordered):
+            if result.ok:
+                result.value, calls, result.error = result.value
+            else:
+                calls = 0
+            self.stats.calls += calls
+            if result.ok:
+                self.stats.succeeded += 1
+            else:
+                self.stats.failed += 1
+            yield result
+
+    def _arguments(self, item):
+        if isinstance(item, dict):
+            if not any(item.get(name) is not None for name in _INPUT_TYPES):
+                raise ValueError('one of text, html or url must be provided')
+            arguments = dict(self.analyze_args)
+            arguments.update(item)
+        else:
+            arguments = dict(self.analyze_args)
+            arguments[self.input_type] = item
+        arguments.setdefault('features', self.features)
+        return arguments
+
+    def _analyze(self, item):
+        arguments = self._arguments(item)
+        calls = [0]
+
+        def attempt():
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire()
+            calls[0] += 1
+            return self.natural_language_understanding.analyze(**arguments)
+
+        try:
+            response = retry_call(attempt, retries=self.retries, backoff=self.backoff)
+        except Exception as error:  # pylint: disable=broad-except
+            return None, calls[0], error
+        return response, calls[0], None
+
+
+def analyze_batch(natural_language_understanding, items, features, ordered=True,
+                  **kwargs):
+    """
+    Analyze every input of an iterable. See `BatchAnalyzer` for the arguments.
+
+    :return: A generator of `TaskResult` objects.
+    """
+    analyzer = BatchAnalyzer(natural_language_understanding, features, **kwargs)
+    return analyzer.analyze(items, ordered=ordered)
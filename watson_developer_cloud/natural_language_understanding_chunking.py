@@ -0,0 +1,344 @@
+# coding: utf-8
+
+# Copyright 2017 IBM All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Analyze texts longer than Natural Language Understanding accepts in one call.
+
+`analyze` truncates text beyond `limit_text_characters` or the service limit.
+`analyze_long_text` instead splits the text on paragraph boundaries, then on sentence
+boundaries where a paragraph is too long, into chunks under a size limit in UTF-8 bytes,
+analyzes the chunks in parallel and merges their `AnalysisResults` into one:
+
+* entities, keywords, concepts and categories are matched by type and text (or label),
+  their counts added and their relevance (or score) averaged over all chunks, weighted
+  by chunk length, so a result found in only a small part of the text ranks lower;
+* entity and keyword sentiment and emotion are averaged weighted by mentions;
+* document and target sentiment and emotion are averaged weighted by chunk length;
+* relations and semantic roles are concatenated, and usage is summed.
+"""
+
+from __future__ import absolute_import
+
+import re
+
+from .natural_language_understanding_batch import BatchAnalyzer
+
+# The service limits the size of the text it analyzes in bytes of UTF-8
+DEFAULT_MAX_BYTES = 50000
+
+_PARAGRAPH_BREAK = re.compile(r'\n[ \t\r\f\v]*\n\s*')
+_SENTENCE_END = re.compile(r'(?<=[.!?])["\')\]]*\s+')
+_WHITESPACE = re.compile(r'\s+')
+
+
+def _size(text):
+    """The length of text in UTF-8 bytes."""
+    return len(text) if isinstance(text, bytes) else len(text.encode('utf-8'))
+
+
+def _pieces(text, pattern):
+    """Split text after each match of pattern, keeping the separators."""
+    pieces = []
+    start = 0
+    for match in pattern.finditer(text):
+        if match.end() > start:
+            pieces.append(text[start:match.end()])
+            start = match.end()
+    if start < len(text):
+        pieces.append(text[start:])
+    return pieces
+
+
+def _cut(word, max_bytes):
+    """Cut a word into pieces of at most max_bytes, between characters."""
+    pieces = []
+    while _size(word) > max_bytes:
+        if isinstance(word, bytes):
+            piece = word[:max_bytes]
+        else:
+            # Drop the bytes of a character split by the cut
+            piece = word.encode('utf-8')[:max_bytes].decode('utf-8', 'ignore') or \
+                word[:1]
+        pieces.append(piece)
+        word = word[len(piece):]
+    pieces.append(word)
+    return pieces
+
+
+def _pack(pieces, max_bytes):
+    chunks = []
+    current = ''
+    current_size = 0
+    for piece in pieces:
+        size = _size(piece)
+        if current and current_size + size > max_bytes:
+            chunks.append(current)
+            current = ''
+            current_size = 0
+        current += piece
+        current_size += size
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def split_text(text, max_bytes=DEFAULT_MAX_BYTES):
+    """
+    Split text into chunks of at most `max_bytes` bytes of UTF-8.
+
+    Paragraphs are kept whole where they fit, long paragraphs are split between
+    sentences, and sentences that are still too long between words. A single word
+    longer than the limit is cut between characters. Joining the chunks gives back the
+    text.
+
+    :param str text: The text.
+    :param int max_bytes: The maximum size of a chunk.
+    :rtype: list[str]
+    """
+    if max_bytes < 1:
+        raise ValueError('max_bytes must be at least 1')
+    if _size(text) <= max_bytes:
+        return [text] if text else []
+    pieces = []
+    for paragraph in _pieces(text, _PARAGRAPH_BREAK):
+        if _size(paragraph) <= max_bytes:
+            pieces.append(paragraph)
+            continue
+        for sentence in _pieces(paragraph, _SENTENCE_END):
+            if _size(sentence) <= max_bytes:
+                pieces.append(sentence)
+                continue
+            for word in _pieces(sentence, _WHITESPACE):
+                pieces.extend(_cut(word, max_bytes))
+    return _pack(pieces, max_bytes)
+
+
+class _WeightedMean(object):
+    """Weighted means of the numeric fields of dicts."""
+
+    __slots__ = ('sums', 'weight')
+
+    def __init__(self):
+        self.sums = {}
+        self.weight = 0.0
+
+    def add(self, values, weight):
+        if not isinstance(values, dict) or weight <= 0:
+            return
+        self.weight += weight
+        for name, value in values.items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                self.sums[name] = self.sums.get(name, 0.0) + value * weight
+
+    def result(self):
+        if not self.weight:
+            return None
+        return dict((name, total / self.weight) for name, total in self.sums.items())
+
+
+def _label(score):
+    if score > 0:
+        return 'positive'
+    if score < 0:
+        return 'negative'
+    return 'neutral'
+
+
+def _sentiment(mean):
+    result = mean.result()
+    if result is None or 'score' not in result:
+        return None
+    return {'score': result['score'], 'label': _label(result['score'])}
+
+
+class _Merger(object):
+    """Results of one list feature, merged by key."""
+
+    def __init__(self, key, score='relevance'):
+        self.key = key
+        self.score = score
+        self.items = {}
+        self.order = []
+
+    def add(self, items, weight):
+        for item in items or ():
+            key = self.key(item)
+            entry = self.items.get(key)
+            if entry is None:
+                entry = self.items[key] = {'item': dict(item), 'score': 0.0,
+                                           'count': 0, 'sentiment': _WeightedMean(),
+                                           'emotion': _WeightedMean()}
+                self.order.append(key)
+            entry['score'] += (item.get(self.score) or 0.0) * weight
+            mentions = item.get('count') or 1
+            entry['count'] += mentions
+            entry['sentiment'].add(item.get('sentiment'), mentions)
+            entry['emotion'].add(item.get('emotion'), mentions)
+
+    def result(self, total_weight, limit=None):
+        merged = []
+        for key in self.order:
+            entry = self.items[key]
+            item = entry['item']
+            item[self.score] = entry['score'] / total_weight if total_weight else 0.0
+            if 'count' in item:
+                item['count'] = entry['count']
+            if 'sentiment' in item:
+                item['sentiment'] = _sentiment(entry['sentiment']) or item['sentiment']
+            if 'emotion' in item:
+                item['emotion'] = entry['emotion'].result() or item['emotion']
+            merged.append(item)
+        # Stable sort: ties keep the order the results were first seen
+        merged.sort(key=lambda item: -item[self.score])
+        return merged[:limit] if limit else merged
+
+
+def _targets(results, feature, weights):
+    """Merge the targets of the sentiment or emotion results of the chunks."""
+    means = {}
+    order = []
+    for result, weight in zip(results, weights):
+        for target in (result.get(feature) or {}).get('targets') or ():
+            text = target.get('text')
+            if text not in means:
+                means[text] = _WeightedMean()
+                order.append(text)
+            means[text].add(target.get('emotion') if feature == 'emotion' else target,
+                            weight)
+    merged = []
+    for text in order:
+        if feature == 'emotion':
+            merged.append({'text': text, 'emotion': means[text].result()})
+        else:
+            target = _sentiment(means[text]) or {}
+            target['text'] = text
+            merged.append(target)
+    return merged
+
+
+def merge_results(results, weights=None, features=None):
+    """
+    Merge the `AnalysisResults` of the chunks of a text.
+
+    :param list[dict] results: The `AnalysisResults` dict of each chunk.
+    :param list[float] weights: (optional) The weight of each chunk, normally its
+           length. Chunks weigh the same by default.
+    :param dict features: (optional) The features analyzed, as a `dict`, to apply the
+           `limit` of each feature to the merged lists.
+    :return: An `AnalysisResults` dict.
+    :rtype: dict
+    """
+    results = list(results)
+    weights = [float(w) for w in weights] if weights is not None else [1.0] * len(results)
+    if len(weights) != len(results):
+        raise ValueError('results and weights must have the same length')
+    features = features or {}
+    total = sum(weights)
+    merged = {}
+
+    def limit(feature):
+        return (features.get(feature) or {}).get('limit')
+
+    mergers = {
+        'entities': _Merger(lambda e: (e.get('type'), e.get('text'))),
+        'keywords': _Merger(lambda k: (k.get('text') or '').lower()),
+        'concepts': _Merger(lambda c: c.get('text')),
+        'categories': _Merger(lambda c: c.get('label'), score='score')
+    }
+    document_sentiment = _WeightedMean()
+    document_emotion = _WeightedMean()
+    usage = {}
+    for result, weight in zip(results, weights):
+        for feature, merger in mergers.items():
+            if feature in result:
+                merger.add(result[feature], weight)
+        if 'sentiment' in result:
+            document_sentiment.add((result['sentiment'] or {}).get('document'), weight)
+        if 'emotion' in result:
+            document_emotion.add(
+                ((result['emotion'] or {}).get('document') or {}).get('emotion'), weight)
+        for feature in ('relations', 'semantic_roles'):
+            if feature in result:
+                merged.setdefault(feature, []).extend(result[feature] or ())
+        for name, value in (result.get('usage') or {}).items():
+            if isinstance(value, (int, float)):
+                usage[name] = usage.get(name, 0) + value
+        for name in ('language', 'retrieved_url', 'metadata'):
+            if name in result and name not in merged:
+                merged[name] = result[name]
+
+    for feature, merger in mergers.items():
+        if any(feature in result for result in results):
+            merged[feature] = merger.result(total, limit(feature))
+    # Without a document result in any chunk, `document` is left out
+    if any('sentiment' in result for result in results):
+        merged['sentiment'] = {'targets': _targets(results, 'sentiment', weights)}
+        sentiment = _sentiment(document_sentiment)
+        if sentiment is not None:
+            merged['sentiment']['document'] = sentiment
+    if any('emotion' in result for result in results):
+        merged['emotion'] = {'targets': _targets(results, 'emotion', weights)}
+        emotion = document_emotion.result()
+        if emotion is not None:
+            merged['emotion']['document'] = {'emotion': emotion}
+    if usage:
+        merged['usage'] = usage
+    return merged
+
+
+def analyze_long_text(natural_language_understanding,
+                      features,
+                      text,
+                      max_bytes=DEFAULT_MAX_BYTES,
+                      max_workers=4,
+                      retries=3,
+                      backoff=1.0,
+                      **analyze_args):
+    """
+    Analyze a text of any length, in chunks when it is larger than `max_bytes`.
+
+    :param NaturalLanguageUnderstandingV1 natural_language_understanding: The service
+           client.
+    :param Features features: The features to analyze the text for.
+    :param str text: The plain text to analyze.
+    :param int max_bytes: The maximum size of a chunk, in UTF-8 bytes.
+    :param int max_workers: The number of chunks analyzed concurrently.
+    :param int retries: The number of retries for rate-limited or failed calls.
+    :param float backoff: The delay before the first retry, in seconds.
+    :param analyze_args: Other arguments of `analyze`, such as `language`.
+    :return: An `AnalysisResults` dict. With `return_analyzed_text`, its
+             `analyzed_text` is the whole text.
+    :rtype: dict
+    :raises WatsonApiException: The analysis of a chunk failed after its retries.
+    """
+    if text is None:
+        raise ValueError('text must be provided')
+    chunks = split_text(text, max_bytes)
+    if len(chunks) <= 1:
+        return natural_language_understanding.analyze(features, text=text,
+                                                      **analyze_args)
+    analyzer = BatchAnalyzer(natural_language_understanding, features,
+                             max_workers=max_workers, retries=retries, backoff=backoff,
+                             **analyze_args)
+    results = []
+    for result in analyzer.analyze(chunks):
+        if not result.ok:
+            raise result.error
+        results.append(result.value)
+    merged = merge_results(results, [len(chunk) for chunk in chunks],
+                           analyzer.features)
+    if analyze_args.get('return_analyzed_text'):
+        merged['analyzed_text'] = text
+    return merged
@@ -0,0 +1,358 @@
+# coding: utf-8
+
+# Copyright 2017 IBM All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Flatten Natural Language Understanding results into tables for analytics.
+
+`ResultTables` reads `AnalysisResults` dicts in a single pass into one columnar table
+per feature: entities, keywords, concepts, categories and semantic roles. Every row
+holds the code of its document key, and every column is a typed `array` (numbers, with
+NaN for missing values) or a list (strings). The columns are exposed as NumPy arrays
+when NumPy is installed, and the tables are written to CSV or JSONL files a slice of
+rows at a time. `write_tables` converts an unbounded stream in batches of constant
+size.
+"""
+
+from __future__ import absolute_import
+
+import csv
+import io
+import itertools
+import json
+import math
+import os
+import sys
+from array import array
+
+try:
+    from itertools import izip as _zip  # Python 2
+except ImportError:
+    _zip = zip
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+FORMAT_CSV = 'csv'
+FORMAT_JSONL = 'jsonl'
+
+_EMOTIONS = ('anger', 'disgust', 'fear', 'joy', 'sadness')
+
+# Per table, its columns as (name, path in the result item, type): 's' for strings, 'd'
+# for numbers and 'i' for counts. Counts are stored like numbers, so that they can be
+# missing, and written as integers.
+TABLES = {
+    'entities': (
+        [('type', ('type',), 's'), ('text', ('text',), 's'),
+         ('relevance', ('relevance',), 'd'), ('count', ('count',), 'i'),
+         ('sentiment_score', ('sentiment', 'score'), 'd')] +
+        [(e, ('emotion', e), 'd') for e in _EMOTIONS] +
+        [('disambiguation', ('disambiguation', 'name'), 's')]),
+    'keywords': (
+        [('text', ('text',), 's'), ('relevance', ('relevance',), 'd'),
+         ('sentiment_score', ('sentiment', 'score'), 'd')] +
+        [(e, ('emotion', e), 'd') for e in _EMOTIONS]),
+    'concepts': [
+        ('text', ('text',), 's'), ('relevance', ('relevance',), 'd'),
+        ('dbpedia_resource', ('dbpedia_resource',), 's')],
+    'categories': [
+        ('label', ('label',), 's'), ('score', ('score',), 'd')],
+    'semantic_roles': [
+        ('sentence', ('sentence',), 's'), ('subject', ('subject', 'text'), 's'),
+        ('action', ('action', 'text'), 's'),
+        ('action_normalized', ('action', 'normalized'), 's'),
+        ('action_tense', ('action', 'verb', 'tense'), 's'),
+        ('object', ('object', 'text'), 's')]
+}
+
+_NAN = float('nan')
+
+# The number of rows converted at a time when a table is written
+_CHUNK_ROWS = 1024
+
+
+if sys.version_info >= (3, 0):
+
+    def _write_csv(stream, rows):
+        text = io.TextIOWrapper(stream, encoding='utf-8', newline='')
+        csv.writer(text, lineterminator='\n').writerows(rows)
+        text.flush()
+        text.detach()
+else:
+
+    def _write_csv(stream, rows):
+        csv.writer(stream, lineterminator='\n').writerows(
+            [v.encode('utf-8') if isinstance(v, unicode) else v  # pylint: disable=E0602
+             for v in row] for row in rows)
+
+
+def _pairs(results, keys):
+    if keys is True:
+        return iter(results)
+    if keys is None:
+        return enumerate(results)
+    return _zip(keys, results)
+
+
+def _value(item, path):
+    for segment in path:
+        if not isinstance(item, dict):
+            return None
+        item = item.get(segment)
+    return item
+
+
+class FeatureTable(object):
+    """
+    The rows of one feature, stored by column.
+
+    :attr str name: The feature, such as `entities`.
+    :attr list[str] names: The column names, after the `document` column.
+    :attr array document_codes: Per row, the index of its document key in the
+          `documents` of the `ResultTables`.
+    :attr dict columns: The values of each column: an `array('d')` for numbers and
+          counts, with NaN for missing values, or a list of strings, with `None` for
+          missing ones.
+    """
+
+    def __init__(self, name, documents):
+        self.name = name
+        self._documents = documents
+        self._spec = TABLES[name]
+        self.names = [column for column, _, _ in self._spec]
+        self.document_codes = array('l')
+        self.columns = dict((column, [] if kind == 's' else array('d'))
+                            for column, _, kind in self._spec)
+
+    def __len__(self):
+        return len(self.document_codes)
+
+    def _add(self, code, items):
+        columns = self.columns
+        for item in items:
+            self.document_codes.append(code)
+            for column, path, kind in self._spec:
+                value = _value(item, path)
+                if kind == 's':
+                    columns[column].append(value)
+                else:
+                    columns[column].append(_NAN if value is None else float(value))
+
+    def column(self, name, vectorized=None):
+        """
+        The values of a column.
+
+        :param str name: `document` for the document keys, or one of `names`.
+        :param bool vectorized: Return a NumPy array (`True`) or the stored `array` or
+               list (`False`). Defaults to NumPy when it is installed.
+        :raises KeyError: The table has no such column.
+        """
+        if vectorized is None:
+            vectorized = numpy is not None
+        if vectorized and numpy is None:
+            raise ImportError('numpy is required for vectorized columns')
+        if name == 'document':
+            if vectorized:
+                keys = numpy.array(self._documents + [None], dtype=object)[:-1]
+                return keys[self._np(self.document_codes, numpy.dtype('l'))]
+            return [self._documents[code] for code in self.document_codes]
+        values = self.columns[name]
+        if not vectorized:
+            return values
+        if isinstance(values, array):
+            return self._np(values, numpy.float64)
+        return numpy.array(values + [None], dtype=object)[:-1]
+
+    @staticmethod
+    def _np(values, dtype):
+        if not len(values):
+            return numpy.zeros(0, dtype=dtype)
+        return numpy.frombuffer(values, dtype=dtype)
+
+    def _chunks(self, missing):
+        """
+        The rows in output order, `_CHUNK_ROWS` at a time, with missing values replaced
+        by `missing`. Only the slice of each column being written is copied.
+        """
+        for start in range(0, len(self), _CHUNK_ROWS):
+            end = start + _CHUNK_ROWS
+            cells = [[self._documents[code] for code in self.document_codes[start:end]]]
+            for column, _, kind in self._spec:
+                values = self.columns[column][start:end]
+                if kind == 's':
+                    cells.append([missing if v is None else v for v in values])
+                elif kind == 'i':
+                    cells.append([missing if math.isnan(v) else int(v) for v in values])
+                else:
+                    cells.append([missing if math.isnan(v) else v for v in values])
+            yield _zip(*cells)
+
+    def write_csv(self, stream, header=True):
+        """
+        Write the table as CSV to a binary stream.
+
+        :param stream: A file opened in binary mode.
+        :param bool header: Write the column names first.
+        """
+        if header:
+            _write_csv(stream, [['document'] + self.names])
+        _write_csv(stream, itertools.chain.from_iterable(self._chunks('')))
+
+    def write_jsonl(self, stream):
+        """
+        Write the table as one JSON object per line to a binary stream.
+
+        The lines are assembled from the encoded values with a template, without
+        building an object per row.
+
+        :param stream: A file opened in binary mode.
+        """
+        template = '{%s}\n' % ','.join(
+            '"%s":%%s' % name for name in ['document'] + self.names)
+        for rows in self._chunks(None):
+            stream.write(''.join(template % tuple(json.dumps(value) for value in row)
+                                 for row in rows).encode('utf-8'))
+
+    def _to_dict(self):
+        return dict((name, list(self.column(name, vectorized=False)))
+                    for name in ['document'] + self.names)
+
+
+class ResultTables(object):
+    """
+    Columnar tables of a set of `AnalysisResults`.
+
+    :attr list documents: The document keys, in the order they were added.
+    :attr dict tables: The `FeatureTable` of each feature.
+    """
+
+    def __init__(self, features=None):
+        """
+        Initialize a ResultTables object.
+
+        :param list[str] features: (optional) The tables to build. Defaults to all of
+               `TABLES`.
+        """
+        features = sorted(TABLES) if features is None else list(features)
+        for feature in features:
+            if feature not in TABLES:
+                raise ValueError('unknown feature table: %s' % feature)
+        self.documents = []
+        self.tables = dict((feature, FeatureTable(feature, self.documents))
+                           for feature in features)
+
+    @classmethod
+    def from_results(cls, results, keys=None, features=None):
+        """
+        Build the tables of a stream of results.
+
+        :param results: An iterable of `AnalysisResults` dicts, or of `(key, result)`
+               pairs when `keys` is `True`.
+        :param keys: (optional) `True` when `results` yields pairs, or an iterable of
+               document keys in the order of `results`. Documents are numbered from 0
+               by default.
+        :param list[str] features: (optional) The tables to build.
+        :rtype: ResultTables
+        """
+        tables = cls(features)
+        for key, result in _pairs(results, keys):
+            tables.add(key, result)
+        return tables
+
+    def add(self, key, result):
+        """
+        Add the rows of one document.
+
+        :param key: The document key, such as an ID or a file name.
+        :param dict result: Its `AnalysisResults` dict.
+        """
+        code = len(self.documents)
+        self.documents.append(key)
+        for feature, table in self.tables.items():
+            table._add(code, (result or {}).get(feature) or ())
+
+    def __getitem__(self, feature):
+        return self.tables[feature]
+
+    def __len__(self):
+        return len(self.documents)
+
+    def write(self, output_dir, output_format=FORMAT_CSV, append=False):
+        """
+        Write each table to `<feature>.csv` or `<feature>.jsonl` in a directory.
+
+        :param str output_dir: The directory, created if needed.
+        :param str output_format: `csv` or `jsonl`.
+        :param bool append: Add to existing files rather than replacing them. CSV
+               headers are only written to new files.
+        :return: The path of each table's file.
+        :rtype: dict
+        """
+        if output_format not in (FORMAT_CSV, FORMAT_JSONL):
+            raise ValueError('output_format must be csv or jsonl')
+        if not os.path.isdir(output_dir):
+            os.makedirs(output_dir)
+        paths = {}
+        for feature, table in self.tables.items():
+            path = os.path.join(output_dir, '%s.%s' % (feature, output_format))
+            header = not (append and os.path.exists(path) and os.path.getsize(path))
+            with io.open(path, 'ab' if append else 'wb') as stream:
+                if output_format == FORMAT_CSV:
+                    table.write_csv(stream, header=header)
+                else:
+                    table.write_jsonl(stream)
+            paths[feature] = path
+        return paths
+
+
+def write_tables(results,
+                 output_dir,
+                 output_format=FORMAT_CSV,
+                 keys=None,
+                 features=None,
+                 batch_size=10000):
+    """
+    Convert a stream of results to table files, `batch_size` documents at a time, so
+    memory does not grow with the length of the stream.
+
+    :param results: An iterable of `AnalysisResults` dicts, or of `(key, result)`
+           pairs when `keys` is `True`. See `ResultTables.from_results`.
+    :param str output_dir: The directory the files are written to. Existing files are
+           replaced.
+    :param str output_format: `csv` or `jsonl`.
+    :param keys: (optional) `True` for pairs, or an iterable of document keys.
+    :param list[str] features: (optional) The tables to write.
+    :param int batch_size: The number of documents converted at a time.
+    :return: The number of rows written to each table.
+    :rtype: dict
+    """
+    pairs = _pairs(results, keys)
+    counts = dict((feature, 0) for feature in (features or TABLES))
+    append = False
+    while True:
+        batch = ResultTables(features)
+        for key, result in pairs:
+            batch.add(key, result)
+            if len(batch) >= batch_size:
+                break
+        if not len(batch) and append:
+            return counts
+        batch.write(output_dir, output_format, append=append)
+        for feature, table in batch.tables.items():
+            counts[feature] += len(table)
+        if len(batch) < batch_size:
+            return counts
+        append = True
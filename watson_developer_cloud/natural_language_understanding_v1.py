@@ -64,6 +64,8 @@ Get author information, publication date, and the title of your text/HTML conten
 
 from __future__ import absolute_import
 
+import copy
+import hashlib
 import json
 from .watson_service import WatsonService
 
@@ -119,6 +121,29 @@ class NaturalLanguageUnderstandingV1(WatsonService):
             password=password,
             use_vcap_services=True)
         self.version = version
+        self.analysis_cache = None
+
+    def set_analysis_cache(self, cache):
+        """
+        Cache the responses of `analyze`.
+
+        Responses are keyed on a SHA-256 hash of the API version, the features (custom
+        model IDs included) and every other argument, including the full text, HTML or
+        URL, so analyzing the same content the same way again is a cache hit. The
+        content behind a URL may change, so give the cache a time to live when
+        analyzing URLs.
+
+        :param cache: The cache, for example
+               `watson_developer_cloud.cache.LRUCache(max_size=1000)`, a persistent
+               `SqliteCache`, or a `TieredCache` combining both, or `None` to stop
+               caching.
+        """
+        self.analysis_cache = cache
+
+    def _analysis_cache_key(self, data):
+        encoded = json.dumps([self.version, data], sort_keys=True,
+                             separators=(',', ':'))
+        return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
 
     #########################
     # analyze
@@ -169,9 +194,17 @@ class NaturalLanguageUnderstandingV1(WatsonService):
             'language': language,
             'limit_text_characters': limit_text_characters
         }
+        cache_key = None
+        if self.analysis_cache is not None:
+            cache_key = self._analysis_cache_key(data)
+            cached = self.analysis_cache.get(cache_key)
+            if cached is not None:
+                return copy.deepcopy(cached)
         url = '/v1/analyze'
         response = self.request(
             method='POST', url=url, params=params, json=data, accept_json=True)
+        if cache_key is not None:
+            self.analysis_cache.set(cache_key, copy.deepcopy(response))
         return response
 
     #########################
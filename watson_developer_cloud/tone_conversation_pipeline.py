@@ -0,0 +1,247 @@
+# coding: utf-8
+
+# Copyright 2017 IBM All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Send user turns to Conversation with the user's tone in the context.
+
+The tone of each utterance is analyzed on a background thread while the message payload
+is prepared, tone results are cached by normalized utterance, and the tone history kept
+in the context is bounded to the last few turns so the context sent with every message
+does not keep growing.
+
+The tone categories and thresholds follow the Tone Analyzer recommendations at
+https://console.bluemix.net/docs/services/tone-analyzer/using-tone.html
+"""
+
+from __future__ import absolute_import
+
+import copy
+import threading
+from collections import deque
+
+from .cache import LRUCache
+from .concurrency import BackgroundCall
+
+PRIMARY_EMOTION_SCORE_THRESHOLD = 0.5
+WRITING_HIGH_SCORE_THRESHOLD = 0.75
+WRITING_NO_SCORE_THRESHOLD = 0.0
+SOCIAL_HIGH_SCORE_THRESHOLD = 0.75
+SOCIAL_LOW_SCORE_THRESHOLD = 0.25
+
+EMOTION_TONE_LABEL = 'emotion_tone'
+WRITING_TONE_LABEL = 'writing_tone'
+SOCIAL_TONE_LABEL = 'social_tone'
+
+
+def _normalize(text):
+    return ' '.join((text or '').split()).lower()
+
+
+def _tone(tone, interpretation):
+    return {'tone_name': tone['tone_name'].lower(), 'score': tone['score'],
+            'interpretation': interpretation}
+
+
+def summarize_tone(tone_response):
+    """
+    Reduce a Tone Analyzer response to the tones used in the conversation context.
+
+    :param dict tone_response: The response of `ToneAnalyzerV3.tone`.
+    :return: A `dict` holding, for `emotion`, `writing` and `social`, a `dict` with the
+             `current` value stored in the context and the `history` entry of the
+             turn, or `None` when the response has no document tone. The current
+             emotion is the name of the primary emotion, or `neutral` when no emotion
+             reaches the threshold, and its history entry a `dict` with its
+             `tone_name` and `score`. The current writing and social tones are lists
+             of labels such as `analytical_high`, and their history entries lists of
+             every tone with its `tone_name`, `score` and `interpretation`.
+    :rtype: dict
+    """
+    document_tone = (tone_response or {}).get('document_tone')
+    if not document_tone:
+        return None
+    categories = dict((category['category_id'], category['tones'])
+                      for category in document_tone.get('tone_categories') or ())
+
+    emotion = {'tone_name': 'neutral', 'score': None}
+    max_score = PRIMARY_EMOTION_SCORE_THRESHOLD
+    for tone in categories.get(EMOTION_TONE_LABEL) or ():
+        if tone['score'] > max_score:
+            max_score = tone['score']
+            emotion = {'tone_name': tone['tone_name'].lower(), 'score': tone['score']}
+
+    writing = []
+    writing_tones = []
+    for tone in categories.get(WRITING_TONE_LABEL) or ():
+        if tone['score'] >= WRITING_HIGH_SCORE_THRESHOLD:
+            writing.append(tone['tone_name'].lower() + '_high')
+            writing_tones.append(_tone(tone, 'likely high'))
+        elif tone['score'] <= WRITING_NO_SCORE_THRESHOLD:
+            writing_tones.append(_tone(tone, 'no evidence'))
+        else:
+            writing_tones.append(_tone(tone, 'likely medium'))
+
+    social = []
+    social_tones = []
+    for tone in categories.get(SOCIAL_TONE_LABEL) or ():
+        if tone['score'] >= SOCIAL_HIGH_SCORE_THRESHOLD:
+            social.append(tone['tone_name'].lower() + '_high')
+            social_tones.append(_tone(tone, 'likely high'))
+        elif tone['score'] <= SOCIAL_LOW_SCORE_THRESHOLD:
+            social.append(tone['tone_name'].lower() + '_low')
+            social_tones.append(_tone(tone, 'likely low'))
+        else:
+            social_tones.append(_tone(tone, 'likely medium'))
+
+    return {'emotion': {'current': emotion['tone_name'], 'history': emotion},
+            'writing': {'current': writing, 'history': writing_tones},
+            'social': {'current': social, 'history': social_tones}}
+
+
+def update_user_tone(context, tone_summary, history_size=0):
+    """
+    Store a tone summary in `context['user']['tone']`.
+
+    Each category gets its `current` value and, when `history_size` is positive, a
+    `history` list holding the entries of the last `history_size` turns, oldest first.
+
+    :param dict context: The conversation context, updated in place.
+    :param dict tone_summary: The result of `summarize_tone`. Nothing is changed when it
+           is `None`.
+    :param int history_size: The number of turns to keep in the history.
+    :return: The context.
+    :rtype: dict
+    """
+    user = context.setdefault('user', {})
+    tone = user.setdefault('tone', {})
+    for category in ('emotion', 'writing', 'social'):
+        tone.setdefault(category, {'current': None})
+    if tone_summary is None:
+        return context
+    for category in ('emotion', 'writing', 'social'):
+        state = tone[category]
+        state['current'] = tone_summary[category]['current']
+        if history_size > 0:
+            history = deque(state.get('history') or (), maxlen=history_size)
+            history.append(tone_summary[category]['history'])
+            state['history'] = list(history)
+        else:
+            state.pop('history', None)
+    return context
+
+
+class TonePipeline(object):
+    """
+    Send user input to Conversation with the user's tone added to the context.
+    """
+
+    def __init__(self,
+                 conversation,
+                 tone_analyzer,
+                 workspace_id,
+                 history_size=5,
+                 cache_size=1024,
+                 cache_ttl=None,
+                 tone_timeout=None):
+        """
+        Initialize a TonePipeline object.
+
+        :param ConversationV1 conversation: The Conversation client.
+        :param ToneAnalyzerV3 tone_analyzer: The Tone Analyzer client.
+        :param str workspace_id: The workspace ID.
+        :param int history_size: The number of turns of tone history kept in the
+               context, or 0 to keep only the current tone.
+        :param int cache_size: The number of utterances whose tone is cached.
+        :param float cache_ttl: (optional) The number of seconds a cached tone stays
+               valid.
+        :param float tone_timeout: (optional) The longest time to wait for Tone
+               Analyzer, in seconds. When it is exceeded, or Tone Analyzer fails, the
+               message is sent with the tone left unchanged.
+        """
+        if workspace_id is None:
+            raise ValueError('workspace_id must be provided')
+        self.conversation = conversation
+        self.tone_analyzer = tone_analyzer
+        self.workspace_id = workspace_id
+        self.history_size = history_size
+        self.tone_timeout = tone_timeout
+        self.tone_cache = LRUCache(cache_size, ttl=cache_ttl)
+        self.tone_errors = 0
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def _analyze(self, key, text):
+        try:
+            summary = summarize_tone(self.tone_analyzer.tone(
+                {'text': text}, sentences=False))
+            self.tone_cache.set(key, summary)
+            return summary
+        finally:
+            with self._lock:
+                self._pending.pop(key, None)
+
+    def analyze_tone(self, text):
+        """
+        Start analyzing the tone of an utterance, unless it is cached or already being
+        analyzed.
+
+        Call this as soon as user input arrives to overlap Tone Analyzer with other
+        work; `message` picks up the result.
+
+        :param str text: The user input text.
+        :return: The pending tone summary, `None` when the text is empty.
+        :rtype: BackgroundCall
+        """
+        key = _normalize(text)
+        if not key:
+            # Nothing to analyze, for example a turn that only sends intents
+            return BackgroundCall.completed(None)
+        with self._lock:
+            pending = self._pending.get(key)
+            if pending is not None:
+                return pending
+            cached = self.tone_cache.get(key)
+            if cached is not None:
+                return BackgroundCall.completed(cached)
+            pending = BackgroundCall(self._analyze, key, text)
+            self._pending[key] = pending
+            return pending
+
+    def message(self, input, context=None, **kwargs):
+        """
+        Send a user turn to the workspace with the user's tone in the context.
+
+        :param dict input: The message input, with the user text in `text`. The tone is
+               left unchanged when it has no text.
+        :param dict context: (optional) The context of the previous response. It is
+               not modified.
+        :param kwargs: Other arguments of `ConversationV1.message`.
+        :return: A `dict` containing the `MessageResponse`.
+        :rtype: dict
+        """
+        pending = self.analyze_tone((input or {}).get('text'))
+        # Prepare the context while Tone Analyzer is working.
+        context = copy.deepcopy(context) if context else {}
+        update_user_tone(context, None, self.history_size)
+
+        summary = None
+        if pending.wait(self.tone_timeout) and pending.error is None:
+            summary = pending.value
+        else:
+            with self._lock:
+                self.tone_errors += 1
+        update_user_tone(context, summary, self.history_size)
+        return self.conversation.message(
+            self.workspace_id, input=input, context=context, **kwargs)